@@ -133,7 +133,7 @@ def collect(filter_fun):
     # TODO step 1: put all toplevel benchmarking code under `if __name__ == '__main__'`
     # TODO step 2: auto import benchmarks/*.py, remove whitelist below
     # TODO step 3: convert existing benchmarks
-    for name in ('hub_timers', 'spawn'):
+    for name in ('hub_timers', 'queues', 'semaphore', 'spawn', 'timeout', 'tls'):
         mod = importlib.import_module('benchmarks.' + name)
         for name, obj in inspect.getmembers(mod):
             if name.startswith(common_prefix) and inspect.isfunction(obj):
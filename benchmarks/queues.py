@@ -0,0 +1,70 @@
+'''Benchmark producer/consumer throughput of eventlet.queue
+'''
+import contextlib
+
+import eventlet
+import benchmarks
+from eventlet import queue
+
+
+def consume(q, n):
+    get = q.get
+    for _ in range(n):
+        get()
+
+
+def pipe_setup(maxsize):
+    @contextlib.contextmanager
+    def manager(iters):
+        q = queue.LightQueue(maxsize)
+        consumer = eventlet.spawn(consume, q, iters)
+        yield q
+        consumer.wait()
+    return manager
+
+
+def benchmark_put_get():
+    q = queue.LightQueue()
+    q.put(1)
+    q.get()
+
+
+@benchmarks.configure(manager=pipe_setup(None), max_iters=1e6)
+def benchmark_producer_consumer_unbounded(q):
+    q.put(1)
+
+
+@benchmarks.configure(manager=pipe_setup(16), max_iters=1e6)
+def benchmark_producer_consumer_bounded(q):
+    q.put(1)
+
+
+@benchmarks.configure(manager=pipe_setup(0), max_iters=1e5)
+def benchmark_producer_consumer_channel(q):
+    q.put(1)
+
+
+@contextlib.contextmanager
+def many_consumers_setup(iters):
+    q = queue.LightQueue(16)
+    consumers = 8
+    pool = eventlet.GreenPool(consumers)
+    per_consumer, rest = divmod(iters, consumers)
+    for i in range(consumers):
+        pool.spawn(consume, q, per_consumer + (i < rest))
+    yield q
+    pool.waitall()
+
+
+@benchmarks.configure(manager=many_consumers_setup, max_iters=1e6)
+def benchmark_producer_many_consumers(q):
+    q.put(1)
+
+
+batch = list(range(100))
+
+
+def benchmark_put_many_get_many_100():
+    q = queue.LightQueue()
+    q.put_many(batch)
+    q.get_many()
@@ -0,0 +1,60 @@
+'''Benchmark eventlet.semaphore acquire/release under contention
+'''
+import contextlib
+
+import eventlet
+import benchmarks
+
+
+def noop():
+    pass
+
+
+def benchmark_acquire_release_uncontended():
+    sem = eventlet.Semaphore()
+    sem.acquire()
+    sem.release()
+
+
+def contend(sem, stop):
+    while not stop:
+        with sem:
+            eventlet.sleep(0)
+
+
+def contention_setup(value, contenders):
+    @contextlib.contextmanager
+    def manager(iters):
+        sem = eventlet.Semaphore(value)
+        stop = []
+        gts = [eventlet.spawn(contend, sem, stop) for _ in range(contenders)]
+        eventlet.sleep(0)
+        yield sem
+        stop.append(True)
+        for gt in gts:
+            gt.wait()
+    return manager
+
+
+@benchmarks.configure(manager=contention_setup(1, 8), max_iters=1e5)
+def benchmark_lock_contention_8(sem):
+    with sem:
+        eventlet.sleep(0)
+
+
+@benchmarks.configure(manager=contention_setup(4, 32), max_iters=1e5)
+def benchmark_semaphore4_contention_32(sem):
+    with sem:
+        eventlet.sleep(0)
+
+
+@contextlib.contextmanager
+def pool_setup(iters):
+    pool = eventlet.GreenPool(4)
+    yield pool
+    pool.waitall()
+
+
+@benchmarks.configure(manager=pool_setup, max_iters=1e5)
+def benchmark_full_pool_spawn_n(pool):
+    pool.spawn_n(noop)
@@ -77,3 +77,45 @@ def benchmark_pool_spawn(pool):
 @benchmarks.configure(manager=pool_setup, max_iters=1e5)
 def benchmark_pool_spawn_n(pool):
     pool.spawn_n(dummy, 1)
+
+
+def small_pool_setup(recycle):
+    # full most of the time, so that greenthreads finish between spawns
+    @contextlib.contextmanager
+    def manager(iters):
+        pool = eventlet.GreenPool(100, recycle=recycle)
+        yield pool
+        pool.waitall()
+    return manager
+
+
+@benchmarks.configure(manager=small_pool_setup(False), max_iters=1e5)
+def benchmark_small_pool_spawn_n(pool):
+    pool.spawn_n(dummy, 1)
+
+
+@benchmarks.configure(manager=small_pool_setup(True), max_iters=1e5)
+def benchmark_small_pool_spawn_n_recycle(pool):
+    pool.spawn_n(dummy, 1)
+
+
+def map_setup(iters):
+    return contextlib.nullcontext(eventlet.GreenPool(100))
+
+
+@benchmarks.configure(manager=map_setup, max_iters=1e3)
+def benchmark_pool_imap_1000(pool):
+    for _ in pool.imap(dummy, range(1000)):
+        pass
+
+
+@benchmarks.configure(manager=map_setup, max_iters=1e3)
+def benchmark_pool_imap_unordered_1000(pool):
+    for _ in pool.imap_unordered(dummy, range(1000)):
+        pass
+
+
+@benchmarks.configure(manager=map_setup, max_iters=1e3)
+def benchmark_pool_imap_unordered_1000_chunk50(pool):
+    for _ in pool.imap_unordered(dummy, range(1000), chunksize=50):
+        pass
@@ -0,0 +1,43 @@
+'''Benchmark Timeout and TimeoutScope around code that finishes in time
+'''
+import eventlet
+from eventlet.timeout import TimeoutScope
+import benchmarks
+
+
+def benchmark_timeout():
+    with eventlet.Timeout(10):
+        pass
+
+
+def benchmark_timeout_scope():
+    with TimeoutScope(10):
+        pass
+
+
+def benchmark_timeout_nested():
+    with eventlet.Timeout(10):
+        with eventlet.Timeout(5):
+            with eventlet.Timeout(1):
+                pass
+
+
+def benchmark_timeout_scope_nested():
+    with TimeoutScope(10):
+        with TimeoutScope(5):
+            with TimeoutScope(1):
+                pass
+
+
+@benchmarks.configure(max_iters=1e5)
+def benchmark_timeout_nested_sleep():
+    with eventlet.Timeout(10):
+        with eventlet.Timeout(5):
+            eventlet.sleep()
+
+
+@benchmarks.configure(max_iters=1e5)
+def benchmark_timeout_scope_nested_sleep():
+    with TimeoutScope(10):
+        with TimeoutScope(5):
+            eventlet.sleep()
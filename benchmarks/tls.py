@@ -0,0 +1,86 @@
+'''Benchmark TLS throughput of eventlet.green.ssl over localhost
+
+A greenthread in the same process stands in for the peer, so both ends of
+the connection run on the hub.
+'''
+import contextlib
+import os
+
+import eventlet
+from eventlet.green import ssl
+import benchmarks
+
+
+CHUNK = 256 * 1024
+tests_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tests')
+certificate_file = os.path.join(tests_dir, 'test_server.crt')
+private_key_file = os.path.join(tests_dir, 'test_server.key')
+
+
+def sink(sock):
+    buf = bytearray(65536)
+    while sock.recv_into(buf):
+        pass
+
+
+def source(sock):
+    data = b'x' * CHUNK
+    try:
+        while True:
+            sock.sendall(data)
+    except OSError:
+        pass
+
+
+def tls_setup(serve, stream=False):
+    @contextlib.contextmanager
+    def manager(iters):
+        server_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        server_context.load_cert_chain(certificate_file, private_key_file)
+        client_context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+        client_context.check_hostname = False
+        client_context.verify_mode = ssl.CERT_NONE
+
+        listener = eventlet.listen(('127.0.0.1', 0))
+        server = eventlet.spawn(
+            lambda: serve(server_context.wrap_socket(listener.accept()[0], server_side=True)))
+        wrap = client_context.wrap_stream if stream else client_context.wrap_socket
+        client = wrap(eventlet.connect(listener.getsockname()))
+        yield client
+        client.close()
+        server.kill()
+        listener.close()
+    return manager
+
+
+@benchmarks.configure(manager=tls_setup(sink), max_iters=1e4)
+def benchmark_tls_sendall_256k(client):
+    client.sendall(b'x' * CHUNK)
+
+
+@benchmarks.configure(manager=tls_setup(source), max_iters=1e4)
+def benchmark_tls_recv_into_256k(client):
+    buf = bytearray(65536)
+    view = memoryview(buf)
+    received = 0
+    while received < CHUNK:
+        received += client.recv_into(view)
+
+
+@benchmarks.configure(manager=tls_setup(sink), max_iters=1e5)
+def benchmark_tls_sendall_1k(client):
+    client.sendall(b'x' * 1024)
+
+
+@benchmarks.configure(manager=tls_setup(sink, stream=True), max_iters=1e4)
+def benchmark_tls_stream_sendall_256k(client):
+    client.sendall(b'x' * CHUNK)
+
+
+@benchmarks.configure(manager=tls_setup(source, stream=True), max_iters=1e4)
+def benchmark_tls_stream_recv_into_256k(client):
+    buf = bytearray(65536)
+    view = memoryview(buf)
+    received = 0
+    while received < CHUNK:
+        received += client.recv_into(view)
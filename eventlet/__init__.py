@@ -45,6 +45,7 @@ Event = event.Event
 
 GreenPool = greenpool.GreenPool
 GreenPile = greenpool.GreenPile
+TaskGroup = greenpool.TaskGroup
 
 sleep = greenthread.sleep
 spawn = greenthread.spawn
@@ -62,6 +63,8 @@ CappedSemaphore = semaphore.CappedSemaphore
 BoundedSemaphore = semaphore.BoundedSemaphore
 
 Timeout = timeout.Timeout
+Deadline = timeout.Deadline
+DeadlineExceeded = timeout.DeadlineExceeded
 with_timeout = timeout.with_timeout
 wrap_is_timeout = timeout.wrap_is_timeout
 is_timeout = timeout.is_timeout
@@ -0,0 +1,292 @@
+"""Pools of client connections keyed by endpoint.
+
+A :class:`ConnectionPool` keeps idle connections to any number of remote
+endpoints, each identified by a ``(host, port, tls)`` tuple, so that repeated
+requests to the same service do not pay for a new TCP (and TLS) handshake
+every time::
+
+    pool = connpool.ConnectionPool(max_per_host=8, idle_timeout=30)
+    with pool.connection('example.com', 443, tls=True) as sock:
+        sock.sendall(request)
+        response = sock.recv(65536)
+
+By default the pooled objects are green sockets, wrapped with
+:mod:`eventlet.green.ssl` when *tls* is true, but the pool can manage any
+connection object, :class:`eventlet.green.http.client.HTTPConnection` for
+instance, through its *connect* argument.
+"""
+import collections
+from contextlib import contextmanager
+import errno
+import time
+
+from eventlet import hubs
+from eventlet import patcher
+from eventlet.green import socket
+from eventlet.semaphore import Semaphore
+
+
+__all__ = ['ConnectionPool', 'PoolTimeout']
+
+_original_socket = patcher.original('socket').socket
+
+
+class PoolTimeout(Exception):
+    """Raised by :meth:`ConnectionPool.get` when no connection to the
+    endpoint became available within the given timeout."""
+    pass
+
+
+def _is_dropped(sock):
+    # An idle connection has nothing to say: if it is readable, the peer
+    # either closed it or sent something nobody is going to read.  Peek at
+    # the underlying non-blocking socket rather than going through green
+    # (and possibly TLS) recv(), which would block or consume data.
+    if sock is None:
+        return True
+    try:
+        if sock.fileno() < 0:
+            return True
+    except OSError:
+        return True
+    pending = getattr(sock, 'pending', None)
+    if pending is not None and pending():
+        return True
+    raw = getattr(sock, 'fd', sock)
+    try:
+        _original_socket.recv(raw, 1, socket.MSG_PEEK | getattr(socket, 'MSG_DONTWAIT', 0))
+    except BlockingIOError:
+        return False
+    except OSError as e:
+        return e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK)
+    if pending is not None and _original_socket.gettimeout(sock) == 0.0:
+        # TLS 1.3 servers send session tickets after the handshake, which
+        # make a perfectly good connection readable; let the TLS layer
+        # process whatever records arrived and see if that leaves any data.
+        ssl = patcher.original('ssl')
+        try:
+            ssl.SSLSocket.read(sock, 1)
+        except ssl.SSLWantReadError:
+            return False
+        except OSError:
+            return True
+    return True
+
+
+class _Endpoint:
+    __slots__ = ('key', 'idle', 'active', 'slots')
+
+    def __init__(self, key, max_per_host):
+        self.key = key
+        # [connection, time it was put back] pairs, oldest first; reused from
+        # the end so that the warmest connections are the busy ones
+        self.idle = collections.deque()
+        self.active = 0
+        self.slots = Semaphore(max_per_host)
+
+
+class ConnectionPool:
+    """Pool of connections to many endpoints.
+
+    :meth:`get` hands out an idle connection to ``(host, port, tls)`` if there
+    is one, or opens a new one; :meth:`put` gives it back.  Idle connections
+    are reused most recently used first, and every one of them is checked
+    with a non-blocking peek before being handed out again: connections the
+    peer closed, or that have unexpected data waiting, are thrown away.
+
+    At most *max_per_host* connections to the same endpoint are checked out at
+    any time; further calls to :meth:`get` for that endpoint wait for one to
+    be :meth:`put` back, in the order they were made.
+
+    Connections idle for longer than *idle_timeout* seconds are closed by a
+    single hub timer shared by all endpoints; pass ``None`` to keep them
+    forever.
+
+    New connections are made by :meth:`connect`, which can be replaced by
+    passing a *connect* function taking ``(host, port, tls)``, or by
+    subclassing.  The default one connects a green socket, waiting at most
+    *connect_timeout* seconds for the TCP and TLS handshakes, and wraps it
+    with *ssl_context* when *tls* is true.  The default context comes from
+    :func:`eventlet.green.ssl.create_default_context`, with a
+    :class:`~eventlet.green.ssl.SessionCache` so that new connections to a
+    server resume the TLS session of the previous ones.
+
+    Objects returned by a custom *connect* must have a ``close()`` method,
+    and are checked for staleness through their ``sock`` attribute if they
+    have one, like ``HTTPConnection``, or as sockets themselves otherwise.
+    """
+
+    def __init__(self, max_per_host=10, idle_timeout=60, connect_timeout=None,
+                 ssl_context=None, connect=None):
+        if max_per_host < 1:
+            raise ValueError('ConnectionPool() expect max_per_host >= 1, actual: {}'.format(
+                repr(max_per_host)))
+        self.max_per_host = max_per_host
+        self.idle_timeout = idle_timeout
+        self.connect_timeout = connect_timeout
+        self._ssl_context = ssl_context
+        if connect is not None:
+            self.connect = connect
+        self._endpoints = {}
+        # checked out connection -> its _Endpoint
+        self._owners = {}
+        self._timer = None
+        self._closed = False
+        self._stats = dict.fromkeys(
+            ('created', 'reused', 'stale', 'expired', 'discarded', 'waits'), 0)
+
+    def __repr__(self):
+        return '<%s at %s endpoints=%s in_use=%s>' % (
+            self.__class__.__name__, hex(id(self)), len(self._endpoints), len(self._owners))
+
+    @property
+    def ssl_context(self):
+        if self._ssl_context is None:
+            from eventlet.green import ssl
+            self._ssl_context = ssl.create_default_context()
+            self._ssl_context.session_cache = ssl.SessionCache()
+        return self._ssl_context
+
+    def connect(self, host, port, tls):
+        """Open and return a new connection to the endpoint."""
+        sock = socket.create_connection((host, port), self.connect_timeout)
+        try:
+            if tls:
+                sock = self.ssl_context.wrap_socket(sock, server_hostname=host)
+            sock.settimeout(None)
+        except BaseException:
+            sock.close()
+            raise
+        return sock
+
+    def is_dropped(self, conn):
+        """Return true if the idle connection *conn* cannot be reused."""
+        return _is_dropped(getattr(conn, 'sock', conn))
+
+    def get(self, host, port, tls=False, timeout=None):
+        """Return a connection to ``(host, port, tls)``, waiting for one to be
+        put back if *max_per_host* of them are already checked out.  Raises
+        :exc:`PoolTimeout` if that takes longer than *timeout* seconds.
+        """
+        if self._closed:
+            raise RuntimeError('connection pool is closed')
+        key = (host, port, bool(tls))
+        endpoint = self._endpoints.get(key)
+        if endpoint is None:
+            endpoint = self._endpoints[key] = _Endpoint(key, self.max_per_host)
+        if endpoint.slots.locked():
+            self._stats['waits'] += 1
+        if not endpoint.slots.acquire(timeout=timeout):
+            self._forget(endpoint)
+            raise PoolTimeout('no connection to %s:%s available in %ss' % (host, port, timeout))
+        try:
+            conn = self._checkout(endpoint)
+        except BaseException:
+            endpoint.slots.release()
+            self._forget(endpoint)
+            raise
+        endpoint.active += 1
+        self._owners[conn] = endpoint
+        return conn
+
+    def _checkout(self, endpoint):
+        while endpoint.idle:
+            conn = endpoint.idle.pop()[0]
+            if not self.is_dropped(conn):
+                self._stats['reused'] += 1
+                return conn
+            self._stats['stale'] += 1
+            self._close(conn)
+        conn = self.connect(*endpoint.key)
+        self._stats['created'] += 1
+        return conn
+
+    def put(self, conn, reusable=True):
+        """Give back a connection obtained from :meth:`get`.  Pass
+        ``reusable=False`` if it is in an unknown state, e.g. after an error
+        in the middle of a request, so that it gets closed instead of pooled.
+        """
+        endpoint = self._owners.pop(conn, None)
+        if endpoint is None:
+            raise ValueError('%r was not checked out of this pool' % (conn,))
+        endpoint.active -= 1
+        if reusable and not self._closed:
+            endpoint.idle.append([conn, time.monotonic()])
+            if self._timer is None and self.idle_timeout is not None:
+                self._timer = hubs.get_hub().schedule_call_global(self.idle_timeout, self._expire)
+        else:
+            self._stats['discarded'] += 1
+            self._close(conn)
+        endpoint.slots.release()
+        self._forget(endpoint)
+
+    @contextmanager
+    def connection(self, host, port, tls=False, timeout=None):
+        """Context manager checking out a connection with :meth:`get`.  It is
+        put back when the block exits, or closed if the block raised."""
+        conn = self.get(host, port, tls, timeout)
+        try:
+            yield conn
+        except BaseException:
+            self.put(conn, reusable=False)
+            raise
+        self.put(conn)
+
+    def stats(self):
+        """Return a dict of counters describing the pool's activity:
+        connections ``created``, ``reused`` from the idle lists, found
+        ``stale`` on checkout, ``expired`` after *idle_timeout*, and
+        ``discarded`` when put back, the number of :meth:`get` calls that had
+        to ``wait``, and the current numbers of ``endpoints``, of connections
+        ``in_use`` and ``idle``, and of greenthreads ``waiting``.
+        """
+        stats = dict(self._stats)
+        stats['endpoints'] = len(self._endpoints)
+        stats['in_use'] = len(self._owners)
+        stats['idle'] = sum(len(e.idle) for e in self._endpoints.values())
+        stats['waiting'] = sum(max(0, -e.slots.balance) for e in self._endpoints.values())
+        return stats
+
+    def close(self):
+        """Close all idle connections.  Connections still checked out are
+        closed when they are put back, and :meth:`get` raises
+        :exc:`RuntimeError` from now on."""
+        self._closed = True
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        for endpoint in list(self._endpoints.values()):
+            while endpoint.idle:
+                self._close(endpoint.idle.pop()[0])
+            self._forget(endpoint)
+
+    def _expire(self):
+        self._timer = None
+        deadline = time.monotonic() - self.idle_timeout
+        oldest = None
+        for endpoint in list(self._endpoints.values()):
+            idle = endpoint.idle
+            while idle and idle[0][1] <= deadline:
+                self._stats['expired'] += 1
+                self._close(idle.popleft()[0])
+            if idle:
+                if oldest is None or idle[0][1] < oldest:
+                    oldest = idle[0][1]
+            else:
+                self._forget(endpoint)
+        if oldest is not None:
+            delay = max(0, oldest - deadline)
+            self._timer = hubs.get_hub().schedule_call_global(delay, self._expire)
+
+    def _forget(self, endpoint):
+        # drop bookkeeping for endpoints nobody uses, waits for or idles on
+        if (not endpoint.idle and not endpoint.active and
+                endpoint.slots.balance == self.max_per_host):
+            self._endpoints.pop(endpoint.key, None)
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
@@ -13,9 +13,13 @@ def connect(addr, family=socket.AF_INET, bind=None):
 
     :param addr: Address of the server to connect to.  For TCP sockets, this is a (host, port) tuple.
     :param family: Socket family, optional.  See :mod:`socket` documentation for available families.
+        With ``socket.AF_UNSPEC``, the host is resolved to both IPv6 and IPv4 addresses, which are raced
+        against each other as described in :func:`eventlet.green.socket.create_connection`.
     :param bind: Local address to bind to, optional.
     :return: The connected green socket object.
     """
+    if family == socket.AF_UNSPEC:
+        return socket.create_connection(addr, source_address=bind)
     sock = socket.socket(family, socket.SOCK_STREAM)
     if bind is not None:
         sock.bind(bind)
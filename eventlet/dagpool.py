@@ -5,7 +5,10 @@
 
 from eventlet.event import Event
 from eventlet import greenthread
+from eventlet import hubs
 import collections
+import heapq
+import itertools
 
 
 # value distinguished from any other Python value including None
@@ -52,6 +55,87 @@ class PropagateError(Exception):
         return self.msg
 
 
+class _Waiter:
+    """
+    A greenthread iterating over wait_each() that is still waiting for some
+    keys. post() hands it each of those keys as it gets a value.
+    """
+    __slots__ = ("ready", "event")
+
+    def __init__(self):
+        self.ready = []
+        self.event = Event()
+
+    def notify(self, key):
+        self.ready.append(key)
+        if not self.event.ready():
+            self.event.send()
+
+    def wait(self):
+        self.event.wait()
+        self.event = Event()
+        ready, self.ready = self.ready, []
+        return ready
+
+
+class _Node:
+    """
+    A greenthread of a lazy DAGPool that has not been started yet. 'unmet'
+    is the set of keys it depends on that have no value yet.
+    """
+    __slots__ = ("pool", "key", "depends", "unmet", "function", "args", "kwds")
+
+    def __init__(self, pool, key, depends, function, args, kwds):
+        self.pool = pool
+        self.key = key
+        self.depends = depends
+        self.unmet = set()
+        self.function = function
+        self.args = args
+        self.kwds = kwds
+
+    def notify(self, key):
+        self.unmet.discard(key)
+        if not self.unmet:
+            self.pool._make_ready(self)
+
+
+def critical_path(depends):
+    """
+    *depends* is a dependency dict, as passed to :meth:`DAGPool.spawn_many`.
+    critical_path() returns a dict giving, for each key, the number of keys
+    on the longest chain made of that key, a key that depends on it, a key
+    that depends on that one, and so forth. Keys involved in a dependency
+    cycle are left out.
+
+    Starting the greenthreads with the longest chains first tends to
+    shorten the total run time of a :class:`DAGPool` limited by *size*::
+
+        lengths = critical_path(depends)
+        pool = DAGPool(size=8, order=lambda key: -lengths.get(key, 0))
+        pool.spawn_many(depends, build)
+    """
+    depends = {key: set(deps) for key, deps in depends.items()}
+    dependents = collections.defaultdict(list)
+    for key, deps in depends.items():
+        for dep in deps:
+            dependents[dep].append(key)
+    # walk back from the keys nothing depends on
+    remaining = {key: len(dependents.get(key, ()))
+                 for key in itertools.chain(depends, dependents)}
+    todo = [key for key, count in remaining.items() if not count]
+    lengths = {}
+    while todo:
+        key = todo.pop()
+        lengths[key] = 1 + max((lengths[dependent] for dependent in dependents.get(key, ())),
+                               default=0)
+        for dep in depends.get(key, ()):
+            remaining[dep] -= 1
+            if not remaining[dep]:
+                todo.append(dep)
+    return lengths
+
+
 class DAGPool:
     """
     A DAGPool is a pool that constrains greenthreads, not by max concurrency,
@@ -103,6 +187,15 @@ class DAGPool:
     External greenthreads may also interact with a DAGPool. See :meth:`wait_each`,
     :meth:`waitall`, :meth:`post`.
 
+    A *lazy* DAGPool instead starts each greenthread only once all the keys
+    it depends on have values, so that a large DAG does not keep a
+    greenthread parked for every node still waiting on its inputs. Its
+    *results* iterable then delivers every value without blocking. A lazy
+    DAGPool can also limit the number of greenthreads running at once to
+    *size*; among the greenthreads whose inputs are ready, those with the
+    smallest *order(key)* start first, in the order of their :meth:`spawn`
+    calls otherwise. See :func:`critical_path`.
+
     It is not recommended to constrain external DAGPool producer greenthreads
     in a :class:`GreenPool <eventlet.greenpool.GreenPool>`: it may be hard to
     provably avoid deadlock.
@@ -113,12 +206,21 @@ class DAGPool:
 
     _Coro = collections.namedtuple("_Coro", ("greenthread", "pending"))
 
-    def __init__(self, preload={}):
+    def __init__(self, preload={}, lazy=False, size=None, order=None):
         """
         DAGPool can be prepopulated with an initial dict or iterable of (key,
         value) pairs. These (key, value) pairs are of course immediately
         available for any greenthread that depends on any of those keys.
+
+        With *lazy*, a greenthread is only started once the keys it depends
+        on all have values. *size* limits the number of greenthreads
+        running at once, and implies *lazy*: a greenthread blocked on its
+        inputs must not hold a place that the greenthread producing them
+        needs. *order* is a function of a key, used as the sort key of the
+        greenthreads waiting to start.
         """
+        if size is not None and size < 1:
+            raise ValueError("DAGPool() expect size >= 1, actual: {!r}".format(size))
         try:
             # If a dict is passed, copy it. Don't risk a subsequent
             # modification to passed dict affecting our internal state.
@@ -133,8 +235,19 @@ class DAGPool:
         # track greenthreads
         self.coros = {}
 
-        # The key to blocking greenthreads is the Event.
-        self.event = Event()
+        # For each key without a value, the _Waiter and _Node objects to
+        # notify when it gets one.
+        self._watchers = {}
+
+        self.lazy = lazy or size is not None
+        self.size = size
+        self.order = order
+        # greenthreads of a lazy DAGPool that have not started, by key
+        self._deferred = {}
+        # heap of (order, sequence, _Node) ready to start
+        self._ready = []
+        self._sequence = itertools.count()
+        self._dispatching = False
 
     def waitall(self):
         """
@@ -257,7 +370,7 @@ class DAGPool:
             return set(keys)
         else:
             # keys arg omitted -- use all the keys we know about
-            return set(self.coros.keys()) | set(self.values.keys())
+            return set(self.coros.keys()) | set(self.values.keys()) | set(self._deferred.keys())
 
     def _wait_each(self, pending):
         """
@@ -287,23 +400,41 @@ class DAGPool:
 
         In all other respects, _wait_each_raw() behaves like wait_each().
         """
-        while True:
-            # Before even waiting, show caller any (key, value) pairs that
-            # are already available. Copy 'pending' because we want to be able
-            # to remove items from the original set while iterating.
-            for key in pending.copy():
-                value = self.values.get(key, _MISSING)
-                if value is not _MISSING:
-                    # found one, it's no longer pending
-                    pending.remove(key)
-                    yield (key, value)
-
-            if not pending:
-                # Once we've yielded all the caller's keys, done.
-                break
-
-            # There are still more keys pending, so wait.
-            self.event.wait()
+        # Before even waiting, show caller any (key, value) pairs that are
+        # already available. For the others, ask post() to tell us when they
+        # get a value rather than checking all of them on every post().
+        ready = []
+        waiter = None
+        for key in pending:
+            if key in self.values:
+                ready.append(key)
+            else:
+                if waiter is None:
+                    waiter = _Waiter()
+                self._watchers.setdefault(key, set()).add(waiter)
+        try:
+            while True:
+                for key in ready:
+                    if key in pending:
+                        # found one, it's no longer pending
+                        pending.remove(key)
+                        yield (key, self.values[key])
+
+                if not pending:
+                    # Once we've yielded all the caller's keys, done.
+                    break
+
+                # There are still more keys pending, so wait.
+                ready = waiter.wait()
+        finally:
+            # forget about the keys a closed generator was still waiting for
+            if waiter is not None:
+                for key in pending:
+                    watchers = self._watchers.get(key)
+                    if watchers is not None:
+                        watchers.discard(waiter)
+                        if not watchers:
+                            del self._watchers[key]
 
     def spawn(self, key, depends, function, *args, **kwds):
         """
@@ -333,10 +464,26 @@ class DAGPool:
 
         If you pass :meth:`spawn` a key already passed to spawn() or :meth:`post`, spawn()
         raises :class:`Collision`.
+
+        In a :class:`lazy <DAGPool>` DAGPool, the greenthread only starts
+        once all keys in *depends* have values.
         """
-        if key in self.coros or key in self.values:
+        if key in self.coros or key in self.values or key in self._deferred:
             raise Collision(key)
 
+        if self.lazy:
+            node = _Node(self, key, set(depends), function, args, kwds)
+            self._deferred[key] = node
+            for dep in node.depends:
+                if dep not in self.values:
+                    node.unmet.add(dep)
+                    self._watchers.setdefault(dep, set()).add(node)
+            if not node.unmet:
+                self._make_ready(node)
+        else:
+            self._start(key, depends, function, args, kwds)
+
+    def _start(self, key, depends, function, args, kwds):
         # The order is a bit tricky. First construct the set() of keys.
         pending = set(depends)
         # It's important that we pass to _wait_each() the same 'pending' set()
@@ -365,6 +512,8 @@ class DAGPool:
             # longer need to track this greenthread in self.coros. Remove it
             # first so post() won't complain about a running greenthread.
             del self.coros[key]
+            # this may let a lazy greenthread start
+            self._schedule_dispatch()
 
         try:
             # as advertised, try to post() our return value
@@ -376,6 +525,30 @@ class DAGPool:
         # also, in case anyone cares...
         return result
 
+    def _make_ready(self, node):
+        order = self.order(node.key) if self.order is not None else 0
+        heapq.heappush(self._ready, (order, next(self._sequence), node))
+        self._schedule_dispatch()
+
+    def _schedule_dispatch(self):
+        # Start greenthreads from the hub, once the current greenthread
+        # yields: spawn_many() and post() don't suspend, and all the
+        # greenthreads they make ready are started in order.
+        if self._ready and not self._dispatching:
+            self._dispatching = True
+            hubs.get_hub().run_soon(self._dispatch)
+
+    def _dispatch(self):
+        self._dispatching = False
+        ready = self._ready
+        while ready and (self.size is None or len(self.coros) < self.size):
+            node = heapq.heappop(ready)[2]
+            if self._deferred.get(node.key) is not node:
+                # killed before it started
+                continue
+            del self._deferred[node.key]
+            self._start(node.key, node.depends, node.function, node.args, node.kwds)
+
     def spawn_many(self, depends, function, *args, **kwds):
         """
         spawn_many() accepts a single *function* whose parameters are the same
@@ -401,11 +574,25 @@ class DAGPool:
         Kill the greenthread that was spawned with the specified *key*.
 
         If no such greenthread was spawned, raise KeyError.
-        """
+
+        A greenthread of a lazy DAGPool that has not started yet will not
+        start.
+        """
+        node = self._deferred.pop(key, None)
+        if node is not None:
+            # stop watching the keys it was waiting for
+            for dep in node.unmet:
+                watchers = self._watchers.get(dep)
+                if watchers is not None:
+                    watchers.discard(node)
+                    if not watchers:
+                        del self._watchers[dep]
+            return
         # let KeyError, if any, propagate
         self.coros[key].greenthread.kill()
         # once killed, remove it
-        del self.coros[key]
+        self.coros.pop(key, None)
+        self._schedule_dispatch()
 
     def post(self, key, value, replace=False):
         """
@@ -456,6 +643,9 @@ class DAGPool:
             # oh oh, trying to post a value for running greenthread from
             # some other greenthread
             raise Collision(key)
+        if key in self._deferred:
+            # nor for one that has yet to start
+            raise Collision(key)
 
         # Here, either we're posting a value for a key with no greenthread or
         # we're posting from that greenthread itself.
@@ -470,12 +660,9 @@ class DAGPool:
 
         # update our database
         self.values[key] = value
-        # and wake up pending waiters
-        self.event.send()
-        # The comment in Event.reset() says: "it's better to create a new
-        # event rather than reset an old one". Okay, fine. We do want to be
-        # able to support new waiters, so create a new Event.
-        self.event = Event()
+        # and wake up the waiters for this key
+        for watcher in self._watchers.pop(key, ()):
+            watcher.notify(key)
 
     def __getitem__(self, key):
         """
@@ -517,6 +704,9 @@ class DAGPool:
         Return number of running DAGPool greenthreads. This includes
         greenthreads blocked while iterating through their *results* iterable,
         that is, greenthreads waiting on values from other keys.
+
+        Greenthreads of a lazy DAGPool that have not started yet are not
+        running.
         """
         return len(self.coros)
 
@@ -533,7 +723,8 @@ class DAGPool:
     def waiting(self):
         """
         Return number of waiting DAGPool greenthreads, that is, greenthreads
-        still waiting on values from other keys. This explicitly does *not*
+        still waiting on values from other keys, whether or not they have
+        started. This explicitly does *not*
         include external greenthreads waiting on :meth:`wait`,
         :meth:`waitall`, :meth:`wait_each`.
         """
@@ -571,6 +762,10 @@ class DAGPool:
         if key is not _MISSING:
             # waiting_for(key) is semantically different than waiting_for().
             # It's just that they both seem to want the same method name.
+            node = self._deferred.get(key)
+            if node is not None:
+                # a lazy greenthread that has not started yet
+                return node.unmet - available
             coro = self.coros.get(key, _MISSING)
             if coro is _MISSING:
                 # Hmm, no running greenthread with this key. But was there
@@ -594,8 +789,12 @@ class DAGPool:
         # the greenthread believes it's waiting, minus the set of keys that
         # are now available. Filter out any pair in which 'pending' is empty,
         # that is, that greenthread will be unblocked next time it resumes.
-        # Make a dict from those pairs.
-        return {key: pending
-                for key, pending in ((key, (coro.pending - available))
-                                     for key, coro in self.coros.items())
-                if pending}
+        # Make a dict from those pairs, adding the lazy greenthreads that
+        # have not started yet.
+        waiting = {key: pending
+                   for key, pending in ((key, (coro.pending - available))
+                                        for key, coro in self.coros.items())
+                   if pending}
+        waiting.update((key, node.unmet - available)
+                       for key, node in self._deferred.items() if node.unmet)
+        return waiting
@@ -1,7 +1,10 @@
-from collections import deque
+from collections import deque, OrderedDict
 from contextlib import contextmanager
+import heapq
+import itertools
 import sys
 import time
+import weakref
 
 from eventlet.pools import Pool
 from eventlet import timeout
@@ -17,6 +20,117 @@ class ConnectTimeout(Exception):
     pass
 
 
+class _ExpirationScheduler:
+    """Runs the expiration of connections of all the pools of a hub from a
+    single timer.
+
+    Pools register the time at which their next connection may expire;
+    the scheduler keeps these in a heap and sweeps each pool when its time
+    comes.  A pool that registers again replaces its previous entry, which
+    is then skipped.
+    """
+
+    def __init__(self, hub):
+        self.hub = hub
+        # (deadline, sequence number, weakref to pool)
+        self._heap = []
+        self._counter = itertools.count()
+        self._timer = None
+        self._timer_deadline = None
+
+    def schedule(self, pool, deadline):
+        pool._expiration_deadline = deadline
+        heapq.heappush(self._heap, (deadline, next(self._counter), weakref.ref(pool)))
+        if self._timer_deadline is None or deadline < self._timer_deadline:
+            self._set_timer(deadline)
+
+    def _set_timer(self, deadline):
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer_deadline = deadline
+        # run the sweep in its own greenthread: closing connections may block
+        self._timer = Timer(max(0, deadline - time.time()), GreenThread(self.hub.greenlet).switch,
+                            self._run, [], {})
+        self._timer.schedule()
+
+    def _run(self):
+        self._timer = self._timer_deadline = None
+        heap = self._heap
+        while heap and heap[0][0] <= time.time():
+            deadline, _, ref = heapq.heappop(heap)
+            pool = ref()
+            if pool is not None and pool._expiration_deadline == deadline:
+                pool._expiration_deadline = None
+                pool._schedule_expiration()
+        while heap and heap[0][2]() is None:
+            heapq.heappop(heap)
+        if heap and (self._timer_deadline is None or heap[0][0] < self._timer_deadline):
+            self._set_timer(heap[0][0])
+
+
+# hub -> its _ExpirationScheduler
+_schedulers = weakref.WeakKeyDictionary()
+
+
+def _get_scheduler():
+    hub = hubs.get_hub()
+    scheduler = _schedulers.get(hub)
+    if scheduler is None:
+        scheduler = _schedulers[hub] = _ExpirationScheduler(hub)
+    return scheduler
+
+
+class _FreeItems:
+    """The free items of a connection pool: a deque, as far as
+    :class:`eventlet.pools.Pool` is concerned, from which any item can also
+    be removed in constant time.  Membership is by identity.
+    """
+
+    def __init__(self, items=()):
+        # id(item) -> item, leftmost first
+        self._items = OrderedDict()
+        for item in items:
+            self.append(item)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(list(self._items.values()))
+
+    def __contains__(self, item):
+        return self._items.get(id(item)) is item
+
+    def __getitem__(self, index):
+        if index == 0 and self._items:
+            return next(iter(self._items.values()))
+        if index == -1 and self._items:
+            return next(reversed(self._items.values()))
+        raise IndexError(index)
+
+    def append(self, item):
+        self._items[id(item)] = item
+
+    def appendleft(self, item):
+        self._items[id(item)] = item
+        self._items.move_to_end(id(item), last=False)
+
+    def pop(self):
+        if not self._items:
+            raise IndexError('pop from an empty deque')
+        return self._items.popitem()[1]
+
+    def popleft(self):
+        if not self._items:
+            raise IndexError('pop from an empty deque')
+        return self._items.popitem(last=False)[1]
+
+    def remove(self, item):
+        if item not in self:
+            raise ValueError('item not in free items')
+        del self._items[id(item)]
+
+
 def cleanup_rollback(conn):
     conn.rollback()
 
@@ -27,6 +141,7 @@ class BaseConnectionPool(Pool):
                  max_idle=10, max_age=30,
                  connect_timeout=5,
                  cleanup=cleanup_rollback,
+                 statement_cache_size=32,
                  *args, **kwargs):
         """
         Constructs a pool with at least *min_size* connections and at most
@@ -45,6 +160,11 @@ class BaseConnectionPool(Pool):
         before timing out on connect() to the database.  If triggered, the
         timeout will raise a ConnectTimeout from get().
 
+        *statement_cache_size* is how many cursors, one per distinct
+        statement, :class:`PooledCursor` keeps open on each connection, so
+        that drivers preparing statements per cursor only prepare them once;
+        0 disables the cache.
+
         The remainder of the arguments are used as parameters to the
         *db_module*'s connection constructor.
         """
@@ -55,80 +175,110 @@ class BaseConnectionPool(Pool):
         self.max_idle = max_idle
         self.max_age = max_age
         self.connect_timeout = connect_timeout
-        self._expiration_timer = None
+        # when this pool's next connection may expire, as registered with the
+        # shared _ExpirationScheduler
+        self._expiration_deadline = None
+        # free connections are ordered by last use in free_items; this heap
+        # of (created_at, sequence number, free item) orders them by age,
+        # items that left free_items being skipped
+        self._ages = []
+        self._counter = itertools.count()
         self.cleanup = cleanup
+        self.statement_cache_size = statement_cache_size
+        # id(pooled connection) -> OrderedDict of statement -> idle cursor,
+        # dropped when the pool closes or forgets the connection
+        self._statements = {}
         super().__init__(min_size=min_size, max_size=max_size, order_as_stack=True)
+        self._stats.update(dict.fromkeys(
+            ('expired_idle', 'expired_age', 'cleanup_failures', 'connect_failures'), 0))
+        self.free_items = _FreeItems(self.free_items)
+        for item in self.free_items:
+            self._index_free(item)
+
+    def _index_free(self, item):
+        heapq.heappush(self._ages, (item[1], next(self._counter), item))
 
     def _schedule_expiration(self):
-        """Sets up a timer that will call _expire_old_connections when the
-        oldest connection currently in the free pool is ready to expire.  This
-        is the earliest possible time that a connection could expire, thus, the
-        timer will be running as infrequently as possible without missing a
-        possible expiration.
+        """Expires old connections, then makes sure that the pool is swept
+        again when the next free connection is ready to expire.  This is the
+        earliest possible time that a connection could expire, thus, the
+        pool is swept as infrequently as possible without missing a possible
+        expiration.
 
-        If this function is called when a timer is already scheduled, it does
-        nothing.
+        The sweeps of all the pools are driven by a single timer.
 
-        If max_age or max_idle is 0, _schedule_expiration likewise does nothing.
+        If max_age or max_idle is 0, _schedule_expiration does nothing.
         """
         if self.max_age == 0 or self.max_idle == 0:
             # expiration is unnecessary because all connections will be expired
             # on put
             return
 
-        if (self._expiration_timer is not None
-                and not getattr(self._expiration_timer, 'called', False)):
-            # the next timer is already scheduled
-            return
-
-        try:
-            now = time.time()
-            self._expire_old_connections(now)
-            # the last item in the list, because of the stack ordering,
-            # is going to be the most-idle
-            idle_delay = (self.free_items[-1][0] - now) + self.max_idle
-            oldest = min([t[1] for t in self.free_items])
-            age_delay = (oldest - now) + self.max_age
-
-            next_delay = min(idle_delay, age_delay)
-        except (IndexError, ValueError):
-            # no free items, unschedule ourselves
-            self._expiration_timer = None
+        now = time.time()
+        self._expire_old_connections(now)
+        if not self.free_items:
             return
-
-        if next_delay > 0:
-            # set up a continuous self-calling loop
-            self._expiration_timer = Timer(next_delay, GreenThread(hubs.get_hub().greenlet).switch,
-                                           self._schedule_expiration, [], {})
-            self._expiration_timer.schedule()
+        # the last item in the list, because of the stack ordering,
+        # is going to be the most-idle
+        deadline = self.free_items[-1][0] + self.max_idle
+        if self._ages:
+            deadline = min(deadline, self._ages[0][0] + self.max_age)
+        if self._expiration_deadline is None or deadline < self._expiration_deadline:
+            _get_scheduler().schedule(self, deadline)
 
     def _expire_old_connections(self, now):
-        """Iterates through the open connections contained in the pool, closing
-        ones that have remained idle for longer than max_idle seconds, or have
-        been in existence for longer than max_age seconds.
+        """Closes the free connections that have remained idle for longer
+        than max_idle seconds, or have been in existence for longer than
+        max_age seconds.  Takes time proportional to the number of expired
+        connections.
 
         *now* is the current time, as returned by time.time().
         """
-        original_count = len(self.free_items)
-        expired = [
-            conn
-            for last_used, created_at, conn in self.free_items
-            if self._is_expired(now, last_used, created_at)]
-
-        new_free = [
-            (last_used, created_at, conn)
-            for last_used, created_at, conn in self.free_items
-            if not self._is_expired(now, last_used, created_at)]
-        self.free_items.clear()
-        self.free_items.extend(new_free)
+        free_items = self.free_items
+        expired = []
+        while free_items and now - free_items[-1][0] > self.max_idle:
+            item = free_items.pop()
+            expired.append(item[2])
+            self._stats['expired_idle'] += 1
+
+        ages = self._ages
+        while ages and (now - ages[0][0] > self.max_age or ages[0][2] not in free_items):
+            item = heapq.heappop(ages)[2]
+            if item in free_items:
+                free_items.remove(item)
+                expired.append(item[2])
+                self._stats['expired_age'] += 1
+        if len(ages) > 2 * len(free_items) + 16:
+            # too many entries of connections that were taken since
+            ages[:] = [entry for entry in ages if entry[2] in free_items]
+            heapq.heapify(ages)
 
         # adjust the current size counter to account for expired
         # connections
-        self.current_size -= original_count - len(self.free_items)
+        self.current_size -= len(expired)
+        self._stats['expired'] += len(expired)
 
         for conn in expired:
             self._safe_close(conn, quiet=True)
 
+    def stats(self):
+        """Return the counters of :meth:`eventlet.pools.Pool.stats`, along
+        with connections expired for being idle for too long
+        (``expired_idle``) or too old (``expired_age``), failed attempts to
+        connect (``connect_failures``) and connections dropped because
+        cleanup failed (``cleanup_failures``), and the time in seconds for
+        which the most idle free connection has been idle (``oldest_idle``)
+        and the oldest free connection exists (``oldest_age``).
+        """
+        stats = super().stats()
+        now = time.time()
+        stats['oldest_idle'] = now - self.free_items[-1][0] if self.free_items else 0
+        ages = self._ages
+        while ages and ages[0][2] not in self.free_items:
+            heapq.heappop(ages)
+        stats['oldest_age'] = now - ages[0][0] if ages else 0
+        return stats
+
     def _is_expired(self, now, last_used, created_at):
         """Returns true and closes the connection if it's expired.
         """
@@ -160,6 +310,7 @@ class BaseConnectionPool(Pool):
         """Closes the (already unwrapped) connection, squelching any
         exceptions.
         """
+        self._statements.pop(id(conn), None)
         try:
             conn.close()
         except AttributeError:
@@ -169,7 +320,11 @@ class BaseConnectionPool(Pool):
                 print("Connection.close raised: %s" % (sys.exc_info()[1]))
 
     def get(self):
-        conn = super().get()
+        try:
+            conn = super().get()
+        except Exception:
+            self._stats['connect_failures'] += 1
+            raise
 
         # None is a flag value that means that put got called with
         # something it couldn't use
@@ -182,6 +337,7 @@ class BaseConnectionPool(Pool):
                 # would incur a greenlib switch and thus lose the
                 # exception stack
                 self.current_size -= 1
+                self._stats['connect_failures'] += 1
                 raise
 
         # if the call to get() draws from the free pool, it will come
@@ -219,13 +375,20 @@ class BaseConnectionPool(Pool):
                 # we don't care what the exception was, we just know the
                 # connection is dead
                 print("WARNING: cleanup %s raised: %s" % (cleanup, e))
+                self._stats['cleanup_failures'] += 1
+                self._statements.pop(id(conn), None)
                 conn = None
             except:
+                self._statements.pop(id(conn), None)
                 conn = None
                 raise
 
         if conn is not None:
-            super().put((now, created_at, conn))
+            item = (now, created_at, conn)
+            super().put(item)
+            if self.free_items and self.free_items[0] is item:
+                # not handed over to a waiter
+                self._index_free(item)
         else:
             # wake up any waiters with a flag value that indicates
             # they need to manufacture a connection
@@ -244,13 +407,43 @@ class BaseConnectionPool(Pool):
         finally:
             self.put(conn, cleanup=cleanup)
 
+    def _dispatch(self, func, *args):
+        """Call *func* with *args* on behalf of :class:`PooledCursor`; pools
+        of blocking connections run it in a native thread."""
+        return func(*args)
+
+    def _raw_connection(self, conn):
+        """Return the driver's own connection object behind pooled *conn*."""
+        return conn
+
+    def _checkout_statement(self, conn, statement):
+        cache = self._statements.get(id(conn))
+        if cache is None:
+            return None
+        return cache.pop(statement, None)
+
+    def _checkin_statement(self, conn, statement, cursor):
+        # Returns the cursor that has to be closed, if any: the one given
+        # back if it can't be cached, or the least recently used one.
+        if self.statement_cache_size <= 0:
+            return cursor
+        cache = self._statements.get(id(conn))
+        if cache is None:
+            cache = self._statements[id(conn)] = OrderedDict()
+        if statement in cache:
+            return cursor
+        cache[statement] = cursor
+        if len(cache) > self.statement_cache_size:
+            return cache.popitem(last=False)[1]
+        return None
+
     def clear(self):
         """Close all connections that this pool still holds a reference to,
         and removes all references to them.
         """
-        if self._expiration_timer:
-            self._expiration_timer.cancel()
-        free_items, self.free_items = self.free_items, deque()
+        self._expiration_deadline = None
+        self._ages = []
+        free_items, self.free_items = self.free_items, _FreeItems()
         for item in free_items:
             # Free items created using min_size>0 are not tuples.
             conn = item[2] if isinstance(item, tuple) else item
@@ -271,6 +464,13 @@ class TpooledConnectionPool(BaseConnectionPool):
         return now, now, self.connect(
             self._db_module, self.connect_timeout, *self._args, **self._kwargs)
 
+    def _dispatch(self, func, *args):
+        from eventlet import tpool
+        return tpool.execute(func, *args)
+
+    def _raw_connection(self, conn):
+        return conn._obj
+
     @classmethod
     def connect(cls, db_module, connect_timeout, *args, **kw):
         t = timeout.Timeout(connect_timeout, ConnectTimeout())
@@ -398,6 +598,11 @@ class PooledConnectionWrapper(GenericConnectionWrapper):
         except AttributeError:
             pass
 
+    def pooled_cursor(self, arraysize=100):
+        """Return a :class:`PooledCursor` fetching *arraysize* rows at a
+        time."""
+        return PooledCursor(self._pool, self._base, arraysize)
+
     def close(self):
         """Return the connection to the pool, and remove the
         reference to it so that you can't use it again through this
@@ -413,6 +618,161 @@ class PooledConnectionWrapper(GenericConnectionWrapper):
         # self.close()
 
 
+def _close_quietly(cursor):
+    try:
+        cursor.close()
+    except Exception:
+        pass
+
+
+def _execute(conn, cursor, stale, method, statement, args, size, cached):
+    # Runs in one go (in a native thread for tpooled connections): closes
+    # the previous statement's unfinished cursor, executes the statement
+    # and fetches the first rows.
+    if stale is not None:
+        _close_quietly(stale)
+    if cursor is None:
+        cursor = conn.cursor()
+    try:
+        if args is None:
+            getattr(cursor, method)(statement)
+        else:
+            getattr(cursor, method)(statement, args)
+        description = cursor.description
+        rows = cursor.fetchmany(size) if description is not None else ()
+    except BaseException:
+        _close_quietly(cursor)
+        raise
+    done = description is None or len(rows) < size
+    if done and not cached:
+        cursor.close()
+    return cursor, rows, done, description, cursor.rowcount, getattr(cursor, 'lastrowid', None)
+
+
+def _fetch(cursor, size, cached):
+    rows = cursor.fetchall() if size is None else cursor.fetchmany(size)
+    done = size is None or len(rows) < size
+    if done and not cached:
+        cursor.close()
+    return rows, done
+
+
+class PooledCursor:
+    """A cursor of a pooled connection that goes to the database as rarely
+    as possible, meant for :class:`TpooledConnectionPool` where each call
+    is a round trip to a native thread.
+
+    :meth:`execute` runs the statement and fetches the first *arraysize*
+    rows in a single call, and further rows are fetched *arraysize* at a
+    time, so iterating over a cursor streams large results in chunks while
+    :meth:`fetchone` and :meth:`fetchmany` are mostly served from memory::
+
+        with pool.item() as conn:
+            with conn.pooled_cursor(arraysize=500) as cursor:
+                cursor.execute('SELECT id, total FROM orders WHERE day = %s', (day,))
+                for id, total in cursor:
+                    report.add(id, total)
+
+    The driver's cursor for each statement is kept open on the connection
+    once its results were read (see *statement_cache_size* of
+    :class:`BaseConnectionPool`), and reused when the same statement is
+    executed again.
+    """
+
+    def __init__(self, pool, conn, arraysize=100):
+        self._pool = pool
+        self._conn = conn
+        self.arraysize = arraysize
+        self._cursor = None
+        self._statement = None
+        self._rows = deque()
+        self._done = True
+        self._cached = pool.statement_cache_size > 0
+        self.description = None
+        self.rowcount = -1
+        self.lastrowid = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, typ, val, tb):
+        self.close()
+
+    def execute(self, statement, args=None):
+        """Execute *statement* and fetch the first rows of its result."""
+        return self._execute('execute', statement, args, self.arraysize)
+
+    def executemany(self, statement, seq_of_args):
+        """Execute *statement* for each item of *seq_of_args*."""
+        return self._execute('executemany', statement, seq_of_args, 0)
+
+    def fetchone(self):
+        if not self._rows and not self._done:
+            self._fetch(self.arraysize)
+        return self._rows.popleft() if self._rows else None
+
+    def fetchmany(self, size=None):
+        if size is None:
+            size = self.arraysize
+        if len(self._rows) < size and not self._done:
+            self._fetch(max(size - len(self._rows), self.arraysize))
+        rows = self._rows
+        return [rows.popleft() for _ in range(min(size, len(rows)))]
+
+    def fetchall(self):
+        if not self._done:
+            self._fetch(None)
+        rows = list(self._rows)
+        self._rows.clear()
+        return rows
+
+    def __iter__(self):
+        rows = self._rows
+        while True:
+            while rows:
+                yield rows.popleft()
+            if self._done:
+                return
+            self._fetch(self.arraysize)
+
+    def close(self):
+        """Close the cursor, discarding unread rows."""
+        self._rows.clear()
+        cursor, self._cursor = self._cursor, None
+        if cursor is not None:
+            self._done = True
+            self._pool._dispatch(cursor.close)
+
+    def _execute(self, method, statement, args, size):
+        self._rows.clear()
+        stale, self._cursor = self._cursor, None
+        cursor = self._pool._checkout_statement(self._conn, statement) if self._cached else None
+        (cursor, rows, self._done, self.description, self.rowcount,
+         self.lastrowid) = self._pool._dispatch(
+            _execute, self._pool._raw_connection(self._conn), cursor, stale,
+            method, statement, args, size, self._cached)
+        self._cursor = cursor
+        self._statement = statement
+        self._rows.extend(rows)
+        if self._done:
+            self._finish()
+        return self.rowcount
+
+    def _fetch(self, size):
+        rows, self._done = self._pool._dispatch(_fetch, self._cursor, size, self._cached)
+        self._rows.extend(rows)
+        if self._done:
+            self._finish()
+
+    def _finish(self):
+        cursor, self._cursor = self._cursor, None
+        if self._cached:
+            cursor = self._pool._checkin_statement(self._conn, self._statement, cursor)
+            if cursor is not None:
+                # evicted from the cache, or a duplicate of a cached one
+                self._pool._dispatch(_close_quietly, cursor)
+
+
 class DatabaseConnector:
     """
     This is an object which will maintain a collection of database
@@ -1,6 +1,8 @@
 """The debug module contains utilities and functions for better
 debugging Eventlet-powered applications."""
 
+import collections
+import gc
 import os
 import sys
 import linecache
@@ -11,7 +13,8 @@ __all__ = ['spew', 'unspew', 'format_hub_listeners', 'format_hub_timers',
            'hub_listener_stacks', 'hub_exceptions', 'tpool_exceptions',
            'hub_prevent_multiple_readers', 'hub_timer_stacks',
            'hub_blocking_detection', 'format_asyncio_info',
-           'format_threads_info']
+           'format_threads_info', 'greenthread_spawn_sites',
+           'format_greenthreads']
 
 _token_splitter = re.compile(r'\W+')
 
@@ -124,6 +127,54 @@ def format_hub_timers():
     result = ['TIMERS:']
     for l in hub.timers:
         result.append(repr(l))
+    result.append('RUN QUEUE:')
+    for _due, cb, args, kw in hub.run_queue:
+        result.append(repr(cb) if not args and not kw else '%r(*%r, **%r)' % (cb, args, kw))
+    return os.linesep.join(result)
+
+
+def greenthread_spawn_sites(state=False):
+    """Toggles whether or not greenthreads record the place in the
+    application code where they were spawned.  To count the live greenthreads
+    by spawn site, call :func:`format_greenthreads`.
+    """
+    from eventlet import greenthread
+    greenthread._g_debug = state
+
+
+def format_greenthreads(details=False):
+    """ Returns a formatted string counting the live greenthreads, and the
+    bytes of C stack that greenlet keeps aside for them while they don't run,
+    grouped by the place they were spawned from (see
+    :func:`greenthread_spawn_sites`).  With *details*, each greenthread is
+    listed as well.  This can be useful in finding out what keeps memory busy
+    when there are many greenthreads waiting.
+
+    It walks through every object known to the garbage collector: do not call
+    it on a hot path.
+    """
+    import greenlet
+    sites = collections.defaultdict(list)
+    for obj in gc.get_objects():
+        if not isinstance(obj, greenlet.greenlet) or obj.dead or obj.parent is None:
+            continue
+        sites[getattr(obj, '_spawn_site', None)].append(obj)
+
+    def stack(g):
+        # not exposed by every version of greenlet
+        return getattr(g, '_stack_saved', 0)
+
+    def site_name(site):
+        return '(unknown)' if site is None else '%s:%s in %s' % site
+
+    total = sum(stack(g) for gs in sites.values() for g in gs)
+    result = ['GREENTHREADS: %d live, %d bytes of saved stacks' % (
+        sum(len(gs) for gs in sites.values()), total)]
+    for site, gs in sorted(sites.items(), key=lambda item: -len(item[1])):
+        result.append('%6d %10d bytes  %s' % (len(gs), sum(stack(g) for g in gs), site_name(site)))
+        if details:
+            for g in gs:
+                result.append('       %10d bytes  %r' % (stack(g), g))
     return os.linesep.join(result)
 
 
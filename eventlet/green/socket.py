@@ -1,3 +1,5 @@
+import collections
+import itertools
 import os
 import sys
 
@@ -26,6 +28,16 @@ if os.environ.get("EVENTLET_NO_GREENDNS", '').lower() != 'yes':
     del greendns
 
 
+# Time to wait for a connection attempt before starting the next one in
+# parallel (RFC 8305 recommends 250ms)
+CONNECTION_ATTEMPT_DELAY = 0.25
+
+# host -> family of the last successful create_connection() to it, most
+# recently used last
+_preferred_families = collections.OrderedDict()
+_PREFERRED_FAMILIES_SIZE = 1024
+
+
 def create_connection(address,
                       timeout=_GLOBAL_DEFAULT_TIMEOUT,
                       source_address=None):
@@ -37,27 +49,99 @@ def create_connection(address,
     before attempting to connect.  If no *timeout* is supplied, the
     global default timeout setting returned by :func:`getdefaulttimeout`
     is used.
+
+    When the host has several addresses, they are tried following the
+    "Happy Eyeballs" algorithm of RFC 8305: alternating between IPv6 and
+    IPv4, a new attempt is started whenever the previous one fails or has
+    not succeeded within :data:`CONNECTION_ATTEMPT_DELAY` seconds, and the
+    first connection established wins, the others are cancelled.  The
+    family that won for a host is tried first the next time.
     """
 
-    err = "getaddrinfo returns an empty list"
     host, port = address
-    for res in getaddrinfo(host, port, 0, SOCK_STREAM):
-        af, socktype, proto, canonname, sa = res
-        sock = None
+    addrinfos = getaddrinfo(host, port, 0, SOCK_STREAM)
+    if not addrinfos:
+        raise error("getaddrinfo returns an empty list")
+    family = _preferred_families.get(host, addrinfos[0][0])
+    addrinfos = _interleave_families(addrinfos, family)
+    if len(addrinfos) == 1:
+        sock = _connect_addrinfo(addrinfos[0], timeout, source_address)
+    else:
+        sock = _connect_staggered(addrinfos, timeout, source_address)
+    _preferred_families[host] = sock.family
+    _preferred_families.move_to_end(host)
+    if len(_preferred_families) > _PREFERRED_FAMILIES_SIZE:
+        _preferred_families.popitem(last=False)
+    return sock
+
+
+def _interleave_families(addrinfos, family):
+    # addresses of the preferred family first, then alternate
+    first = [res for res in addrinfos if res[0] == family]
+    others = [res for res in addrinfos if res[0] != family]
+    return [res for pair in itertools.zip_longest(first, others)
+            for res in pair if res is not None]
+
+
+def _connect_addrinfo(res, timeout, source_address):
+    af, socktype, proto, canonname, sa = res
+    sock = socket(af, socktype, proto)
+    try:
+        if timeout is not _GLOBAL_DEFAULT_TIMEOUT:
+            sock.settimeout(timeout)
+        if source_address:
+            sock.bind(source_address)
+        sock.connect(sa)
+    except BaseException:
+        sock.close()
+        raise
+    return sock
+
+
+def _connect_staggered(addrinfos, timeout, source_address):
+    from eventlet import greenthread
+    from eventlet import queue
+
+    outcomes = queue.LightQueue()
+
+    def attempt(res):
         try:
-            sock = socket(af, socktype, proto)
-            if timeout is not _GLOBAL_DEFAULT_TIMEOUT:
-                sock.settimeout(timeout)
-            if source_address:
-                sock.bind(source_address)
-            sock.connect(sa)
-            return sock
-
-        except error as e:
-            err = e
-            if sock is not None:
-                sock.close()
+            outcomes.put((_connect_addrinfo(res, timeout, source_address), None))
+        except BaseException as e:
+            # whatever the outcome, the caller must hear of it
+            outcomes.put((None, e))
 
-    if not isinstance(err, error):
-        err = error(err)
-    raise err
+    attempts = []
+    pending = 0
+    winner = None
+    try:
+        for res in addrinfos:
+            attempts.append(greenthread.spawn(attempt, res))
+            pending += 1
+            # the next address gets its turn when this attempt fails or
+            # does not succeed in time
+            try:
+                winner, err = outcomes.get(timeout=CONNECTION_ATTEMPT_DELAY)
+            except queue.Empty:
+                continue
+            pending -= 1
+            if winner is not None:
+                return winner
+            if not isinstance(err, error):
+                raise err
+        while pending:
+            winner, err = outcomes.get()
+            pending -= 1
+            if winner is not None:
+                return winner
+            if not isinstance(err, error):
+                raise err
+        raise err
+    finally:
+        for gt in attempts:
+            gt.kill()
+        # connections that succeeded after the winner
+        while outcomes.qsize():
+            sock = outcomes.get_nowait()[0]
+            if sock is not None and sock is not winner:
+                sock.close()
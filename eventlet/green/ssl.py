@@ -3,8 +3,10 @@ __ssl = __import__('ssl')
 from eventlet.patcher import slurp_properties
 slurp_properties(__ssl, globals(), srckeys=dir(__ssl))
 
+import collections
+import os
 import sys
-from eventlet import greenio, hubs
+from eventlet import greenio, hubs, semaphore
 from eventlet.greenio import (
     GreenSocket, CONNECT_ERR, CONNECT_SUCCESS,
 )
@@ -23,6 +25,8 @@ __patched__ = [
 _original_sslsocket = __ssl.SSLSocket
 _original_sslcontext = __ssl.SSLContext
 _is_py_3_7 = sys.version_info[:2] == (3, 7)
+# plaintext encrypted by GreenSSLStream before its records are sent
+_STREAM_WRITE_SIZE = 256 * 1024
 _original_wrap_socket = __ssl.SSLContext.wrap_socket
 
 
@@ -62,6 +66,12 @@ class GreenSSLSocket(_original_sslsocket):
         with _original_ssl_context():
             context = kw.get('_context')
             if context:
+                session = kw.get('session')
+                session_key = None
+                if not server_side and getattr(context, 'session_cache', None) is not None:
+                    session_key = _session_key(sock, kw.get('server_hostname'))
+                    if session is None and session_key is not None:
+                        session = context.session_cache.get(session_key)
                 ret = _original_sslsocket._create(
                     sock=sock.fd,
                     server_side=server_side,
@@ -69,8 +79,9 @@ class GreenSSLSocket(_original_sslsocket):
                     suppress_ragged_eofs=kw.get('suppress_ragged_eofs', True),
                     server_hostname=kw.get('server_hostname'),
                     context=context,
-                    session=kw.get('session'),
+                    session=session,
                 )
+                ret._session_key = session_key
             else:
                 ret = cls._wrap_socket(
                     sock=sock.fd,
@@ -138,6 +149,13 @@ class GreenSSLSocket(_original_sslsocket):
         _original_sslsocket.settimeout(self, 0.0)
         assert _original_sslsocket.gettimeout(self) == 0.0
 
+        # set until the handshake is done, so that the first read or write
+        # does not run it implicitly on the hub
+        self._handshake_offload = getattr(self._context, 'handshake_offload', None)
+        # taken by offloaded handshakes: OpenSSL must not run two steps of
+        # the same handshake in different threads at once
+        self._handshake_lock = semaphore.Semaphore() if self._handshake_offload is not None else None
+
         # see note above about handshaking
         self.do_handshake_on_connect = do_handshake_on_connect
         if do_handshake_on_connect and self._connected:
@@ -157,6 +175,11 @@ class GreenSSLSocket(_original_sslsocket):
             self.act_non_blocking = True
             self._timeout = 0.0
 
+    def _wait(self, read=False, write=False):
+        timeout = self.gettimeout()
+        trampoline(self, read=read, write=write, timeout=timeout,
+                   timeout_exc=timeout_exc('timed out') if timeout is not None else None)
+
     def _call_trampolining(self, func, *a, **kw):
         if self.act_non_blocking:
             return func(*a, **kw)
@@ -164,18 +187,12 @@ class GreenSSLSocket(_original_sslsocket):
             while True:
                 try:
                     return func(*a, **kw)
+                except SSLWantReadError:
+                    self._wait(read=True)
+                except SSLWantWriteError:
+                    self._wait(write=True)
                 except SSLError as exc:
-                    if get_errno(exc) == SSL_ERROR_WANT_READ:
-                        trampoline(self,
-                                   read=True,
-                                   timeout=self.gettimeout(),
-                                   timeout_exc=timeout_exc('timed out'))
-                    elif get_errno(exc) == SSL_ERROR_WANT_WRITE:
-                        trampoline(self,
-                                   write=True,
-                                   timeout=self.gettimeout(),
-                                   timeout_exc=timeout_exc('timed out'))
-                    elif _is_py_3_7 and "unexpected eof" in exc.args[1]:
+                    if _is_py_3_7 and "unexpected eof" in exc.args[1]:
                         # For reasons I don't understand on 3.7 we get [ssl:
                         # KRB5_S_TKT_NYV] unexpected eof while reading]
                         # errors...
@@ -186,12 +203,16 @@ class GreenSSLSocket(_original_sslsocket):
     def write(self, data):
         """Write DATA to the underlying SSL channel.  Returns
         number of bytes of DATA actually transmitted."""
+        if self._handshake_offload is not None and self._sslobj is not None:
+            self.do_handshake()
         return self._call_trampolining(
             super().write, data)
 
     def read(self, len=1024, buffer=None):
         """Read up to LEN bytes and return them.
         Return zero-length string on EOF."""
+        if self._handshake_offload is not None and self._sslobj is not None:
+            self.do_handshake()
         try:
             return self._call_trampolining(
                 super().read, len, buffer)
@@ -225,16 +246,16 @@ class GreenSSLSocket(_original_sslsocket):
                 raise ValueError(
                     "non-zero flags not allowed in calls to sendall() on %s" %
                     self.__class__)
-            amount = len(data)
-            count = 0
-            data_to_send = data
-            while (count < amount):
-                v = self.send(data_to_send)
-                count += v
-                if v == 0:
-                    trampoline(self, write=True, timeout_exc=timeout_exc('timed out'))
-                else:
-                    data_to_send = data[count:]
+            if self._handshake_offload is not None:
+                self.do_handshake()
+            # Hand the TLS layer views of the data rather than copies of
+            # what is left, and let it write record after record until the
+            # socket buffer is full before waiting for it to drain.
+            with memoryview(data) as view, view.cast('B') as byte_view:
+                amount = len(byte_view)
+                count = 0
+                while count < amount:
+                    count += self._call_trampolining(self._sslobj.write, byte_view[count:])
             return amount
         else:
             while True:
@@ -252,6 +273,8 @@ class GreenSSLSocket(_original_sslsocket):
                     raise
 
     def recv(self, buflen=1024, flags=0):
+        if self._sslobj and not flags:
+            return self.read(buflen)
         return self._base_recv(buflen, flags, into=False)
 
     def recv_into(self, buffer, nbytes=None, flags=0):
@@ -262,6 +285,9 @@ class GreenSSLSocket(_original_sslsocket):
             nbytes = 1024
         # end of CPython code
 
+        if self._sslobj and not flags:
+            # decrypt straight into the caller's buffer
+            return self.read(nbytes, buffer)
         return self._base_recv(nbytes, flags, into=True, buffer_=buffer)
 
     def _base_recv(self, nbytes, flags, into, buffer_=None):
@@ -321,8 +347,35 @@ class GreenSSLSocket(_original_sslsocket):
 
     def do_handshake(self):
         """Perform a TLS/SSL handshake."""
-        return self._call_trampolining(
-            super().do_handshake)
+        offload = self._handshake_offload
+        if offload is not None and not self.act_non_blocking:
+            with self._handshake_lock:
+                if self._handshake_offload is None:
+                    # another greenthread did it while this one waited
+                    return None
+                result = self._call_trampolining(offload.execute, super().do_handshake)
+        else:
+            result = self._call_trampolining(
+                super().do_handshake)
+        # done, reads and writes no longer need to check for it
+        self._handshake_offload = None
+        self._save_session()
+        return result
+
+    def _save_session(self):
+        # Remember the client session for the next connection to the same
+        # server.  TLS 1.3 servers send their tickets after the handshake,
+        # so this is done again when the socket is closed.
+        key = getattr(self, '_session_key', None)
+        if key is None or self._sslobj is None:
+            return
+        session = self._sslobj.session
+        if session is not None:
+            self._context.session_cache.put(key, session)
+
+    def _real_close(self):
+        self._save_session()
+        super()._real_close()
 
     def _socket_connect(self, addr):
         real_connect = socket.connect
@@ -374,7 +427,13 @@ class GreenSSLSocket(_original_sslsocket):
         except AttributeError:
             # sslwrap was removed in 3.x and later in 2.7.9
             context = self.context if PY33 else self._context
-            sslobj = context._wrap_socket(self, server_side, server_hostname=self.server_hostname)
+            session = self._session
+            if getattr(context, 'session_cache', None) is not None:
+                self._session_key = _session_key(self, self.server_hostname)
+                if session is None and self._session_key is not None:
+                    session = context.session_cache.get(self._session_key)
+            sslobj = context._wrap_socket(self, server_side, server_hostname=self.server_hostname,
+                                          session=session)
         else:
             sslobj = sslwrap(self._sock, server_side, self.keyfile, self.certfile,
                              self.cert_reqs, self.ssl_version,
@@ -425,6 +484,324 @@ class GreenSSLSocket(_original_sslsocket):
 SSLSocket = GreenSSLSocket
 
 
+def _session_key(sock, server_hostname):
+    try:
+        host, port = sock.getpeername()[:2]
+    except OSError:
+        return None
+    return (server_hostname or host, port)
+
+
+class SessionCache:
+    """Client-side TLS sessions of a :class:`GreenSSLContext`, by server.
+
+    Set an instance as the ``session_cache`` attribute of a client context
+    and the sockets it wraps resume the last session established with the
+    same ``(server_hostname, port)``, sparing both ends a full handshake::
+
+        context = ssl.create_default_context()
+        context.session_cache = ssl.SessionCache()
+
+    At most *max_size* sessions are kept, the least recently used ones are
+    dropped first.
+    """
+
+    def __init__(self, max_size=1000):
+        self.max_size = max_size
+        self._sessions = collections.OrderedDict()
+
+    def get(self, key):
+        session = self._sessions.get(key)
+        if session is not None:
+            self._sessions.move_to_end(key)
+        return session
+
+    def put(self, key, session):
+        self._sessions[key] = session
+        self._sessions.move_to_end(key)
+        if len(self._sessions) > self.max_size:
+            self._sessions.popitem(last=False)
+
+    def clear(self):
+        self._sessions.clear()
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+def _handshake_step(func):
+    # SSLWantReadError and friends are part of every handshake: hand them
+    # back instead of letting tpool print them
+    try:
+        return True, func()
+    except Exception as exc:
+        return False, exc
+
+
+class HandshakeOffload:
+    """Run the CPU-heavy steps of TLS handshakes in native threads.
+
+    Set an instance as the ``handshake_offload`` attribute of a context and
+    the sockets it wraps compute their handshakes in :mod:`eventlet.tpool`
+    threads while the hub keeps serving other connections; the ssl module
+    releases the GIL during the key exchange.  Waiting for the peer still
+    happens on the hub::
+
+        context.handshake_offload = ssl.HandshakeOffload()
+
+    At most *max_in_flight* handshake steps run at once, the default being
+    the number of CPUs; the others queue up in their greenthreads.  It
+    should not exceed the size of the tpool (``EVENTLET_THREADPOOL_SIZE``).
+    """
+
+    def __init__(self, max_in_flight=None):
+        self.max_in_flight = max_in_flight or os.cpu_count() or 1
+        self._slots = semaphore.Semaphore(self.max_in_flight)
+        self._handshakes = 0
+        self._steps = 0
+        self._queued = 0
+        self._wait_time = 0.0
+        self._max_wait = 0.0
+
+    def execute(self, func):
+        """Run one step of a handshake, *func*, in a native thread."""
+        from eventlet import tpool
+        if self._slots.locked():
+            self._queued += 1
+            clock = hubs.get_hub().clock
+            start = clock()
+            self._slots.acquire()
+            waited = clock() - start
+            self._wait_time += waited
+            self._max_wait = max(self._max_wait, waited)
+        else:
+            self._slots.acquire()
+        try:
+            ok, result = tpool.execute(_handshake_step, func)
+        finally:
+            self._slots.release()
+        self._steps += 1
+        if not ok:
+            raise result
+        self._handshakes += 1
+        return result
+
+    def stats(self):
+        """Return a dict with the number of completed ``handshakes``, the
+        ``steps`` run in threads, the steps ``in_flight`` and ``waiting``
+        now, how many steps were ``queued`` behind the limit and the total
+        and longest time they waited, ``wait_time`` and ``max_wait``.
+        """
+        balance = self._slots.balance
+        return {
+            'handshakes': self._handshakes,
+            'steps': self._steps,
+            'in_flight': self.max_in_flight - max(balance, 0),
+            'waiting': max(-balance, 0),
+            'queued': self._queued,
+            'wait_time': self._wait_time,
+            'max_wait': self._max_wait,
+        }
+
+
+class GreenSSLStream:
+    """A TLS connection over any green byte stream, built on ``SSLObject``.
+
+    Unlike :class:`GreenSSLSocket`, the TLS layer never touches the
+    transport: it encrypts into and decrypts from memory buffers, and this
+    class moves the ciphertext with the transport's ``recv_into`` and
+    ``sendall`` methods.  Ciphertext is read in chunks of up to *read_size*
+    bytes, and all the records produced by a write are sent together, so a
+    large :meth:`sendall` or :meth:`sendall_many` costs a few system calls.
+
+    The transport is usually a green socket, but anything with those two
+    methods will do, for instance an adapter over a pipe or a websocket.
+    Use :meth:`GreenSSLContext.wrap_stream` to create one.  Timeouts are
+    those of the transport.
+    """
+
+    def __init__(self, transport, context, server_side=False, do_handshake_on_connect=True,
+                 suppress_ragged_eofs=True, server_hostname=None, session=None,
+                 read_size=65536):
+        self.transport = transport
+        self.suppress_ragged_eofs = suppress_ragged_eofs
+        self._session_key = None
+        if not server_side and getattr(context, 'session_cache', None) is not None \
+                and hasattr(transport, 'getpeername'):
+            self._session_key = _session_key(transport, server_hostname)
+            if session is None and self._session_key is not None:
+                session = context.session_cache.get(self._session_key)
+        self._incoming = MemoryBIO()
+        self._outgoing = MemoryBIO()
+        self._sslobj = context.wrap_bio(self._incoming, self._outgoing, server_side=server_side,
+                                        server_hostname=server_hostname, session=session)
+        self._read_buffer = bytearray(read_size)
+        self._fills = 0
+        self._read_lock = semaphore.Semaphore()
+        self._write_lock = semaphore.Semaphore()
+        if do_handshake_on_connect:
+            self.do_handshake()
+
+    def _flush(self):
+        # read from the BIO under the lock so that records from concurrent
+        # writers go out in the order they were encrypted
+        with self._write_lock:
+            if self._outgoing.pending:
+                self.transport.sendall(self._outgoing.read())
+
+    def _fill(self, fills):
+        with self._read_lock:
+            if self._fills != fills:
+                # another greenthread read some while we waited for the lock
+                return
+            self._fills += 1
+            with memoryview(self._read_buffer) as view:
+                count = self.transport.recv_into(view)
+                if count:
+                    self._incoming.write(view[:count])
+                else:
+                    self._incoming.write_eof()
+
+    def _call(self, func, *args):
+        while True:
+            fills = self._fills
+            try:
+                result = func(*args)
+            except SSLWantReadError:
+                self._flush()
+                self._fill(fills)
+            except SSLWantWriteError:
+                self._flush()
+            else:
+                self._flush()
+                return result
+
+    def do_handshake(self):
+        """Perform a TLS/SSL handshake."""
+        offload = getattr(self._sslobj.context, 'handshake_offload', None)
+        if offload is not None:
+            self._call(offload.execute, self._sslobj.do_handshake)
+        else:
+            self._call(self._sslobj.do_handshake)
+        self._save_session()
+
+    def _save_session(self):
+        if self._session_key is not None and self._sslobj.session is not None:
+            self._sslobj.context.session_cache.put(self._session_key, self._sslobj.session)
+
+    def _read(self, nbytes, buffer=None):
+        try:
+            if buffer is None:
+                return self._call(self._sslobj.read, nbytes)
+            return self._call(self._sslobj.read, nbytes, buffer)
+        except SSLEOFError:
+            if not self.suppress_ragged_eofs:
+                raise
+            return b'' if buffer is None else 0
+
+    def recv(self, buflen=1024, flags=0):
+        if flags:
+            raise ValueError("non-zero flags not allowed in calls to recv() on %s" % self.__class__)
+        return self._read(buflen)
+
+    def recv_into(self, buffer, nbytes=None, flags=0):
+        if flags:
+            raise ValueError("non-zero flags not allowed in calls to recv_into() on %s" % self.__class__)
+        if not nbytes:
+            with memoryview(buffer) as view:
+                nbytes = view.nbytes
+        return self._read(nbytes, buffer)
+
+    def send(self, data, flags=0):
+        if flags:
+            raise ValueError("non-zero flags not allowed in calls to send() on %s" % self.__class__)
+        return self._call(self._sslobj.write, data)
+
+    def sendall(self, data, flags=0):
+        if flags:
+            raise ValueError("non-zero flags not allowed in calls to sendall() on %s" % self.__class__)
+        self.sendall_many((data,))
+
+    def sendall_many(self, buffers):
+        """Send all of *buffers*, an iterable of bytes-like objects, coalescing
+        their records into as few transport writes as possible."""
+        for data in buffers:
+            with memoryview(data) as view, view.cast('B') as byte_view:
+                for start in range(0, len(byte_view), _STREAM_WRITE_SIZE):
+                    chunk = byte_view[start:start + _STREAM_WRITE_SIZE]
+                    try:
+                        self._sslobj.write(chunk)
+                    except SSLWantReadError:
+                        # renegotiation
+                        self._call(self._sslobj.write, chunk)
+                    if self._outgoing.pending >= _STREAM_WRITE_SIZE:
+                        self._flush()
+        self._flush()
+
+    def unwrap(self):
+        """Shut down the TLS layer and return the transport."""
+        try:
+            self._call(self._sslobj.unwrap)
+        except SSLEOFError:
+            # the peer closed without answering our close_notify
+            pass
+        return self.transport
+
+    def close(self):
+        self._save_session()
+        self.transport.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def fileno(self):
+        return self.transport.fileno()
+
+    def settimeout(self, timeout):
+        self.transport.settimeout(timeout)
+
+    def gettimeout(self):
+        return self.transport.gettimeout()
+
+    def pending(self):
+        return self._sslobj.pending()
+
+    def getpeercert(self, binary_form=False):
+        return self._sslobj.getpeercert(binary_form)
+
+    def cipher(self):
+        return self._sslobj.cipher()
+
+    def version(self):
+        return self._sslobj.version()
+
+    def selected_alpn_protocol(self):
+        return self._sslobj.selected_alpn_protocol()
+
+    @property
+    def context(self):
+        return self._sslobj.context
+
+    @property
+    def server_side(self):
+        return self._sslobj.server_side
+
+    @property
+    def server_hostname(self):
+        return self._sslobj.server_hostname
+
+    @property
+    def session(self):
+        return self._sslobj.session
+
+    @property
+    def session_reused(self):
+        return self._sslobj.session_reused
+
+
 def wrap_socket(sock, *a, **kw):
     return GreenSSLSocket(sock, *a, **kw)
 
@@ -432,9 +809,38 @@ def wrap_socket(sock, *a, **kw):
 class GreenSSLContext(_original_sslcontext):
     __slots__ = ()
 
+    # SessionCache used by client sockets, None to only resume sessions
+    # passed explicitly
+    session_cache = None
+    # HandshakeOffload running handshakes in native threads, None to run
+    # them on the hub
+    handshake_offload = None
+
     def wrap_socket(self, sock, *a, **kw):
         return GreenSSLSocket(sock, *a, _context=self, **kw)
 
+    def wrap_stream(self, transport, *a, **kw):
+        """Return a :class:`GreenSSLStream` running TLS over *transport*,
+        an object with ``recv_into`` and ``sendall`` methods such as a
+        green socket.  The arguments are those of :meth:`wrap_socket`.
+        """
+        return GreenSSLStream(transport, self, *a, **kw)
+
+    def session_counters(self):
+        """Return a dict counting the TLS ``handshakes`` completed with this
+        context, the ones that ``resumed`` a session, and the ``full`` ones.
+
+        Server contexts resume sessions from their session cache or from
+        tickets they issued.  Ticket keys are generated when the context
+        is created and are not shared with other contexts: in a pre-forking
+        server, create the context in the parent process so that all the
+        workers accept each other's tickets.
+        """
+        stats = self.session_stats()
+        handshakes = stats['accept_good'] + stats['connect_good']
+        return {'handshakes': handshakes, 'resumed': stats['hits'],
+                'full': handshakes - stats['hits']}
+
     # https://github.com/eventlet/eventlet/issues/371
     # Thanks to Gevent developers for sharing patch to this problem.
     if hasattr(_original_sslcontext.options, 'setter'):
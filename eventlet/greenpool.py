@@ -1,19 +1,36 @@
+import collections
+import itertools
+import sys
 import traceback
 
 import eventlet
+from eventlet import greenthread
+from eventlet import hubs
 from eventlet import queue
+from eventlet import timeout
 from eventlet.support import greenlets as greenlet
 
-__all__ = ['GreenPool', 'GreenPile']
+__all__ = ['GreenPool', 'GreenPile', 'TaskGroup']
 
 DEBUG = True
 
+# handed to an idle recycled worker along with its next function, to tell it
+# from stray switches into that greenlet
+_WORK = object()
+
 
 class GreenPool:
     """The GreenPool class is a pool of green threads.
+
+    With *recycle*, the greenlets that ran a function passed to
+    :meth:`spawn_n` wait for the next one instead of exiting, so that busy
+    pools do not create and destroy a greenlet per call.  Functions then
+    share their greenlet with the ones that ran before them: do not use
+    it with code that keeps state in :mod:`eventlet.corolocal` or relies
+    on the identity of ``eventlet.getcurrent()``.
     """
 
-    def __init__(self, size=1000):
+    def __init__(self, size=1000, recycle=False):
         try:
             size = int(size)
         except ValueError as e:
@@ -26,6 +43,13 @@ class GreenPool:
         self.coroutines_running = set()
         self.sem = eventlet.Semaphore(size)
         self.no_coros_running = eventlet.Event()
+        self.recycle = recycle
+        self._idle = []
+        self._parked = set()
+        # park() handle -> (function, args, kwargs, spawn site) of parked
+        # functions whose file descriptor became readable while the pool was
+        # full, started as slots free up
+        self._pending = collections.OrderedDict()
 
     def resize(self, new_size):
         """ Change the max number of greenthreads doing work at any given time.
@@ -39,6 +63,8 @@ class GreenPool:
         size_delta = new_size - self.size
         self.sem.counter += size_delta
         self.size = new_size
+        while self._pending and self.sem.acquire(blocking=False):
+            self._start_pending()
 
     def running(self):
         """ Returns the number of greenthreads that are currently executing
@@ -75,7 +101,7 @@ class GreenPool:
         else:
             self.sem.acquire()
             gt = eventlet.spawn(function, *args, **kwargs)
-            if not self.coroutines_running:
+            if not self.coroutines_running and self.no_coros_running.ready():
                 self.no_coros_running = eventlet.Event()
             self.coroutines_running.add(gt)
             gt.link(self._spawn_done)
@@ -95,6 +121,31 @@ class GreenPool:
                 coro = eventlet.getcurrent()
                 self._spawn_done(coro)
 
+    def _recycled_spawn_n_impl(self, func, args, kwargs):
+        current = eventlet.getcurrent()
+        hub = hubs.get_hub()
+        while True:
+            self._spawn_n_impl(func, args, kwargs, True)
+            if not self.recycle or len(self._idle) >= self.size:
+                return
+            self._idle.append(current)
+            while True:
+                try:
+                    work = hub.switch()
+                except BaseException:
+                    if current not in self._idle:
+                        # spawn_n() already handed us a function, run it
+                        continue
+                    # e.g. a Timeout left behind by the last function: this
+                    # greenlet can't be trusted with more work
+                    self._idle.remove(current)
+                    if isinstance(sys.exc_info()[1], (KeyboardInterrupt, SystemExit)):
+                        raise
+                    return
+                if type(work) is tuple and len(work) == 4 and work[0] is _WORK:
+                    break
+            func, args, kwargs = work[1:]
+
     def spawn_n(self, function, *args, **kwargs):
         """Create a greenthread to run the *function*, the same as
         :meth:`spawn`.  The difference is that :meth:`spawn_n` returns
@@ -107,12 +158,93 @@ class GreenPool:
             self._spawn_n_impl(function, args, kwargs, None)
         else:
             self.sem.acquire()
+            self._spawn_n_acquired(function, args, kwargs)
+
+    def _spawn_n_acquired(self, function, args, kwargs):
+        if self.recycle:
+            # the function, not the long-lived greenlet, inherits the
+            # deadline of the caller
+            if timeout._bound_deadlines:
+                function, args, kwargs = greenthread._inherit_deadline(function, args, kwargs)
+            hub = hubs.get_hub()
+            g = None
+            while self._idle:
+                g = self._idle.pop()
+                if not g.dead:
+                    break
+                g = None
+            if g is not None:
+                hub.run_soon(g.switch, (_WORK, function, args, kwargs))
+            else:
+                g = greenlet.greenlet(self._recycled_spawn_n_impl, parent=hub.greenlet)
+                if greenthread._g_debug:
+                    greenthread._record_spawn_site(g)
+                hub.run_soon(g.switch, function, args, kwargs)
+        else:
             g = eventlet.spawn_n(
                 self._spawn_n_impl,
                 function, args, kwargs, True)
-            if not self.coroutines_running:
-                self.no_coros_running = eventlet.Event()
-            self.coroutines_running.add(g)
+        # a slot handed over by the last greenthread to finish leaves
+        # waitall() waiting on the current event
+        if not self.coroutines_running and self.no_coros_running.ready():
+            self.no_coros_running = eventlet.Event()
+        self.coroutines_running.add(g)
+        return g
+
+    def park(self, fileno, function, *args, **kwargs):
+        """Run *function* in the pool, as with :meth:`spawn_n`, once the
+        file descriptor *fileno* is ready to read.
+
+        Until then no greenthread waits for it: the hub watches *fileno*,
+        so that e.g. a server can keep many idle connections open without
+        holding a greenthread, and its stack, for each of them.  Returns a
+        handle to pass to :meth:`unpark`.  Only one greenthread or parked
+        function may wait to read a given file descriptor at a time.  If the
+        pool is full when *fileno* becomes readable, the function is queued
+        and started, still without a greenthread of its own until then, as
+        soon as a slot frees up.
+        """
+        hub = hubs.get_hub()
+        # the function is spawned from the hub, say who parked it instead
+        site = greenthread._spawn_site() if greenthread._g_debug else None
+
+        def readable(_fileno):
+            if listener not in self._parked:
+                return
+            self._parked.discard(listener)
+            hub.remove(listener)
+            # the hub can't wait for the pool to have room: when full, the
+            # function waits for _spawn_done() to hand it a slot
+            self._pending[listener] = (function, args, kwargs, site)
+            if len(self._pending) == 1 and self.sem.acquire(blocking=False):
+                self._start_pending()
+
+        def closed(*exc):
+            # somebody else closed it, there is nothing left to read
+            self._parked.discard(listener)
+
+        listener = hub.add(hub.READ, fileno, readable, closed, None)
+        self._parked.add(listener)
+        return listener
+
+    def unpark(self, handle):
+        """Stop waiting for the file descriptor passed to :meth:`park`,
+        which returned *handle*.  Returns False if its function has already
+        been started."""
+        if self._pending.pop(handle, None) is not None:
+            return True
+        if handle not in self._parked:
+            return False
+        self._parked.discard(handle)
+        hubs.get_hub().remove(handle)
+        return True
+
+    def _start_pending(self):
+        # with a slot of the semaphore acquired
+        function, args, kwargs, site = self._pending.popitem(last=False)[1]
+        g = self._spawn_n_acquired(function, args, kwargs)
+        if site is not None:
+            g._spawn_site = site
 
     def waitall(self):
         """Waits until all greenthreads in the pool are finished working."""
@@ -123,21 +255,26 @@ class GreenPool:
             self.no_coros_running.wait()
 
     def _spawn_done(self, coro):
-        self.sem.release()
         if coro is not None:
             self.coroutines_running.remove(coro)
+        if self._pending and self.sem.counter >= 0:
+            # the slot goes to the parked function that became ready first
+            self._start_pending()
+            return
+        self.sem.release()
         # if done processing (no more work is waiting for processing),
         # we can finish off any waitall() calls that might be pending
         if self.sem.balance == self.size:
             self.no_coros_running.send(None)
 
     def waiting(self):
-        """Return the number of greenthreads waiting to spawn.
+        """Return the number of greenthreads waiting to spawn, parked
+        functions ready to run included.
         """
         if self.sem.balance < 0:
-            return -self.sem.balance
+            return -self.sem.balance + len(self._pending)
         else:
-            return 0
+            return len(self._pending)
 
     def _do_map(self, func, it, gi):
         for args in it:
@@ -180,6 +317,34 @@ class GreenPool:
         """
         return self.starmap(function, zip(*iterables))
 
+    def imap_unordered(self, function, *iterables, prefetch=None, chunksize=1):
+        """Like :meth:`imap`, but each result is returned as soon as it is
+        ready instead of in the order of the arguments, so a slow call does
+        not hold back the results of the calls made after it.
+
+        At most *prefetch* calls (by default the pool's size) run or wait
+        for their results to be consumed at any given time.  With
+        *chunksize*, a single greenthread of the pool makes *chunksize*
+        calls in a row, which saves spawning one greenthread per item for
+        short calls; *prefetch* is then rounded up to whole chunks.
+
+        Closing the returned iterator, or dropping it, stops the calls that
+        have not started yet and kills the ones that are running::
+
+            results = pool.imap_unordered(fetch, urls, chunksize=16)
+            for body in results:
+                if found(body):
+                    results.close()
+                    break
+        """
+        if chunksize < 1:
+            raise ValueError('imap_unordered() expect chunksize >= 1, actual: {}'.format(repr(chunksize)))
+        if prefetch is not None and prefetch < 1:
+            raise ValueError('imap_unordered() expect prefetch >= 1, actual: {}'.format(repr(prefetch)))
+        if function is None:
+            function = lambda *a: a
+        return GreenUnorderedMap(self, function, zip(*iterables), prefetch, chunksize)
+
 
 class GreenPile:
     """GreenPile is an abstraction representing a bunch of I/O-related tasks.
@@ -252,3 +417,243 @@ class GreenMap(GreenPile):
         else:
             return val
     __next__ = next
+
+
+_DONE = object()
+
+
+class _UnorderedFeed:
+    # the state shared by a GreenUnorderedMap and the greenthreads working
+    # for it, kept apart so that they don't keep the iterator alive
+
+    def __init__(self, pool, function, chunks, window):
+        self.pool = pool
+        self.function = function
+        self.window = eventlet.Semaphore(window)
+        self.results = queue.LightQueue()
+        self.pending = 0
+        self.exhausted = False
+        self.closed = False
+        self.workers = set()
+        self.producer = eventlet.spawn(self._produce, chunks)
+
+    def _produce(self, chunks):
+        try:
+            for chunk in chunks:
+                self.window.acquire()
+                if self.closed:
+                    return
+                self.pending += 1
+                self.pool.spawn_n(self._run, chunk)
+        except (KeyboardInterrupt, SystemExit, greenlet.GreenletExit):
+            raise
+        except:
+            # the arguments could not be read
+            self.results.put((False, None, sys.exc_info()))
+        self.exhausted = True
+        if not self.pending:
+            self.results.put(_DONE)
+
+    def _run(self, chunk):
+        current = eventlet.getcurrent()
+        self.workers.add(current)
+        try:
+            last = len(chunk) - 1
+            for i, args in enumerate(chunk):
+                if self.closed:
+                    return
+                try:
+                    result = self.function(*args)
+                except (KeyboardInterrupt, SystemExit, greenlet.GreenletExit):
+                    raise
+                except:
+                    self.results.put((i == last, None, sys.exc_info()))
+                else:
+                    self.results.put((i == last, result, None))
+        finally:
+            self.workers.discard(current)
+            self.pending -= 1
+            if self.exhausted and not self.pending:
+                self.results.put(_DONE)
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            if self.workers or not self.producer.dead:
+                eventlet.spawn_n(self._kill)
+
+    def _kill(self):
+        self.producer.kill()
+        for g in list(self.workers):
+            greenthread.kill(g)
+
+
+class GreenUnorderedMap:
+    """The iterator returned by :meth:`GreenPool.imap_unordered`.
+
+    An exception raised by the mapped function is raised by the
+    corresponding call to :meth:`next`; the iterator can still be used to
+    get the remaining results.
+    """
+
+    def __init__(self, pool, function, iterable, prefetch=None, chunksize=1):
+        if prefetch is None:
+            prefetch = max(pool.size, 1)
+        it = iter(iterable)
+        chunks = iter(lambda: list(itertools.islice(it, chunksize)), [])
+        self._feed = _UnorderedFeed(pool, function, chunks, -(-prefetch // chunksize))
+        self._done = False
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        """Wait for the next result to be ready.  Raises StopIteration when
+        all of them have been returned or the iterator is closed."""
+        feed = self._feed
+        if self._done or feed.closed:
+            raise StopIteration()
+        item = feed.results.get()
+        if item is _DONE:
+            self._done = True
+            raise StopIteration()
+        last, result, error = item
+        if last:
+            feed.window.release()
+        if error is not None:
+            raise error[1].with_traceback(error[2])
+        return result
+    __next__ = next
+
+    def close(self):
+        """Stop the calls that have not started yet and kill the running
+        ones.  Results that were not consumed are discarded."""
+        self._feed.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, typ, value, tb):
+        self.close()
+
+    def __del__(self):
+        if not self._done:
+            self._feed.close()
+
+
+class _Interrupted(BaseException):
+    """Thrown into the block of a :class:`TaskGroup` when one of its
+    greenthreads failed"""
+
+
+class TaskGroup:
+    """A group of greenthreads that succeed or fail together::
+
+        with eventlet.TaskGroup(timeout=5) as group:
+            a = group.spawn(fetch, url_a)
+            b = group.spawn(fetch, url_b)
+        process(a.wait(), b.wait())
+
+    Leaving the ``with`` block waits for every greenthread spawned in the
+    group.  The first of them that raises an exception makes the group
+    kill the others with :class:`greenlet.GreenletExit` and interrupt the
+    block, if it is still running, at the point where it is blocked; the
+    exception is then raised from the ``with`` statement.  If the block
+    itself raises, the greenthreads are killed as well, and the block's
+    exception propagates.
+
+    With *timeout*, the block and the greenthreads share a deadline of
+    *timeout* seconds from entering the block: when it passes, an
+    :class:`eventlet.Timeout` is raised in the greenthread running the block
+    and the group's greenthreads are killed.
+    """
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout
+        self.children = set()
+        self.error = None
+        self.cancelled = False
+        self._timer = None
+        self._all_done = None
+        # the greenthread running the block, while it does
+        self._block = None
+        self._interruption = None
+
+    def __enter__(self):
+        self._block = greenlet.getcurrent()
+        if self.timeout is not None:
+            self._timer = eventlet.Timeout(self.timeout)
+        return self
+
+    def __exit__(self, typ, value, tb):
+        self._block = None
+        if typ is _Interrupted and value is self._interruption:
+            # not the block's own error, the one of the child is raised
+            typ = value = tb = None
+        try:
+            if typ is not None:
+                self.cancel()
+            try:
+                self._wait()
+            except eventlet.Timeout as exc:
+                if exc is not self._timer:
+                    raise
+                self.cancel()
+                self._wait()
+                if typ is None and self.error is None:
+                    raise
+        finally:
+            if self._timer is not None:
+                self._timer.cancel()
+        if typ is None and self.error is not None:
+            raise self.error[1].with_traceback(self.error[2]) from None
+
+    def spawn(self, function, *args, **kwargs):
+        """Run *function* in a greenthread of the group and return the
+        :class:`GreenThread <eventlet.GreenThread>`.  Once the group is
+        cancelled, the greenthread is killed before it starts."""
+        gt = eventlet.spawn(function, *args, **kwargs)
+        self.children.add(gt)
+        gt.link(self._child_done)
+        if self.cancelled:
+            gt.cancel()
+        return gt
+
+    def cancel(self):
+        """Kill the greenthreads of the group, and the ones spawned in it
+        from now on."""
+        if not self.cancelled:
+            self.cancelled = True
+            # from a greenthread of its own: this may run in a child's links
+            eventlet.spawn_n(self._kill_children)
+
+    def _kill_children(self):
+        for gt in list(self.children):
+            gt.kill()
+
+    def _child_done(self, gt):
+        self.children.discard(gt)
+        if self.error is None:
+            try:
+                gt.wait()
+            except greenlet.GreenletExit:
+                pass
+            except BaseException:
+                self.error = sys.exc_info()
+                self.cancel()
+                if self._block is not None:
+                    hubs.get_hub().run_soon(self._interrupt)
+        if not self.children and self._all_done is not None:
+            self._all_done.send()
+            self._all_done = None
+
+    def _interrupt(self):
+        # from the hub, the block is blocked somewhere if still running
+        if self._block is not None:
+            self._interruption = _Interrupted()
+            self._block.throw(self._interruption)
+
+    def _wait(self):
+        while self.children:
+            self._all_done = eventlet.Event()
+            self._all_done.wait()
@@ -17,6 +17,9 @@ __all__ = ['getcurrent', 'sleep', 'spawn', 'spawn_n',
 
 getcurrent = greenlet.getcurrent
 
+# set by eventlet.debug.greenthread_spawn_sites()
+_g_debug = False
+
 
 def sleep(seconds=0):
     """Yield control to another eligible coroutine until at least *seconds* have
@@ -57,9 +60,13 @@ def spawn(func, *args, **kwargs):
     Use :func:`spawn_after` to  arrange for greenthreads to be spawned
     after a finite delay.
     """
+    if timeout._bound_deadlines:
+        func, args, kwargs = _inherit_deadline(func, args, kwargs)
     hub = hubs.get_hub()
     g = GreenThread(hub.greenlet)
-    hub.schedule_call_global(0, g.switch, func, args, kwargs)
+    if _g_debug:
+        _record_spawn_site(g)
+    hub.run_soon(g.switch, func, args, kwargs)
     return g
 
 
@@ -73,7 +80,14 @@ def spawn_n(func, *args, **kwargs):
     trace; the print can be disabled by calling
     :func:`eventlet.debug.hub_exceptions` with False.
     """
-    return _spawn_n(0, func, args, kwargs)[1]
+    if timeout._bound_deadlines:
+        func, args, kwargs = _inherit_deadline(func, args, kwargs)
+    hub = hubs.get_hub()
+    g = greenlet.greenlet(func, parent=hub.greenlet)
+    if _g_debug:
+        _record_spawn_site(g)
+    hub.run_soon(g.switch, *args, **kwargs)
+    return g
 
 
 def spawn_after(seconds, func, *args, **kwargs):
@@ -93,8 +107,12 @@ def spawn_after(seconds, func, *args, **kwargs):
     generally the desired behavior.  If terminating *func* regardless of whether
     it's started or not is the desired behavior, call :meth:`GreenThread.kill`.
     """
+    if timeout._bound_deadlines:
+        func, args, kwargs = _inherit_deadline(func, args, kwargs)
     hub = hubs.get_hub()
     g = GreenThread(hub.greenlet)
+    if _g_debug:
+        _record_spawn_site(g)
     hub.schedule_call_global(seconds, g.switch, func, args, kwargs)
     return g
 
@@ -116,8 +134,12 @@ def spawn_after_local(seconds, func, *args, **kwargs):
     of whether it's started or not is the desired behavior, call
     :meth:`GreenThread.kill`.
     """
+    if timeout._bound_deadlines:
+        func, args, kwargs = _inherit_deadline(func, args, kwargs)
     hub = hubs.get_hub()
     g = GreenThread(hub.greenlet)
+    if _g_debug:
+        _record_spawn_site(g)
     hub.schedule_call_local(seconds, g.switch, func, args, kwargs)
     return g
 
@@ -163,6 +185,30 @@ TimeoutError, with_timeout = (
     ))
 
 
+def _inherit_deadline(func, args, kwargs):
+    # run func under the deadline of the spawning greenthread
+    deadline = timeout.current_deadline()
+    if deadline is None:
+        return func, args, kwargs
+    return timeout._call_with_deadline, (deadline, func, args, kwargs), {}
+
+
+def _spawn_site():
+    # the first caller outside of the modules that spawn on others' behalf
+    frame = sys._getframe(1)
+    while frame is not None and frame.f_globals.get('__name__') in _SPAWNING_MODULES:
+        frame = frame.f_back
+    if frame is not None:
+        return (frame.f_code.co_filename, frame.f_lineno, frame.f_code.co_name)
+
+
+def _record_spawn_site(g):
+    g._spawn_site = _spawn_site()
+
+
+_SPAWNING_MODULES = frozenset(('eventlet.greenthread', 'eventlet.greenpool', 'eventlet.dagpool'))
+
+
 def _spawn_n(seconds, func, args, kwargs):
     hub = hubs.get_hub()
     g = greenlet.greenlet(func, parent=hub.greenlet)
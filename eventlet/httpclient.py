@@ -0,0 +1,387 @@
+"""Green HTTP/1.1 client keeping connections alive between requests.
+
+A :class:`Session` sends requests over connections taken from a
+:class:`~eventlet.connpool.ConnectionPool`, so that consecutive requests to
+the same server reuse the same TCP (and TLS) connection::
+
+    session = httpclient.Session(timeout=5)
+    with session.get('https://example.com/status') as response:
+        if response.status == 200:
+            body = response.read()
+
+Responses are parsed by :class:`eventlet.green.http.client.HTTPResponse`,
+and bodies can be streamed into caller-supplied buffers with
+:meth:`Response.readinto` without allocating intermediate ``bytes``.
+"""
+import io
+import time
+from urllib.parse import urlsplit
+
+from eventlet import connpool
+from eventlet.green.http import client
+from eventlet.timeout import Timeout
+
+
+__all__ = ['Session', 'Response']
+
+_MISSING = object()
+
+_DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+# requests that may be pipelined, and retried when the server closed the
+# connection under our feet (RFC 7230 section 6.3)
+_IDEMPOTENT = frozenset(('GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS', 'TRACE'))
+
+# request bodies up to this size are sent in the same write as the headers
+_JOIN_BODY_SIZE = 64 * 1024
+
+
+class _Reader:
+    # The response stream of a connection, shared by its successive
+    # HTTPResponse objects; they close it when done with a response, which
+    # must not close the connection itself.
+
+    def __init__(self, fp):
+        self._fp = fp
+        self.read = fp.read
+        self.readinto = fp.readinto
+        self.readline = fp.readline
+        self.read1 = fp.read1
+        self.peek = fp.peek
+        self.fileno = fp.fileno
+
+    def close(self):
+        pass
+
+    def flush(self):
+        pass
+
+
+class _Connection:
+    __slots__ = ('key', 'sock', '_reader', 'reader', 'requests')
+
+    def __init__(self, key, sock):
+        self.key = key
+        self.sock = sock
+        self._reader = sock.makefile('rb')
+        self.reader = _Reader(self._reader)
+        self.requests = 0
+
+    def makefile(self, mode):
+        # called by HTTPResponse
+        return self.reader
+
+    def send(self, head, body):
+        if body is not None and len(body) <= _JOIN_BODY_SIZE:
+            self.sock.sendall(head + body)
+        else:
+            self.sock.sendall(head)
+            if body is not None:
+                self.sock.sendall(body)
+        self.requests += 1
+
+    def close(self):
+        self.reader._fp.close()
+        self.sock.close()
+
+
+class _ConnectionPool(connpool.ConnectionPool):
+    def connect(self, host, port, tls):
+        return _Connection((host, port, tls), super().connect(host, port, tls))
+
+
+def _split_url(url):
+    parts = urlsplit(url)
+    if parts.scheme not in _DEFAULT_PORTS:
+        raise client.InvalidURL('unsupported URL scheme: %r' % (url,))
+    if not parts.hostname:
+        raise client.InvalidURL('no host in URL: %r' % (url,))
+    port = parts.port or _DEFAULT_PORTS[parts.scheme]
+    target = parts.path or '/'
+    if parts.query:
+        target += '?' + parts.query
+    key = (parts.hostname, port, parts.scheme == 'https')
+    return key, parts.netloc.rpartition('@')[2], target
+
+
+def _encode_request(method, target, host, headers, body):
+    lines = ['%s %s HTTP/1.1' % (method, target)]
+    names = set()
+    for name, value in headers.items():
+        name = name.strip()
+        value = str(value)
+        if not client._is_legal_header_name(name.encode('latin-1')):
+            raise ValueError('Invalid header name %r' % (name,))
+        if client._is_illegal_header_value(value.encode('latin-1')):
+            raise ValueError('Invalid header value %r' % (value,))
+        names.add(name.lower())
+        lines.append('%s: %s' % (name, value))
+    if 'host' not in names:
+        lines.append('Host: ' + host)
+    if 'accept-encoding' not in names:
+        lines.append('Accept-Encoding: identity')
+    if 'content-length' not in names and 'transfer-encoding' not in names:
+        if body is not None:
+            lines.append('Content-Length: %d' % len(body))
+        elif method in client._METHODS_EXPECTING_BODY:
+            lines.append('Content-Length: 0')
+    lines.append('\r\n')
+    return '\r\n'.join(lines).encode('latin-1')
+
+
+def _remaining(deadline):
+    if deadline is None:
+        return None
+    return max(0, deadline - time.monotonic())
+
+
+class Response:
+    """The response to a request sent by a :class:`Session`.
+
+    The status line and headers are available as :attr:`status`,
+    :attr:`reason`, :attr:`version` and :attr:`headers` (an
+    :class:`~http.client.HTTPMessage`).  The body is read with :meth:`read`
+    or :meth:`readinto`, each call being subject to what is left of the
+    request's deadline.  The connection goes back to the session's pool as
+    soon as the whole body was read; :meth:`close` a response whose body is
+    not needed, which closes the connection if the body was not read to the
+    end.  Responses are context managers doing that on exit.
+    """
+
+    def __init__(self, session, conn, response, deadline, body=None):
+        self._session = session
+        self._conn = conn
+        self._response = response
+        self._deadline = deadline
+        self._body = None if body is None else io.BytesIO(body)
+        self.status = response.status
+        self.reason = response.reason
+        self.version = response.version
+        self.headers = response.headers
+        if body is not None or response.length == 0:
+            # nothing (left) to read from the connection; this closes the
+            # HTTPResponse without blocking
+            response.read()
+            self._release()
+
+    def __repr__(self):
+        return '<%s at %s status=%s>' % (self.__class__.__name__, hex(id(self)), self.status)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, typ, val, tb):
+        self.close()
+
+    def getheader(self, name, default=None):
+        """Return the value of header *name*, several values being joined
+        with commas, or *default*."""
+        return self._response.getheader(name, default)
+
+    def read(self, amt=None):
+        """Read and return up to *amt* bytes of the body, or all of it."""
+        if self._body is not None:
+            return self._body.read(amt)
+        return self._call(self._response.read, amt)
+
+    def readinto(self, b):
+        """Read body bytes directly into the writable buffer *b*, returning
+        how many were read; 0 means the body was read to the end."""
+        if self._body is not None:
+            return self._body.readinto(b)
+        return self._call(self._response.readinto, b)
+
+    def close(self):
+        """Release the connection, closing it if the body was not read."""
+        if self._conn is not None:
+            self._response.close()
+            self._release(reusable=False)
+
+    def _call(self, method, arg):
+        if self._conn is None:
+            return method(arg)
+        try:
+            with Timeout(_remaining(self._deadline)):
+                result = method(arg)
+        except BaseException:
+            self._release(reusable=False)
+            raise
+        if self._response.isclosed():
+            self._release()
+        return result
+
+    def _release(self, reusable=True):
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            self._session._release(conn, self._response, reusable)
+
+
+class Session:
+    """A green HTTP/1.1 client reusing connections between requests.
+
+    Connections are pooled by ``(host, port, tls)`` endpoint, at most
+    *max_per_host* of them being in use at the same time, and are closed
+    after *idle_timeout* seconds without requests; *connect_timeout* and
+    *ssl_context* are used to open them.  See
+    :class:`~eventlet.connpool.ConnectionPool`.
+
+    *timeout* is the default deadline of requests in seconds: it covers
+    waiting for a connection, sending the request and receiving the
+    response headers, as well as every read of the body.  When it expires,
+    the :class:`~eventlet.Timeout` is raised out of the blocking call.
+    *headers* are sent with every request, unless overridden by the
+    request's own headers.
+
+    Idempotent requests that fail because the server closed a reused
+    connection before answering are sent again on another connection.
+    """
+
+    def __init__(self, max_per_host=10, idle_timeout=60, timeout=None,
+                 connect_timeout=None, ssl_context=None, headers=None):
+        self.pool = _ConnectionPool(max_per_host=max_per_host, idle_timeout=idle_timeout,
+                                    connect_timeout=connect_timeout, ssl_context=ssl_context)
+        self.timeout = timeout
+        self.headers = dict(headers or {})
+        # endpoints known to keep HTTP/1.1 connections open, to which
+        # pipeline() sends several requests at once
+        self._persistent = set()
+
+    def __repr__(self):
+        return '<%s at %s pool=%r>' % (self.__class__.__name__, hex(id(self)), self.pool)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, typ, val, tb):
+        self.close()
+
+    def close(self):
+        """Close idle connections, and the others once they are released."""
+        self.pool.close()
+
+    def get(self, url, **kwargs):
+        """Send a GET request; see :meth:`request`."""
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, body=None, **kwargs):
+        """Send a POST request; see :meth:`request`."""
+        return self.request('POST', url, body, **kwargs)
+
+    def request(self, method, url, body=None, headers=None, timeout=_MISSING):
+        """Send a request and return its :class:`Response` as soon as the
+        response headers arrived.
+
+        *body* is a bytes-like object, or a string encoded as ISO-8859-1.
+        *timeout* overrides the session's default deadline, ``None``
+        meaning no deadline at all.
+        """
+        deadline = self._deadline(timeout)
+        key, head, body = self._prepare(method, url, body, headers)
+        while True:
+            with Timeout(_remaining(deadline)):
+                conn = self.pool.get(*key)
+                reused = conn.requests > 0
+                try:
+                    conn.send(head, body)
+                    response = self._getresponse(conn, method)
+                except (ConnectionError, client.BadStatusLine):
+                    self.pool.put(conn, reusable=False)
+                    if reused and method in _IDEMPOTENT:
+                        continue
+                    raise
+                except BaseException:
+                    self.pool.put(conn, reusable=False)
+                    raise
+            return Response(self, conn, response, deadline)
+
+    def pipeline(self, requests, timeout=_MISSING):
+        """Send several requests and return the list of their responses, in
+        the same order, with bodies already read.
+
+        *requests* is an iterable of ``(method, url)``, ``(method, url,
+        body)`` or ``(method, url, body, headers)`` tuples.  Consecutive
+        idempotent requests to a server that already answered with a
+        persistent HTTP/1.1 response are written on the same connection
+        without waiting for each response in turn; other requests are sent
+        one at a time.  *timeout* is a deadline for the whole batch.
+        """
+        deadline = self._deadline(timeout)
+        prepared = []
+        for args in requests:
+            method, url = args[:2]
+            key, head, body = self._prepare(method, url, *args[2:])
+            prepared.append((key, method, head, body))
+        responses = [None] * len(prepared)
+        pending = list(range(len(prepared)))
+        with Timeout(_remaining(deadline)):
+            while pending:
+                key = prepared[pending[0]][0]
+                batch = [pending.pop(0)]
+                if key in self._persistent and prepared[batch[0]][1] in _IDEMPOTENT:
+                    while (pending and prepared[pending[0]][0] == key and
+                           prepared[pending[0]][1] in _IDEMPOTENT):
+                        batch.append(pending.pop(0))
+                unanswered = self._send_batch(prepared, batch, responses, deadline)
+                pending[:0] = unanswered
+        return responses
+
+    def _send_batch(self, prepared, batch, responses, deadline):
+        # Returns the indexes of requests in batch left unanswered because
+        # the server closed the connection after answering the ones before,
+        # or before answering any of them on a reused connection.
+        conn = self.pool.get(*prepared[batch[0]][0])
+        reused = conn.requests > 0
+        answered = 0
+        try:
+            for index in batch:
+                conn.send(*prepared[index][2:])
+            for index in batch:
+                response = self._getresponse(conn, prepared[index][1])
+                responses[index] = Response(self, None, response, deadline, response.read())
+                answered += 1
+                if response.will_close:
+                    break
+        except (ConnectionError, client.BadStatusLine):
+            self.pool.put(conn, reusable=False)
+            # only idempotent requests are pipelined after the first one
+            if answered or (reused and prepared[batch[0]][1] in _IDEMPOTENT):
+                return batch[answered:]
+            raise
+        except BaseException:
+            self.pool.put(conn, reusable=False)
+            raise
+        self._release(conn, response, True)
+        return batch[answered:]
+
+    def _deadline(self, timeout):
+        if timeout is _MISSING:
+            timeout = self.timeout
+        if timeout is None:
+            return None
+        return time.monotonic() + timeout
+
+    def _prepare(self, method, url, body=None, headers=None):
+        key, host, target = _split_url(url)
+        if headers:
+            merged = dict(self.headers)
+            merged.update(headers)
+            headers = merged
+        else:
+            headers = self.headers
+        if isinstance(body, str):
+            body = body.encode('iso-8859-1')
+        elif body is not None:
+            body = memoryview(body).cast('B')
+        return key, _encode_request(method, target, host, headers, body), body
+
+    @staticmethod
+    def _getresponse(conn, method):
+        response = client.HTTPResponse(conn, method=method)
+        response.begin()
+        return response
+
+    def _release(self, conn, response, reusable):
+        reusable = reusable and not response.will_close
+        if reusable and response.version == 11:
+            self._persistent.add(conn.key)
+        self.pool.put(conn, reusable)
@@ -76,7 +76,12 @@ class Hub(hub.BaseHub):
 
         Typically not called directly by users.
         """
-        super().add_timer(timer)
+        scheduled_time = super().add_timer(timer)
+        self.sleep_event.set()
+        return scheduled_time
+
+    def run_soon(self, cb, *args, **kw):
+        super().run_soon(cb, *args, **kw)
         self.sleep_event.set()
 
     def _file_cb(self, cb, fileno):
@@ -164,7 +169,9 @@ class Hub(hub.BaseHub):
                         self.block_detect_post()
                     self.prepare_timers()
                     wakeup_when = self.sleep_until()
-                    if wakeup_when is None:
+                    if self.run_queue:
+                        sleep_time = 0
+                    elif wakeup_when is None:
                         sleep_time = self.default_sleep()
                     else:
                         sleep_time = wakeup_when - self.clock()
@@ -180,6 +187,7 @@ class Hub(hub.BaseHub):
                     self.timers_canceled = 0
                     del self.timers[:]
                     del self.next_timers[:]
+                    self.run_queue.clear()
             finally:
                 self.running = False
                 self.stopping = False
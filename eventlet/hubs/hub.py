@@ -1,3 +1,4 @@
+import collections
 import errno
 import heapq
 import math
@@ -130,6 +131,10 @@ class BaseHub:
         self.running = False
         self.timers = []
         self.next_timers = []
+        # (due time, callback, args, kwargs) to run on the next iteration,
+        # zero-delay timers included: they stay out of the timer heap, but
+        # fire in the order of their due times along with the timers
+        self.run_queue = collections.deque()
         self.lclass = FdListener
         self.timers_canceled = 0
         self.debug_exceptions = True
@@ -354,7 +359,9 @@ class BaseHub:
                     self.block_detect_post()
                 self.prepare_timers()
                 wakeup_when = self.sleep_until()
-                if wakeup_when is None:
+                if self.run_queue:
+                    sleep_time = 0
+                elif wakeup_when is None:
                     sleep_time = self.default_sleep()
                 else:
                     sleep_time = wakeup_when - self.clock()
@@ -366,6 +373,7 @@ class BaseHub:
                 self.timers_canceled = 0
                 del self.timers[:]
                 del self.next_timers[:]
+                self.run_queue.clear()
         finally:
             self.running = False
             self.stopping = False
@@ -401,11 +409,18 @@ class BaseHub:
             sys.stderr.flush()
 
     def add_timer(self, timer):
+        if timer.seconds <= 0:
+            scheduled_time = self.clock()
+            self.run_queue.append((scheduled_time, timer, (), {}))
+            return scheduled_time
         scheduled_time = self.clock() + timer.seconds
         self.next_timers.append((scheduled_time, timer))
         return scheduled_time
 
     def timer_canceled(self, timer):
+        if timer.seconds <= 0:
+            # in the run queue, it is skipped when its turn comes
+            return
         self.timers_canceled += 1
         len_timers = len(self.timers) + len(self.next_timers)
         if len_timers > 1000 and len_timers / 2 <= self.timers_canceled:
@@ -436,6 +451,14 @@ class BaseHub:
         self.add_timer(t)
         return t
 
+    def run_soon(self, cb, *args, **kw):
+        """Call *cb* with the given arguments on the next iteration of the
+        hub, in the same order as a zero-delay timer scheduled instead would
+        be.  Unlike such a timer, the call cannot be canceled, and costs no
+        ``Timer`` nor heap operations.
+        """
+        self.run_queue.append((self.clock(), cb, args, kw))
+
     def schedule_call_global(self, seconds, cb, *args, **kw):
         """Schedule a callable to be called after 'seconds' seconds have
         elapsed. The timer will NOT be canceled if the current greenlet has
@@ -452,28 +475,38 @@ class BaseHub:
     def fire_timers(self, when):
         t = self.timers
         heappop = heapq.heappop
-
-        while t:
-            next = t[0]
-
-            exp = next[0]
-            timer = next[1]
-
-            if when < exp:
+        queue = self.run_queue
+        popleft = queue.popleft
+        # only the callbacks queued so far: the ones they queue wait for
+        # the next iteration, after the hub has polled for I/O
+        queued = len(queue)
+
+        while True:
+            # the run queue is in the order of due times already; merge it
+            # with the expired timers
+            if t and t[0][0] <= when and not (queued and queue[0][0] <= t[0][0]):
+                timer = heappop(t)[1]
+                try:
+                    if timer.called:
+                        self.timers_canceled -= 1
+                    else:
+                        timer()
+                except self.SYSTEM_EXCEPTIONS:
+                    raise
+                except:
+                    self.squelch_timer_exception(timer, sys.exc_info())
+            elif queued:
+                queued -= 1
+                _due, cb, args, kw = popleft()
+                try:
+                    cb(*args, **kw)
+                except self.SYSTEM_EXCEPTIONS:
+                    raise
+                except:
+                    self.squelch_timer_exception(cb, sys.exc_info())
+            else:
                 break
 
-            heappop(t)
-
-            try:
-                if timer.called:
-                    self.timers_canceled -= 1
-                else:
-                    timer()
-            except self.SYSTEM_EXCEPTIONS:
-                raise
-            except:
-                self.squelch_timer_exception(timer, sys.exc_info())
-
     # for debugging:
 
     def get_readers(self):
@@ -483,7 +516,7 @@ class BaseHub:
         return self.listeners[WRITE].values()
 
     def get_timers_count(hub):
-        return len(hub.timers) + len(hub.next_timers)
+        return len(hub.timers) + len(hub.next_timers) + len(hub.run_queue)
 
     def set_debug_listeners(self, value):
         if value:
@@ -1,5 +1,10 @@
+import collections
+import contextlib
+import sys
+
+import eventlet
 from eventlet import hubs
-from eventlet.semaphore import Semaphore
+from eventlet.semaphore import Semaphore, _GRANTED
 
 
 class Lock(Semaphore):
@@ -27,11 +32,355 @@ class Lock(Semaphore):
         # deadlocking because garbage collection happened to run mid-release
         # and eliminating the extra stack frame should help prevent that.
         # See https://github.com/eventlet/eventlet/issues/742
-        self.counter += 1
         if self._waiters:
-            hubs.get_hub().schedule_call_global(0, self._do_acquire)
+            self._granted.append(self._waiters.popleft())
+            if not self._wakeup:
+                self._wakeup = True
+                hubs.get_hub().run_soon(self._do_acquire)
+        else:
+            self.counter += 1
         return True
 
     def _at_fork_reinit(self):
         self.counter = 1
         self._waiters.clear()
+        self._granted.clear()
+        self._wakeup = False
+
+
+_READ = 'read'
+_WRITE = 'write'
+
+
+class RWLock:
+
+    """A reader-writer lock.
+
+    Any number of greenthreads may hold the lock for reading at the same
+    time, while holding it for writing is exclusive.  The lock prefers
+    writers: once a writer is waiting, greenthreads that do not already hold
+    the read lock queue up behind it instead of joining the current readers.
+    Waiters are served in FIFO order, consecutive readers at the head of the
+    queue being let in together.
+
+    Read locks are reentrant, write locks are not.  A reader may
+    :meth:`upgrade` its read lock to a write lock, and a writer may
+    :meth:`downgrade` back to reading without letting other writers in.
+
+    The :meth:`read_locked` and :meth:`write_locked` methods return context
+    managers::
+
+      rwlock = RWLock()
+      with rwlock.read_locked():
+          value = cache.get(key)
+      with rwlock.write_locked():
+          cache[key] = value
+    """
+
+    def __init__(self):
+        self._readers = {}
+        self._writer = None
+        # FIFO of [greenthread, kind] entries blocked in acquire_*()
+        self._waiters = collections.deque()
+        self._upgrader = None
+        # same hand-over scheme as Semaphore: ownership is assigned before the
+        # waiter is switched to, by one shared hub callback
+        self._granted = collections.deque()
+        self._wakeup = False
+
+    def __repr__(self):
+        params = (self.__class__.__name__, hex(id(self)), len(self._readers),
+                  self._writer is not None, len(self._waiters))
+        return '<%s at %s readers=%s writer=%s _w[%s]>' % params
+
+    def read_locked(self):
+        """Return a context manager holding the lock for reading."""
+        return self._locked(self.acquire_read, self.release_read)
+
+    def write_locked(self):
+        """Return a context manager holding the lock for writing."""
+        return self._locked(self.acquire_write, self.release_write)
+
+    @contextlib.contextmanager
+    def _locked(self, acquire, release):
+        acquire()
+        try:
+            yield self
+        finally:
+            release()
+
+    def acquire_read(self, blocking=True, timeout=None):
+        """Acquire the lock for reading.
+
+        *blocking* and *timeout* behave as for :meth:`Semaphore.acquire`.
+        Returns ``True`` if the lock was acquired, ``False`` otherwise.
+        """
+        current = eventlet.getcurrent()
+        if current in self._readers:
+            self._readers[current] += 1
+            return True
+        if current is self._writer:
+            raise RuntimeError('cannot acquire the read lock while holding the write lock')
+        if self._writer is None and self._upgrader is None and not self._waiters:
+            self._readers[current] = 1
+            return True
+        return self._wait(current, _READ, blocking, timeout)
+
+    def release_read(self):
+        """Release the read lock held by the current greenthread."""
+        current = eventlet.getcurrent()
+        count = self._readers.get(current)
+        if count is None:
+            raise RuntimeError('cannot release un-acquired read lock')
+        if count > 1:
+            self._readers[current] = count - 1
+        else:
+            del self._readers[current]
+            self._dispatch()
+
+    def acquire_write(self, blocking=True, timeout=None):
+        """Acquire the lock for writing.
+
+        *blocking* and *timeout* behave as for :meth:`Semaphore.acquire`.
+        Returns ``True`` if the lock was acquired, ``False`` otherwise.
+        """
+        current = eventlet.getcurrent()
+        if current is self._writer:
+            raise RuntimeError('the write lock is not reentrant')
+        if current in self._readers:
+            raise RuntimeError('cannot acquire the write lock while holding the read lock, use upgrade()')
+        if (self._writer is None and not self._readers and
+                self._upgrader is None and not self._waiters):
+            self._writer = current
+            return True
+        return self._wait(current, _WRITE, blocking, timeout)
+
+    def release_write(self):
+        """Release the write lock held by the current greenthread."""
+        if self._writer is not eventlet.getcurrent():
+            raise RuntimeError('cannot release un-acquired write lock')
+        self._writer = None
+        self._dispatch()
+
+    def upgrade(self, blocking=True, timeout=None):
+        """Turn the read lock held by the current greenthread into a write lock.
+
+        Waits until all other readers are gone; the upgrade takes precedence
+        over writers already waiting.  Only one greenthread may wait to
+        upgrade at a time, since two would deadlock each other: a second one
+        gets :exc:`RuntimeError`.  Returns ``True`` on success, and ``False``
+        if it timed out, in which case the read lock is still held.
+        """
+        current = eventlet.getcurrent()
+        if self._readers.get(current) != 1:
+            raise RuntimeError('upgrade() needs the read lock held exactly once')
+        if self._upgrader is not None:
+            raise RuntimeError('another greenthread is already waiting to upgrade')
+        if len(self._readers) == 1:
+            del self._readers[current]
+            self._writer = current
+            return True
+        return self._wait(current, None, blocking, timeout)
+
+    def downgrade(self):
+        """Turn the write lock held by the current greenthread into a read
+        lock, letting waiting readers in."""
+        current = eventlet.getcurrent()
+        if self._writer is not current:
+            raise RuntimeError('cannot downgrade un-acquired write lock')
+        self._writer = None
+        self._readers[current] = 1
+        self._dispatch()
+
+    def _wait(self, current, kind, blocking, timeout):
+        if not blocking:
+            return False
+        if kind is None:
+            self._upgrader = current
+        else:
+            entry = [current, kind]
+            self._waiters.append(entry)
+        hub = hubs.get_hub()
+        try:
+            if timeout is not None:
+                with eventlet.Timeout(timeout, False):
+                    while hub.switch() is not _GRANTED:
+                        pass
+                    return True
+                return self._abandon(current, kind, None)
+            while hub.switch() is not _GRANTED:
+                pass
+            return True
+        except BaseException:
+            self._abandon(current, kind, sys.exc_info()[1])
+            raise
+
+    def _abandon(self, current, kind, exc):
+        # see Semaphore._abandon
+        if kind is None:
+            if self._upgrader is current:
+                self._upgrader = None
+                self._dispatch()
+                return False
+        else:
+            for entry in self._waiters:
+                if entry[0] is current:
+                    self._waiters.remove(entry)
+                    # readers queued behind a writer that gave up may go now
+                    self._dispatch()
+                    return False
+        try:
+            self._granted.remove(current)
+        except ValueError:
+            pass
+        if exc is None:
+            return True
+        if kind is _READ:
+            self.release_read()
+        else:
+            # the write lock, possibly obtained through upgrade(); keep the
+            # read lock that upgrade() was called with
+            self._writer = None
+            if kind is None:
+                self._readers[current] = 1
+            self._dispatch()
+        return False
+
+    def _dispatch(self):
+        if self._writer is not None:
+            return
+        if self._upgrader is not None:
+            if len(self._readers) == 1:
+                upgrader = self._upgrader
+                self._upgrader = None
+                del self._readers[upgrader]
+                self._writer = upgrader
+                self._grant(upgrader)
+            return
+        while self._waiters:
+            current, kind = self._waiters[0]
+            if kind is _WRITE:
+                if not self._readers:
+                    self._waiters.popleft()
+                    self._writer = current
+                    self._grant(current)
+                return
+            self._waiters.popleft()
+            self._readers[current] = 1
+            self._grant(current)
+
+    def _grant(self, current):
+        self._granted.append(current)
+        if not self._wakeup:
+            self._wakeup = True
+            hubs.get_hub().run_soon(self._do_acquire)
+
+    def _do_acquire(self):
+        self._wakeup = False
+        for _ in range(len(self._granted)):
+            if not self._granted:
+                break
+            self._granted.popleft().switch(_GRANTED)
+
+
+class KeyedLock:
+
+    """A family of locks, one per key, created on demand.
+
+    Greenthreads locking the same key are serialised, while different keys
+    do not contend with each other::
+
+      locks = KeyedLock()
+      with locks.lock(user_id):
+          update_user(user_id)
+
+    A key's :class:`Lock` only exists while some greenthread holds or waits
+    for it, so memory use is bounded by the number of keys in use, not by the
+    number of keys ever seen.
+    """
+
+    def __init__(self):
+        # key -> [Lock, number of greenthreads holding or waiting for it]
+        self._locks = {}
+
+    def __repr__(self):
+        return '<%s at %s keys=%s>' % (self.__class__.__name__, hex(id(self)), len(self._locks))
+
+    def __len__(self):
+        return len(self._locks)
+
+    def lock(self, key):
+        """Return a context manager holding the lock for *key*."""
+        return self._locked(key)
+
+    @contextlib.contextmanager
+    def _locked(self, key):
+        self.acquire(key)
+        try:
+            yield
+        finally:
+            self.release(key)
+
+    def locked(self, key):
+        """Returns true if a call to :meth:`acquire` for *key* would block."""
+        entry = self._locks.get(key)
+        return entry is not None and entry[0].locked()
+
+    def acquire(self, key, blocking=True, timeout=None):
+        """Acquire the lock for *key*; arguments and return value are the
+        same as for :meth:`Semaphore.acquire`."""
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [Lock(), 0]
+        entry[1] += 1
+        acquired = False
+        try:
+            acquired = entry[0].acquire(blocking, timeout)
+        finally:
+            if not acquired:
+                self._put(key, entry)
+        return acquired
+
+    def release(self, key):
+        """Release the lock for *key*."""
+        entry = self._locks.get(key)
+        if entry is None:
+            raise RuntimeError('release unlocked lock')
+        entry[0].release()
+        self._put(key, entry)
+
+    def _put(self, key, entry):
+        entry[1] -= 1
+        if not entry[1]:
+            del self._locks[key]
+
+
+class StripedLock:
+
+    """A fixed number of locks shared among keys by hash.
+
+    Like :class:`KeyedLock`, but keys are mapped onto *stripes* preallocated
+    :class:`Lock` objects, so unrelated keys occasionally contend with each
+    other in exchange for no per-key bookkeeping at all::
+
+      locks = StripedLock(64)
+      with locks.lock(cache_key):
+          refresh(cache_key)
+    """
+
+    def __init__(self, stripes=64):
+        if stripes < 1:
+            raise ValueError('StripedLock() expect stripes >= 1, actual: {}'.format(repr(stripes)))
+        self._stripes = [Lock() for _ in range(stripes)]
+
+    def lock(self, key):
+        """Return the :class:`Lock` guarding *key*; it is a context manager."""
+        return self._stripes[hash(key) % len(self._stripes)]
+
+    def acquire(self, key, blocking=True, timeout=None):
+        """Acquire the lock guarding *key*."""
+        return self.lock(key).acquire(blocking, timeout)
+
+    def release(self, key):
+        """Release the lock guarding *key*."""
+        self.lock(key).release()
@@ -1,11 +1,19 @@
 import collections
 from contextlib import contextmanager
+import time
+import traceback
+import weakref
 
+from eventlet import greenthread
 from eventlet import queue
 
 
 __all__ = ['Pool', 'TokenPool']
 
+# sent to a waiting get() when the item it was meant to receive was thrown
+# away, meaning that the getter should create a replacement itself
+_CREATE = object()
+
 
 class Pool:
     """
@@ -51,9 +59,24 @@ class Pool:
     *max_size* items 'checked out' of the pool, the pool will cause any
     greenthread calling :meth:`get` to cooperatively yield until an item
     is :meth:`put` in.
+
+    Items can be checked before they are handed out again by passing a
+    *validate* function (or overriding :meth:`validate`); items it rejects
+    are passed to *dispose* and replaced.  *on_checkout* is called with every
+    item handed out by :meth:`get`.
+
+    A maintainer greenthread keeps the pool warm in the background when
+    *min_idle*, *idle_timeout* or *max_lifetime* is given: every
+    *maintain_interval* seconds it disposes of free items that have been
+    idle for longer than *idle_timeout* seconds or exist for longer than
+    *max_lifetime* seconds, and creates items until at least *min_idle* of
+    them are free (within *max_size*).  :meth:`stats` reports checkout and
+    wait-time counters.
     """
 
-    def __init__(self, min_size=0, max_size=4, order_as_stack=False, create=None):
+    def __init__(self, min_size=0, max_size=4, order_as_stack=False, create=None,
+                 validate=None, on_checkout=None, dispose=None,
+                 min_idle=0, idle_timeout=None, max_lifetime=None, maintain_interval=1.0):
         """*order_as_stack* governs the ordering of the items in the free pool.
         If ``False`` (the default), the free items collection (of items that
         were created and were put back in the pool) acts as a round-robin,
@@ -69,27 +92,115 @@ class Pool:
         self.free_items = collections.deque()
         if create is not None:
             self.create = create
+        if validate is not None:
+            self.validate = validate
+        if on_checkout is not None:
+            self.on_checkout = on_checkout
+        if dispose is not None:
+            self.dispose = dispose
+        self.min_idle = min_idle
+        self.idle_timeout = idle_timeout
+        self.max_lifetime = max_lifetime
+        self.maintain_interval = maintain_interval
+        # id(item) -> [item, created_at, last_used], only kept when items
+        # expire; see _times()
+        self._item_times = {}
+        self._tracking = idle_timeout is not None or max_lifetime is not None
+        self._stats = dict.fromkeys(
+            ('checkouts', 'created', 'disposed', 'validation_failures', 'expired', 'waits'), 0)
+        self._wait_time = 0.0
+        self._max_wait_time = 0.0
 
         for x in range(min_size):
             self.current_size += 1
-            self.free_items.append(self.create())
+            self.free_items.append(self._create())
+
+        self._maintainer = None
+        if min_idle or self._tracking:
+            self._maintainer = greenthread.spawn_n(_maintain, weakref.ref(self))
 
     def get(self):
         """Return an item from the pool, when one is available.  This may
         cause the calling greenthread to block.
         """
-        if self.free_items:
-            return self.free_items.popleft()
+        while self.free_items:
+            item = self.free_items.popleft()
+            if self._tracking and self._expired(item, time.monotonic()):
+                self._stats['expired'] += 1
+                self._discard(item)
+            elif not self.validate(item):
+                self._stats['validation_failures'] += 1
+                self._discard(item)
+            else:
+                return self._checkout(item)
         self.current_size += 1
         if self.current_size <= self.max_size:
             try:
-                created = self.create()
+                created = self._create()
             except:
                 self.current_size -= 1
                 raise
-            return created
+            return self._checkout(created)
         self.current_size -= 1  # did not create
-        return self.channel.get()
+        self._stats['waits'] += 1
+        started = time.monotonic()
+        try:
+            item = self.channel.get()
+        finally:
+            waited = time.monotonic() - started
+            self._wait_time += waited
+            self._max_wait_time = max(self._max_wait_time, waited)
+        if item is _CREATE:
+            try:
+                item = self._create()
+            except:
+                self.current_size -= 1
+                raise
+        return self._checkout(item)
+
+    def _create(self):
+        item = self.create()
+        self._stats['created'] += 1
+        if self._tracking:
+            now = time.monotonic()
+            self._item_times[id(item)] = [item, now, now]
+        return item
+
+    def _checkout(self, item):
+        self._stats['checkouts'] += 1
+        try:
+            self.on_checkout(item)
+        except:
+            self._discard(item)
+            raise
+        return item
+
+    def _discard(self, item):
+        self.current_size -= 1
+        self._stats['disposed'] += 1
+        if self._times(item) is not None:
+            del self._item_times[id(item)]
+        try:
+            self.dispose(item)
+        except Exception:
+            traceback.print_exc()
+
+    def _times(self, item):
+        # the entry of this very item, not of one that had the same id
+        times = self._item_times.get(id(item))
+        if times is None or times[0] is not item:
+            return None
+        return times
+
+    def _expired(self, item, now):
+        times = self._times(item)
+        if times is None:
+            return False
+        _item, created_at, last_used = times
+        if self.max_lifetime is not None and now - created_at > self.max_lifetime:
+            return True
+        return (self.idle_timeout is not None and now - last_used > self.idle_timeout and
+                self.current_size > self.min_size)
 
     @contextmanager
     def item(self):
@@ -115,15 +226,44 @@ class Pool:
         cause the putting greenthread to block.
         """
         if self.current_size > self.max_size:
-            self.current_size -= 1
+            self._discard(item)
             return
 
+        if self._tracking:
+            now = time.monotonic()
+            times = self._times(item)
+            if times is not None:
+                times[2] = now
+            if (self.max_lifetime is not None and times is not None and
+                    now - times[1] > self.max_lifetime):
+                self._stats['expired'] += 1
+                if self.waiting():
+                    # keep the slot for the waiter, which creates a new item
+                    self.current_size += 1
+                    self._discard(item)
+                    item = _CREATE
+                else:
+                    self._discard(item)
+                    return
+
+        self._add_free(item)
+
+    def _add_free(self, item):
         if self.waiting():
+            if item is not _CREATE and not self.validate(item):
+                # as get() would have done with it
+                self._stats['validation_failures'] += 1
+                self.current_size += 1
+                self._discard(item)
+                item = _CREATE
             try:
                 self.channel.put(item, block=False)
                 return
             except queue.Full:
-                pass
+                if item is _CREATE:
+                    # nobody to create the replacement, give the slot back
+                    self.current_size -= 1
+                    return
 
         if self.order_as_stack:
             self.free_items.appendleft(item)
@@ -152,6 +292,74 @@ class Pool:
         """
         return max(0, self.channel.getting() - self.channel.putting())
 
+    def stats(self):
+        """Return a dict of counters describing the pool's activity: items
+        ``checkouts``, ``created``, ``disposed``, ``expired`` and rejected by
+        :meth:`validate` (``validation_failures``), the number of :meth:`get`
+        calls that had to wait for an item (``waits``) along with the total and
+        longest time spent waiting in seconds (``wait_time``,
+        ``max_wait_time``), and the current ``size``, ``free`` and ``waiting``
+        counts.
+        """
+        stats = dict(self._stats)
+        stats['wait_time'] = self._wait_time
+        stats['max_wait_time'] = self._max_wait_time
+        stats['size'] = self.current_size
+        stats['free'] = len(self.free_items)
+        stats['waiting'] = self.waiting()
+        return stats
+
+    def maintain(self):
+        """Dispose of expired free items and create new ones until *min_idle*
+        items are free.  The maintainer greenthread calls this periodically.
+        """
+        if self._tracking:
+            now = time.monotonic()
+            for item in list(self.free_items):
+                if self._expired(item, now):
+                    self.free_items.remove(item)
+                    self._stats['expired'] += 1
+                    self._discard(item)
+        while ((len(self.free_items) < self.min_idle or self.current_size < self.min_size) and
+               self.current_size < self.max_size):
+            self.current_size += 1
+            try:
+                item = self._create()
+            except:
+                self.current_size -= 1
+                raise
+            self._add_free(item)
+
+    def close(self):
+        """Stop the maintainer greenthread, if any, and dispose of all free
+        items.  Items still checked out are disposed of when they are
+        :meth:`put` back.
+        """
+        if self._maintainer is not None:
+            greenthread.kill(self._maintainer)
+            self._maintainer = None
+        self.max_size = 0
+        while self.free_items:
+            self._discard(self.free_items.popleft())
+
+    def validate(self, item):
+        """Return ``False`` if *item*, taken from the free items, must not be
+        handed out again; it is then passed to :meth:`dispose`.  By default
+        every item is valid.
+        """
+        return True
+
+    def on_checkout(self, item):
+        """Called with every item handed out by :meth:`get`.  If it raises,
+        the item is disposed of and the exception propagates to the caller.
+        """
+
+    def dispose(self, item):
+        """Called with every item the pool drops: rejected by :meth:`validate`,
+        expired, or in excess of *max_size*.  Does nothing by default; override
+        it (or pass *dispose*) to close connections and the like.
+        """
+
     def create(self):
         """Generate a new pool item.  In order for the pool to
         function, either this method must be overriden in a subclass
@@ -170,6 +378,22 @@ class Pool:
         raise NotImplementedError("Implement in subclass")
 
 
+def _maintain(pool_ref):
+    # holds only a weak reference between runs, so that an abandoned pool
+    # can be garbage collected and its maintainer stops
+    while True:
+        pool = pool_ref()
+        if pool is None:
+            return
+        interval = pool.maintain_interval
+        try:
+            pool.maintain()
+        except Exception:
+            traceback.print_exc()
+        del pool
+        greenthread.sleep(interval)
+
+
 class Token:
     pass
 
@@ -42,10 +42,14 @@ in :meth:`put <Queue.put>` or :meth:`get <Queue.get>` respectively.
 
 import collections
 import heapq
+import os
 import sys
 import traceback
 import types
+import weakref
 
+from eventlet import hubs
+from eventlet import patcher
 from eventlet.event import Event
 from eventlet.greenthread import getcurrent
 from eventlet.hubs import get_hub
@@ -53,7 +57,11 @@ import queue as Stdlib_Queue
 from eventlet.timeout import Timeout
 
 
-__all__ = ['Queue', 'PriorityQueue', 'LifoQueue', 'LightQueue', 'Full', 'Empty']
+__all__ = ['Queue', 'PriorityQueue', 'LifoQueue', 'LightQueue', 'ThreadSafeQueue', 'Full', 'Empty']
+
+socket = patcher.original('socket')
+threading = patcher.original('threading')
+time = patcher.original('time')
 
 _NONE = object()
 Full = Stdlib_Queue.Full
@@ -156,8 +164,9 @@ class LightQueue:
             self.maxsize = None
         else:
             self.maxsize = maxsize
-        self.getters = set()
-        self.putters = set()
+        # waiters are kept in arrival order so that they are woken up FIFO
+        self.getters = collections.deque()
+        self.putters = collections.deque()
         self._event_unlock = None
         self._init(maxsize)
 
@@ -241,12 +250,12 @@ class LightQueue:
             # there's a free slot, put an item right away
             self._put(item)
             if self.getters:
-                self._schedule_unlock()
+                self._wake_getters()
         elif not block and get_hub().greenlet is getcurrent():
             # we're in the mainloop, so we cannot wait; we can switch() to other greenlets though
             # find a getter and deliver an item to it
             while self.getters:
-                getter = self.getters.pop()
+                getter = self.getters.popleft()
                 if getter:
                     self._put(item)
                     item = self._get()
@@ -255,8 +264,9 @@ class LightQueue:
             raise Full
         elif block:
             waiter = ItemWaiter(item, block)
-            self.putters.add(waiter)
-            timeout = Timeout(timeout, Full)
+            self.putters.append(waiter)
+            if timeout is not None:
+                timeout = Timeout(timeout, Full)
             try:
                 if self.getters:
                     self._schedule_unlock()
@@ -264,12 +274,17 @@ class LightQueue:
                 assert result is waiter, "Invalid switch into Queue.put: %r" % (result, )
                 if waiter.item is not _NONE:
                     self._put(item)
+            except BaseException:
+                # woken up by a timeout or an exception rather than by _unlock(),
+                # so the waiter is most likely still queued
+                _discard(self.putters, waiter)
+                raise
             finally:
-                timeout.cancel()
-                self.putters.discard(waiter)
+                if timeout is not None:
+                    timeout.cancel()
         elif self.getters:
             waiter = ItemWaiter(item, block)
-            self.putters.add(waiter)
+            self.putters.append(waiter)
             self._schedule_unlock()
             result = waiter.wait()
             assert result is waiter, "Invalid switch into Queue.put: %r" % (result, )
@@ -286,6 +301,31 @@ class LightQueue:
         """
         self.put(item, False)
 
+    def put_many(self, items, block=True, timeout=None):
+        """Put every item of the iterable *items* into the queue, in order.
+
+        Items are enqueued directly while there are free slots and waiting
+        getters are woken up once for the whole batch rather than once per
+        item.  When the queue fills up, the remaining items are put one by one
+        as :meth:`put` would, with *block* and *timeout* applying to the batch
+        as a whole.  If :class:`Full` is raised, the items before the one that
+        did not fit stay in the queue.
+        """
+        timer = None
+        if block and timeout is not None:
+            timer = Timeout(timeout, Full)
+        try:
+            for item in items:
+                if self.maxsize is None or self.qsize() < self.maxsize:
+                    self._put(item)
+                else:
+                    self.put(item, block)
+            if self.getters:
+                self._wake_getters()
+        finally:
+            if timer is not None:
+                timer.cancel()
+
     def get(self, block=True, timeout=None):
         """Remove and return an item from the queue.
 
@@ -304,7 +344,7 @@ class LightQueue:
             # special case to make get_nowait() runnable in the mainloop greenlet
             # there are no items in the queue; try to fix the situation by unlocking putters
             while self.putters:
-                putter = self.putters.pop()
+                putter = self.putters.popleft()
                 if putter:
                     putter.switch(putter)
                     if self.qsize():
@@ -312,19 +352,21 @@ class LightQueue:
             raise Empty
         elif block:
             waiter = Waiter()
-            timeout = Timeout(timeout, Empty)
+            if timeout is not None:
+                timeout = Timeout(timeout, Empty)
             try:
-                self.getters.add(waiter)
+                self.getters.append(waiter)
                 if self.putters:
                     self._schedule_unlock()
                 try:
                     return waiter.wait()
                 except:
+                    _discard(self.getters, waiter)
                     self._schedule_unlock()
                     raise
             finally:
-                self.getters.discard(waiter)
-                timeout.cancel()
+                if timeout is not None:
+                    timeout.cancel()
         else:
             raise Empty
 
@@ -336,11 +378,33 @@ class LightQueue:
         """
         return self.get(False)
 
+    def get_many(self, max_items=None, block=True, timeout=None):
+        """Remove and return a list of up to *max_items* items from the queue.
+
+        If the queue is empty, wait for the first item exactly like :meth:`get`
+        does with the same *block* and *timeout* arguments, raising
+        :class:`Empty` if none arrives.  Then take whatever else is
+        immediately available, without blocking again.  *max_items* of
+        ``None`` drains the queue.  Waiting putters are woken up once for
+        the whole batch.
+        """
+        if max_items is not None and max_items < 1:
+            raise ValueError('max_items must be a positive integer or None')
+        if self.qsize():
+            items = []
+        else:
+            items = [self.get(block, timeout)]
+        while self.qsize() and (max_items is None or len(items) < max_items):
+            items.append(self._get())
+        if self.putters:
+            self._schedule_unlock()
+        return items
+
     def _unlock(self):
         try:
             while True:
                 if self.qsize() and self.getters:
-                    getter = self.getters.pop()
+                    getter = self.getters.popleft()
                     if getter:
                         try:
                             item = self._get()
@@ -349,9 +413,9 @@ class LightQueue:
                         else:
                             getter.switch(item)
                 elif self.putters and self.getters:
-                    putter = self.putters.pop()
+                    putter = self.putters.popleft()
                     if putter:
-                        getter = self.getters.pop()
+                        getter = self.getters.popleft()
                         if getter:
                             item = putter.item
                             # this makes greenlet calling put() not to call _put() again
@@ -361,18 +425,18 @@ class LightQueue:
                             getter.switch(item)
                             putter.switch(putter)
                         else:
-                            self.putters.add(putter)
+                            self.putters.appendleft(putter)
                 elif self.putters and (self.getters or
                                        self.maxsize is None or
                                        self.qsize() < self.maxsize):
-                    putter = self.putters.pop()
+                    putter = self.putters.popleft()
                     putter.switch(putter)
                 elif self.putters and not self.getters:
                     full = [p for p in self.putters if not p.block]
                     if not full:
                         break
                     for putter in full:
-                        self.putters.discard(putter)
+                        _discard(self.putters, putter)
                         get_hub().schedule_call_global(
                             0, putter.greenlet.throw, Full)
                 else:
@@ -387,12 +451,28 @@ class LightQueue:
         if self._event_unlock is None:
             self._event_unlock = get_hub().schedule_call_global(0, self._unlock)
 
+    def _wake_getters(self):
+        # When called from the mainloop the waiting getters can be switched to
+        # directly; otherwise the hand-off is deferred to a single zero-delay
+        # timer, shared by every put() until it fires.
+        if self._event_unlock is None and getcurrent() is get_hub().greenlet:
+            self._unlock()
+        else:
+            self._schedule_unlock()
+
     # TODO(stephenfin): Remove conditional when we bump the minimum Python
     # version
     if sys.version_info >= (3, 9):
         __class_getitem__ = classmethod(types.GenericAlias)
 
 
+def _discard(waiters, waiter):
+    try:
+        waiters.remove(waiter)
+    except ValueError:
+        pass
+
+
 class ItemWaiter(Waiter):
     __slots__ = ['item', 'block']
 
@@ -494,3 +574,285 @@ class LifoQueue(Queue):
 
     def _get(self):
         return self.queue.pop()
+
+
+class _HubWaker:
+    """Runs callbacks submitted from other OS threads inside one hub.
+
+    The hub listens on an eventfd (or on a socket pair where eventfd is not
+    available) for as long as some greenthread is waiting; :meth:`call`
+    queues a callback and signals the descriptor at most once until the hub
+    has drained the pending callbacks.  The descriptors are closed by
+    :meth:`close`, or once the waker is garbage collected, along with the
+    thread or hub it served.
+    """
+
+    def __init__(self):
+        self.hub = get_hub()
+        self.thread_id = threading.get_ident()
+        self._callbacks = collections.deque()
+        self._lock = threading.Lock()
+        self._signalled = False
+        self._listener = None
+        self._waiting = 0
+        if hasattr(os, 'eventfd'):
+            self._rfd = os.eventfd(0, os.EFD_NONBLOCK | os.EFD_CLOEXEC)
+            self._rsock = self._wsock = None
+        else:
+            self._rsock, self._wsock = socket.socketpair()
+            self._rsock.setblocking(False)
+            self._wsock.setblocking(False)
+            self._rfd = self._rsock.fileno()
+        self._finalizer = weakref.finalize(self, _close_waker, self._rfd, self._rsock, self._wsock)
+
+    def acquire(self):
+        # called by a greenthread of this hub before it goes to sleep
+        self._waiting += 1
+        if self._listener is None:
+            self._listener = self.hub.add(
+                self.hub.READ, self._rfd, self._readable, self._closed, None)
+
+    def release(self):
+        self._waiting -= 1
+        if not self._waiting and self._listener is not None:
+            self.hub.remove(self._listener)
+            self._listener = None
+
+    def call(self, cb, *args):
+        self._callbacks.append((cb, args))
+        with self._lock:
+            if self._signalled:
+                return
+            self._signalled = True
+        try:
+            if self._wsock is None:
+                os.eventfd_write(self._rfd, 1)
+            else:
+                self._wsock.send(b'x')
+        except BlockingIOError:
+            # the descriptor is already readable, the hub will wake up anyway
+            pass
+
+    def _readable(self, fileno):
+        try:
+            if self._rsock is None:
+                os.eventfd_read(self._rfd)
+            else:
+                while self._rsock.recv(4096):
+                    pass
+        except BlockingIOError:
+            pass
+        with self._lock:
+            self._signalled = False
+        while self._callbacks:
+            cb, args = self._callbacks.popleft()
+            try:
+                cb(*args)
+            except Exception:
+                traceback.print_exc()
+
+    def _closed(self, *args):
+        pass
+
+    def close(self):
+        """Stop listening and close the descriptors."""
+        if self._listener is not None:
+            self.hub.remove(self._listener)
+            self._listener = None
+        self._finalizer()
+
+
+def _close_waker(rfd, rsock, wsock):
+    if rsock is None:
+        os.close(rfd)
+    else:
+        rsock.close()
+        wsock.close()
+
+
+_wakers = threading.local()
+
+
+def _get_waker():
+    waker = getattr(_wakers, 'waker', None)
+    if waker is None or waker.hub is not get_hub() or not waker._finalizer.alive:
+        waker = _wakers.waker = _HubWaker()
+    return waker
+
+
+class _GreenThreadWaiter:
+    __slots__ = ['event', 'waker']
+
+    def __init__(self):
+        self.event = Event()
+        self.waker = _get_waker()
+
+    def wait(self, timeout):
+        self.waker.acquire()
+        try:
+            return self.event.wait(timeout) is not None
+        finally:
+            self.waker.release()
+
+    def wake(self):
+        if self.waker.thread_id == threading.get_ident():
+            self._send()
+        else:
+            self.waker.call(self._send)
+
+    def _send(self):
+        if not self.event.ready():
+            self.event.send(True)
+
+
+class _NativeThreadWaiter:
+    __slots__ = ['lock']
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.lock.acquire()
+
+    def wait(self, timeout):
+        if timeout is None:
+            return self.lock.acquire()
+        return self.lock.acquire(timeout=max(timeout, 0))
+
+    def wake(self):
+        self.lock.release()
+
+
+def _make_waiter():
+    if getattr(hubs._threadlocal, 'hub', None) is not None:
+        return _GreenThreadWaiter()
+    return _NativeThreadWaiter()
+
+
+class ThreadSafeQueue:
+    """A FIFO queue that may be shared by greenthreads and native threads.
+
+    Any OS thread, including ones running a hub of their own, may
+    :meth:`put` and :meth:`get` without blocking the other threads' hubs.
+    Greenthreads wait cooperatively on their hub, which is woken up through
+    an eventfd (or a socket pair where eventfd is not available) when
+    another thread hands them work; this makes the queue suitable for
+    pushing results from native thread pools and C-extension callbacks into
+    green code.  Threads without a hub wait on a lock as usual.
+
+    *maxsize* of ``None`` or less than zero means the queue is unbounded.
+    Unlike :class:`Queue`, a *maxsize* of zero (a channel) is not supported.
+    """
+
+    def __init__(self, maxsize=None):
+        if maxsize is None or maxsize < 0:
+            maxsize = None
+        elif maxsize == 0:
+            raise ValueError('ThreadSafeQueue does not support maxsize=0')
+        self.maxsize = maxsize
+        self.queue = collections.deque()
+        self._lock = threading.Lock()
+        self._getters = collections.deque()
+        self._putters = collections.deque()
+
+    def __repr__(self):
+        return '<%s at %s maxsize=%r qsize=%d>' % (
+            type(self).__name__, hex(id(self)), self.maxsize, len(self.queue))
+
+    def qsize(self):
+        """Return the size of the queue."""
+        return len(self.queue)
+
+    def empty(self):
+        """Return ``True`` if the queue is empty, ``False`` otherwise."""
+        return not self.queue
+
+    def full(self):
+        """Return ``True`` if the queue is full, ``False`` otherwise."""
+        return self.maxsize is not None and len(self.queue) >= self.maxsize
+
+    def put(self, item, block=True, timeout=None):
+        """Put an item into the queue.
+
+        Blocks the calling greenthread or thread while the queue is full,
+        with the same *block* and *timeout* semantics as :meth:`Queue.put`.
+        """
+        deadline = None
+        while True:
+            with self._lock:
+                if not self.full():
+                    self.queue.append(item)
+                    ready = self._ready_waiters()
+                    break
+                if not block:
+                    raise Full
+                waiter = _make_waiter()
+                self._putters.append(waiter)
+            deadline = self._sleep(self._putters, waiter, timeout, deadline, Full)
+        for waiter in ready:
+            waiter.wake()
+
+    def put_nowait(self, item):
+        """Put an item into the queue without blocking, or raise :class:`Full`."""
+        self.put(item, False)
+
+    def get(self, block=True, timeout=None):
+        """Remove and return an item from the queue.
+
+        Blocks the calling greenthread or thread while the queue is empty,
+        with the same *block* and *timeout* semantics as :meth:`Queue.get`.
+        """
+        deadline = None
+        while True:
+            with self._lock:
+                if self.queue:
+                    item = self.queue.popleft()
+                    ready = self._ready_waiters()
+                    break
+                if not block:
+                    raise Empty
+                waiter = _make_waiter()
+                self._getters.append(waiter)
+            deadline = self._sleep(self._getters, waiter, timeout, deadline, Empty)
+        for waiter in ready:
+            waiter.wake()
+        return item
+
+    def get_nowait(self):
+        """Remove and return an item without blocking, or raise :class:`Empty`."""
+        return self.get(False)
+
+    def _ready_waiters(self):
+        # must be called with self._lock held; at most one waiter of each kind
+        # is woken up, and each of them passes the baton on once it is done
+        ready = []
+        if self._getters and self.queue:
+            ready.append(self._getters.popleft())
+        if self._putters and not self.full():
+            ready.append(self._putters.popleft())
+        return ready
+
+    def _sleep(self, waiters, waiter, timeout, deadline, exc):
+        if timeout is not None:
+            if deadline is None:
+                deadline = time.monotonic() + timeout
+            timeout = deadline - time.monotonic()
+        try:
+            woken = (timeout is None or timeout > 0) and waiter.wait(timeout)
+        except BaseException:
+            self._cancel(waiters, waiter)
+            raise
+        if not woken:
+            self._cancel(waiters, waiter)
+            raise exc
+        return deadline
+
+    def _cancel(self, waiters, waiter):
+        with self._lock:
+            try:
+                waiters.remove(waiter)
+                return
+            except ValueError:
+                # the waiter was already picked to be woken up; hand the
+                # wakeup over to another waiter instead of losing it
+                ready = self._ready_waiters()
+        for waiter in ready:
+            waiter.wake()
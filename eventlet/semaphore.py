@@ -1,9 +1,15 @@
 import collections
+import sys
 
 import eventlet
 from eventlet import hubs
 
 
+# passed to a waiter switched into by _do_acquire, to tell it from spurious
+# switches into a greenthread blocked in acquire()
+_GRANTED = object()
+
+
 class Semaphore:
 
     """An unbounded semaphore.
@@ -22,6 +28,9 @@ class Semaphore:
 
     If not specified, *value* defaults to 1.
 
+    Blocked greenthreads acquire the semaphore in the order they asked for it:
+    :meth:`release` hands ownership directly to the longest waiting one.
+
     It is possible to limit acquire time::
 
       sem = Semaphore()
@@ -41,6 +50,11 @@ class Semaphore:
             raise ValueError(msg)
         self.counter = value
         self._waiters = collections.deque()
+        # waiters that were handed ownership by release() but have not been
+        # switched to yet, and whether the hub callback that will do it is
+        # scheduled
+        self._granted = collections.deque()
+        self._wakeup = False
 
     def __repr__(self):
         params = (self.__class__.__name__, hex(id(self)),
@@ -70,9 +84,8 @@ class Semaphore:
         on entry, block, waiting until some other thread has called release() to
         make it larger than zero. This is done with proper interlocking so that
         if multiple acquire() calls are blocked, release() will wake exactly one
-        of them up. The implementation may pick one at random, so the order in
-        which blocked threads are awakened should not be relied on. There is no
-        return value in this case.
+        of them up. Blocked greenthreads are woken up in the order they called
+        acquire(). There is no return value in this case.
 
         When invoked with blocking set to true, do the same thing as when called
         without arguments, and return true.
@@ -91,6 +104,9 @@ class Semaphore:
             if timeout is not None:
                 raise ValueError("can't specify timeout for non-blocking acquire")
             timeout = 0
+        if self.counter > 0 and not self._waiters:
+            self.counter -= 1
+            return True
         if not blocking and self.locked():
             return False
 
@@ -102,34 +118,24 @@ class Semaphore:
                 return True
             return False
 
-        if self.counter <= 0 or self._waiters:
-            if current_thread not in self._waiters:
-                self._waiters.append(current_thread)
-            try:
-                if timeout is not None:
-                    ok = False
-                    with eventlet.Timeout(timeout, False):
-                        while self.counter <= 0:
-                            hubs.get_hub().switch()
-                        ok = True
-                    if not ok:
-                        return False
-                else:
-                    # If someone else is already in this wait loop, give them
-                    # a chance to get out.
-                    while True:
-                        hubs.get_hub().switch()
-                        if self.counter > 0:
-                            break
-            finally:
-                try:
-                    self._waiters.remove(current_thread)
-                except ValueError:
-                    # Fine if its already been dropped.
+        # Ownership is handed over by release() without touching the counter,
+        # so once switched into with _GRANTED there is nothing left to check.
+        self._waiters.append(current_thread)
+        hub = hubs.get_hub()
+        try:
+            if timeout is not None:
+                with eventlet.Timeout(timeout, False):
+                    while hub.switch() is not _GRANTED:
+                        pass
+                    return True
+                return self._abandon(current_thread, None)
+            else:
+                while hub.switch() is not _GRANTED:
                     pass
-
-        self.counter -= 1
-        return True
+                return True
+        except BaseException:
+            self._abandon(current_thread, sys.exc_info()[1])
+            raise
 
     def __enter__(self):
         self.acquire()
@@ -142,15 +148,45 @@ class Semaphore:
         The *blocking* argument is for consistency with CappedSemaphore and is
         ignored
         """
-        self.counter += 1
         if self._waiters:
-            hubs.get_hub().schedule_call_global(0, self._do_acquire)
+            self._grant()
+        else:
+            self.counter += 1
         return True
 
+    def _grant(self):
+        self._granted.append(self._waiters.popleft())
+        if not self._wakeup:
+            self._wakeup = True
+            hubs.get_hub().run_soon(self._do_acquire)
+
     def _do_acquire(self):
-        if self._waiters and self.counter > 0:
-            waiter = self._waiters.popleft()
-            waiter.switch()
+        # Only wake up the waiters granted so far; ones granted while this runs
+        # wait for the next iteration of the hub, so that greenthreads passing
+        # the semaphore back and forth cannot starve everything else.
+        self._wakeup = False
+        for _ in range(len(self._granted)):
+            if not self._granted:
+                break
+            self._granted.popleft().switch(_GRANTED)
+
+    def _abandon(self, waiter, exc):
+        # A waiter stops waiting because of a timeout or an exception.  If
+        # release() already picked it, either keep the ownership (on timeout,
+        # signalled by exc being None) or pass it on to the next waiter.
+        try:
+            self._waiters.remove(waiter)
+            return False
+        except ValueError:
+            pass
+        try:
+            self._granted.remove(waiter)
+        except ValueError:
+            pass
+        if exc is None:
+            return True
+        self.release()
+        return False
 
     def __exit__(self, typ, val, tb):
         self.release()
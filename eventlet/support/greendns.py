@@ -32,11 +32,14 @@
 # THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
 # (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+import collections
+import copy
 import re
 import struct
 import sys
 
 import eventlet
+from eventlet import hubs
 from eventlet import patcher
 from eventlet.green import _socket_nodns
 from eventlet.green import os
@@ -82,7 +85,17 @@ del import_patched
 socket = _socket_nodns
 
 DNS_QUERY_TIMEOUT = 10.0
+# Sockets to nameservers are kept between queries: at most UDP_POOL_SIZE idle
+# UDP sockets per nameserver, each sending UDP_SOCKET_MAX_USES queries before
+# it is replaced by one on a new random source port, and one TCP connection
+# per nameserver.  They are closed after DNS_IDLE_TIMEOUT seconds unused.
+UDP_POOL_SIZE = 4
+UDP_SOCKET_MAX_USES = 100
+DNS_IDLE_TIMEOUT = 10.0
 HOSTS_TTL = 10.0
+HOSTS_OFFLOAD_SIZE = 64 * 1024
+# upper bound on how long NXDOMAIN/NODATA answers are remembered (RFC 2308)
+NEGATIVE_TTL = 300.0
 
 # NOTE(victor): do not use EAI_*_ERROR instances for raising errors in python3, which will cause a memory leak.
 EAI_EAGAIN_ERROR = socket.gaierror(socket.EAI_AGAIN, 'Lookup timed out')
@@ -173,6 +186,8 @@ class HostsResolver:
 
     :fname: The filename of the hosts file in use.
     :interval: The time between checking for hosts file modification
+    :offload_size: Hosts files larger than this many bytes are read and
+       parsed in a native thread (see :mod:`eventlet.tpool`) when reloaded
     """
 
     LINES_RE = re.compile(r"""
@@ -183,11 +198,14 @@ class HostsResolver:
         (?:$|[\r\n]+)  # EOF or newline
     """, re.VERBOSE)
 
-    def __init__(self, fname=None, interval=HOSTS_TTL):
+    def __init__(self, fname=None, interval=HOSTS_TTL, offload_size=HOSTS_OFFLOAD_SIZE):
+        # The tables are replaced as a whole on reload and never modified
+        # afterwards, so that lookups need no locking.
         self._v4 = {}           # name -> ipv4
         self._v6 = {}           # name -> ipv6
         self._aliases = {}      # name -> canonical_name
         self.interval = interval
+        self.offload_size = offload_size
         self.fname = fname
         if fname is None:
             if os.name == 'posix':
@@ -196,6 +214,7 @@ class HostsResolver:
                 self.fname = os.path.expandvars(
                     r'%SystemRoot%\system32\drivers\etc\hosts')
         self._last_load = 0
+        self._last_stat = 0
         if self.fname:
             self._load()
 
@@ -217,28 +236,34 @@ class HostsResolver:
 
         return filter(None, self.LINES_RE.findall(udata))
 
-    def _load(self):
-        """Load hosts file
+    def _stat(self):
+        """Return what identifies the current version of the hosts file,
+        or None if it does not exist."""
+        try:
+            st = os.stat(self.fname)
+        except OSError:
+            return None
+        return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
 
-        This will unconditionally (re)load the data from the hosts
-        file.
+    def _parse(self):
+        """Read the hosts file and return new (v4, v6, aliases) tables
+
+        This does not touch the resolver's state, it may run in a
+        native thread.
         """
-        lines = self._readlines()
-        self._v4.clear()
-        self._v6.clear()
-        self._aliases.clear()
-        for line in lines:
+        v4, v6, aliases = {}, {}, {}
+        for line in self._readlines():
             parts = line.split()
             if len(parts) < 2:
                 continue
             ip = parts.pop(0)
             if is_ipv4_addr(ip):
-                ipmap = self._v4
+                ipmap = v4
             elif is_ipv6_addr(ip):
                 if ip.startswith('fe80'):
                     # Do not use link-local addresses, OSX stores these here
                     continue
-                ipmap = self._v6
+                ipmap = v6
             else:
                 continue
             cname = parts.pop(0).lower()
@@ -246,8 +271,42 @@ class HostsResolver:
             for alias in parts:
                 alias = alias.lower()
                 ipmap[alias] = ip
-                self._aliases[alias] = cname
+                aliases[alias] = cname
+        return v4, v6, aliases
+
+    def _load(self):
+        """Load hosts file
+
+        This will unconditionally (re)load the data from the hosts
+        file.
+        """
+        # stat before reading: if the file changes in between, the next
+        # check sees a new version and loads it again
+        self._last_stat = self._stat()
+        self._v4, self._v6, self._aliases = self._parse()
+        self._last_load = time.time()
+
+    def _reload(self):
+        """Load the hosts file again if it changed since the last time
+
+        Other greenthreads keep using the current tables while the new
+        ones are being built.
+        """
         self._last_load = time.time()
+        stat = self._stat()
+        if stat == self._last_stat:
+            return
+        self._last_stat = stat
+        try:
+            if stat is not None and stat[2] > self.offload_size:
+                from eventlet import tpool
+                tables = tpool.execute(self._parse)
+            else:
+                tables = self._parse()
+        except BaseException:
+            self._last_stat = 0
+            raise
+        self._v4, self._v6, self._aliases = tables
 
     def query(self, qname, rdtype=dns.rdatatype.A, rdclass=dns.rdataclass.IN,
               tcp=False, source=None, raise_on_no_answer=True):
@@ -264,7 +323,8 @@ class HostsResolver:
         """
         now = time.time()
         if self._last_load + self.interval < now:
-            self._load()
+            self._reload()
+            now = time.time()
         rdclass = dns.rdataclass.IN
         if isinstance(qname, str):
             name = qname
@@ -316,6 +376,146 @@ class HostsResolver:
         return aliases
 
 
+def _copy_error(error):
+    # cached errors are raised again and again; hand out fresh instances so
+    # that none of them carries the traceback of another greenthread
+    if getattr(error, 'kwargs', None):
+        return error.__class__(**error.kwargs)
+    return error.__class__(*error.args)
+
+
+def _negative_ttl(response):
+    """Return how long the negative *response* may be cached, from the SOA
+    record of its authority section, or None if it has none (RFC 2308)."""
+    if response is None:
+        return None
+    for rrset in response.authority:
+        if rrset.rdtype == dns.rdatatype.SOA and len(rrset):
+            return min(rrset.ttl, rrset[0].minimum)
+    return None
+
+
+class QueryCache:
+    """Cache of nameserver answers, shared by the greenthreads of a resolver.
+
+    Answers are kept until their TTL runs out, and so are negative ones
+    (NXDOMAIN, or NODATA for a name without records of the asked type) for
+    as long as the SOA record of their zone allows, but no longer than
+    *negative_ttl* seconds.  Negative answers without a SOA record and
+    failures such as timeouts are not cached.
+
+    Greenthreads asking for a name that is already being looked up wait for
+    the outcome of that query instead of sending their own.  When an answer
+    is used during the last *prefetch* fraction of its TTL, a background
+    greenthread refreshes it, so that names in constant use never stall
+    anyone when they expire.  At most *max_size* answers are kept, the least
+    recently used ones are dropped first.
+    """
+
+    def __init__(self, max_size=10000, negative_ttl=NEGATIVE_TTL, prefetch=0.1):
+        self.max_size = max_size
+        self.negative_ttl = negative_ttl
+        self.prefetch = prefetch
+        self.clear()
+
+    def clear(self):
+        """Forget all the cached answers."""
+        # (qname, rdtype, rdclass) -> (answer, error, expiration, ttl)
+        self._entries = collections.OrderedDict()
+        # keys being looked up -> Event sent the outcome of the lookup
+        self._pending = {}
+        self._stats = dict.fromkeys(('hits', 'misses', 'coalesced', 'prefetches'), 0)
+
+    def query(self, fn, qname, rdtype, rdclass, *args):
+        """Return ``fn(qname, rdtype, rdclass, *args, raise_on_no_answer=False)``,
+        or raise its :exc:`dns.exception.DNSException`, from the cache when
+        possible."""
+        key = (qname, rdtype, rdclass)
+        while True:
+            entry = self._entries.get(key)
+            if entry is not None:
+                answer, error, expiration, ttl = entry
+                remaining = expiration - time.time()
+                if remaining > 0:
+                    self._stats['hits'] += 1
+                    self._entries.move_to_end(key)
+                    if remaining < ttl * self.prefetch and key not in self._pending:
+                        self._stats['prefetches'] += 1
+                        self._pending[key] = event = eventlet.Event()
+                        eventlet.spawn_n(self._refresh, key, event, fn, args)
+                    if error is not None:
+                        raise _copy_error(error)
+                    return answer
+                del self._entries[key]
+            event = self._pending.get(key)
+            if event is None:
+                break
+            self._stats['coalesced'] += 1
+            outcome = event.wait()
+            if outcome is not None:
+                answer, error = outcome
+                if error is not None:
+                    raise _copy_error(error)
+                return answer
+            # the lookup we waited for died without an outcome, try again
+        self._stats['misses'] += 1
+        self._pending[key] = event = eventlet.Event()
+        return self._lookup(key, event, fn, args)
+
+    def _lookup(self, key, event, fn, args):
+        entries = self._entries
+        outcome = None
+        try:
+            try:
+                answer = fn(*key, *args, raise_on_no_answer=False)
+            except dns.exception.DNSException as e:
+                outcome = (None, _copy_error(e))
+                raise
+            outcome = (answer, None)
+            return answer
+        finally:
+            if outcome is not None and entries is self._entries:
+                self._store(key, *outcome)
+            if self._pending.get(key) is event:
+                del self._pending[key]
+            event.send(outcome)
+
+    def _refresh(self, key, event, fn, args):
+        try:
+            self._lookup(key, event, fn, args)
+        except Exception:
+            pass
+
+    def _store(self, key, answer, error):
+        now = time.time()
+        if error is not None:
+            if not isinstance(error, dns.resolver.NXDOMAIN):
+                return
+            ttl = _negative_ttl(error.kwargs.get('responses', {}).get(key[0]))
+        elif answer.rrset is None:
+            ttl = _negative_ttl(answer.response)
+        else:
+            ttl = answer.expiration - now
+        if ttl is None or ttl <= 0:
+            return
+        if error is not None or answer.rrset is None:
+            ttl = min(ttl, self.negative_ttl)
+        self._entries[key] = (answer, error, now + ttl, ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def stats(self):
+        """Return a dict counting the queries answered from the cache
+        (``hits``) or not (``misses``), the ones that waited for an identical
+        query in flight (``coalesced``), the answers refreshed before they
+        expired (``prefetches``), and the current number of cached answers
+        (``size``)."""
+        stats = dict(self._stats)
+        stats['size'] = len(self._entries)
+        return stats
+
+
 class ResolverProxy:
     """Resolver class which can also use /etc/hosts
 
@@ -323,7 +523,8 @@ class ResolverProxy:
     use the hosts file.
     """
 
-    def __init__(self, hosts_resolver=None, filename='/etc/resolv.conf'):
+    def __init__(self, hosts_resolver=None, filename='/etc/resolv.conf',
+                 cache=None):
         """Initialise the resolver proxy
 
         :param hosts_resolver: An instance of HostsResolver to use.
@@ -332,9 +533,13 @@ class ResolverProxy:
            configuration.  The default value is correct for both UNIX
            and Windows, on Windows it will result in the configuration
            being read from the Windows registry.
+
+        :param cache: The QueryCache instance holding the answers of the
+           nameservers, a default one is created if not given.
         """
         self._hosts = hosts_resolver
         self._filename = filename
+        self.cache = cache if cache is not None else QueryCache()
         # NOTE(dtantsur): we cannot create a resolver here since this code is
         # executed on eventlet import. In an environment without DNS, creating
         # a Resolver will fail making eventlet unusable at all. See
@@ -350,6 +555,8 @@ class ResolverProxy:
     @_resolver.setter
     def _resolver(self, value):
         self._cached_resolver = value
+        # answers of the previous resolver are of no use anymore
+        self.cache.clear()
 
     def clear(self):
         self._resolver = dns.resolver.Resolver(filename=self._filename)
@@ -363,7 +570,8 @@ class ResolverProxy:
 
         Behavior:
         1. if hosts is enabled and contains answer, return it now
-        2. query nameservers for qname if use_network is True
+        2. query nameservers for qname if use_network is True, answers are
+           cached by self.cache
         3. if qname did not contain dots, pretend it was top-level domain,
            query "foobar." and append to previous result
         """
@@ -384,7 +592,9 @@ class ResolverProxy:
                 if result[0] is None:
                     result[0] = a
                 else:
-                    result[0].rrset.union_update(a.rrset)
+                    # answers may be cached: merge into a copy
+                    result[0] = copy.copy(result[0])
+                    result[0].rrset = result[0].rrset.union(a.rrset)
                 result[2] += len(a.rrset)
             return True
 
@@ -404,7 +614,7 @@ class ResolverProxy:
                     return end()
 
         # Main query
-        step(self._resolver.query, qname, rdtype, rdclass, tcp, source, raise_on_no_answer=False)
+        step(self.cache.query, self._resolver.query, qname, rdtype, rdclass, tcp, source)
 
         # `resolv.conf` docs say unqualified names must resolve from search (or local) domain.
         # However, common OS `getaddrinfo()` implementations append trailing dot (e.g. `db -> db.`)
@@ -413,8 +623,8 @@ class ResolverProxy:
         # https://github.com/nameko/nameko/issues/392
         # https://github.com/eventlet/eventlet/issues/363
         if len(qname) == 1:
-            step(self._resolver.query, qname.concatenate(dns.name.root),
-                 rdtype, rdclass, tcp, source, raise_on_no_answer=False)
+            step(self.cache.query, self._resolver.query, qname.concatenate(dns.name.root),
+                 rdtype, rdclass, tcp, source)
 
         return end()
 
@@ -512,15 +722,33 @@ def _getaddrinfo_lookup(host, family, flags):
     addrs = []
     if family == socket.AF_UNSPEC:
         err = None
+
+        def lookup(qfamily, use_network):
+            try:
+                return resolve(host, qfamily, False, use_network=use_network), None
+            except socket.gaierror as e:
+                if e.errno not in (socket.EAI_AGAIN, EAI_NONAME_ERROR.errno, EAI_NODATA_ERROR.errno):
+                    raise
+                return None, e
+
         for use_network in [False, True]:
-            for qfamily in [socket.AF_INET6, socket.AF_INET]:
+            if use_network:
+                # the AAAA and A queries are independent, send them together
+                # rather than waiting for two round trips in a row
+                lookup6 = eventlet.spawn(lookup, socket.AF_INET6, True)
                 try:
-                    answer = resolve(host, qfamily, False, use_network=use_network)
-                except socket.gaierror as e:
-                    if e.errno not in (socket.EAI_AGAIN, EAI_NONAME_ERROR.errno, EAI_NODATA_ERROR.errno):
-                        raise
+                    outcome4 = lookup(socket.AF_INET, True)
+                    outcomes = [lookup6.wait(), outcome4]
+                except BaseException:
+                    lookup6.kill()
+                    raise
+            else:
+                outcomes = [lookup(qfamily, False) for qfamily in [socket.AF_INET6, socket.AF_INET]]
+            for qanswer, e in outcomes:
+                if e is not None:
                     err = e
                 else:
+                    answer = qanswer
                     if answer.rrset:
                         addrs.extend(rr.address for rr in answer.rrset)
             if addrs:
@@ -699,6 +927,225 @@ def _net_write(sock, data, expiration):
                 raise dns.exception.Timeout
 
 
+def _remaining(expiration):
+    if expiration is None:
+        return None
+    remaining = expiration - time.time()
+    if remaining <= 0.0:
+        raise dns.exception.Timeout
+    return remaining
+
+
+class _TCPConnection:
+    """TCP connection to a nameserver shared by concurrent queries
+
+    Queries are written back to back as they come, and whichever
+    greenthread is reading hands the responses over to the others by
+    query id, as allowed by RFC 7766 section 6.2.1.1.  Nobody reads while
+    no query is waiting, so an idle connection does not keep the hub busy.
+    """
+
+    def __init__(self, sockets, key, af):
+        self.sockets = sockets
+        self.key = key
+        self.af = af
+        self.sock = None
+        self.closed = False
+        # query id -> response wire, None until it arrives
+        self.responses = {}
+        # bytes received but not yet making up a whole response
+        self.rbuf = bytearray()
+        self.write_lock = eventlet.semaphore.Semaphore()
+        self.read_lock = eventlet.semaphore.Semaphore()
+        self.last_used = time.monotonic()
+
+    def query(self, wire, qid, expiration):
+        """Send *wire* and return the wire of its response.
+
+        Return None without sending anything if a query with the same id
+        is already waiting on this connection.
+        """
+        if qid in self.responses:
+            return None
+        self.responses[qid] = None
+        try:
+            with self.write_lock:
+                if self.closed:
+                    raise EOFError
+                if self.sock is None:
+                    self._connect(expiration)
+                self._send(struct.pack('!H', len(wire)) + wire, expiration)
+            if not self.read_lock.acquire(timeout=_remaining(expiration)):
+                raise dns.exception.Timeout
+            try:
+                # our response may have been read while we waited for the lock
+                while self.responses[qid] is None:
+                    if self.closed:
+                        raise EOFError
+                    response = self._read_message(expiration)
+                    if len(response) >= 2:
+                        (rid,) = struct.unpack('!H', response[:2])
+                        if rid in self.responses and self.responses[rid] is None:
+                            self.responses[rid] = response
+                return self.responses[qid]
+            finally:
+                self.read_lock.release()
+        finally:
+            del self.responses[qid]
+            self.last_used = time.monotonic()
+
+    def _connect(self, expiration):
+        sock = socket.socket(self.af, socket.SOCK_STREAM)
+        try:
+            if self.key[2] is not None:
+                sock.bind(self.key[2])
+            sock.settimeout(_remaining(expiration))
+            sock.connect(self.key[1])
+        except socket.timeout:
+            sock.close()
+            raise dns.exception.Timeout
+        except BaseException:
+            sock.close()
+            raise
+        self.sock = sock
+
+    def _io(self, fn, arg, expiration, partial=False):
+        try:
+            self.sock.settimeout(_remaining(expiration))
+            return fn(arg)
+        except socket.timeout:
+            self._abandon(partial)
+            raise dns.exception.Timeout
+        except OSError:
+            self.close()
+            raise
+        except BaseException:
+            self._abandon(partial)
+            raise
+
+    def _abandon(self, partial):
+        # The caller gives up on its query, but the others pipelined on this
+        # connection may still get their answers: keep it unless the stream
+        # is left in the middle of a query or nobody else is waiting.
+        if partial or len(self.responses) <= 1:
+            self.close()
+
+    def _send(self, data, expiration):
+        view = memoryview(data)
+        while view:
+            sent = self._io(self.sock.send, view, expiration, partial=len(view) < len(data))
+            view = view[sent:]
+
+    def _read_message(self, expiration):
+        # Whole responses only leave the buffer, so a reader giving up half
+        # way through one leaves the stream intact for the next reader.
+        while True:
+            if len(self.rbuf) >= 2:
+                (length,) = struct.unpack('!H', self.rbuf[:2])
+                if len(self.rbuf) >= 2 + length:
+                    response = bytes(self.rbuf[2:2 + length])
+                    del self.rbuf[:2 + length]
+                    return response
+            chunk = self._io(self.sock.recv, 65535, expiration)
+            if not chunk:
+                self.close()
+                raise EOFError
+            self.rbuf += chunk
+
+    def close(self):
+        self.closed = True
+        if self.sockets.tcp.get(self.key) is self:
+            del self.sockets.tcp[self.key]
+        if self.sock is not None:
+            self.sock.close()
+
+
+class _NameserverSockets:
+    """Sockets to nameservers kept for the queries of one OS thread"""
+
+    def __init__(self):
+        # (af, destination, source) -> [[socket, uses, last used], ...]
+        self.udp = {}
+        # (af, destination, source) -> _TCPConnection
+        self.tcp = {}
+        self.timer = None
+
+    def udp_socket(self, key, af):
+        """Return an idle UDP socket for *key* and the number of queries
+        it sent, or a new socket."""
+        idle = self.udp.get(key)
+        if idle:
+            sock, uses, _ = idle.pop()
+            if not idle:
+                del self.udp[key]
+            return sock, uses
+        sock = socket.socket(af, socket.SOCK_DGRAM)
+        if key[2] is not None:
+            try:
+                sock.bind(key[2])
+            except BaseException:
+                sock.close()
+                raise
+        return sock, 0
+
+    def put_udp_socket(self, key, sock, uses):
+        idle = self.udp.setdefault(key, [])
+        if uses >= UDP_SOCKET_MAX_USES or len(idle) >= UDP_POOL_SIZE:
+            sock.close()
+            if not idle:
+                del self.udp[key]
+            return
+        idle.append([sock, uses, time.monotonic()])
+        self._schedule_sweep()
+
+    def tcp_connection(self, key, af):
+        conn = self.tcp.get(key)
+        if conn is None:
+            conn = self.tcp[key] = _TCPConnection(self, key, af)
+            self._schedule_sweep()
+        return conn
+
+    def _schedule_sweep(self):
+        if self.timer is None:
+            self.timer = hubs.get_hub().schedule_call_global(DNS_IDLE_TIMEOUT, self._sweep)
+
+    def _sweep(self):
+        self.timer = None
+        deadline = time.monotonic() - DNS_IDLE_TIMEOUT
+        for key, idle in list(self.udp.items()):
+            for entry in [entry for entry in idle if entry[2] <= deadline]:
+                idle.remove(entry)
+                entry[0].close()
+            if not idle:
+                del self.udp[key]
+        for conn in list(self.tcp.values()):
+            if not conn.responses and conn.last_used <= deadline:
+                conn.close()
+        if self.udp or self.tcp:
+            self._schedule_sweep()
+
+    def close(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        for idle in self.udp.values():
+            for entry in idle:
+                entry[0].close()
+        self.udp.clear()
+        for conn in list(self.tcp.values()):
+            conn.close()
+
+
+_thread_local = patcher.original('threading').local()
+
+
+def _nameserver_sockets():
+    sockets = getattr(_thread_local, 'sockets', None)
+    if sockets is None:
+        sockets = _thread_local.sockets = _NameserverSockets()
+    return sockets
+
+
 # Test if raise_on_truncation is an argument we should handle.
 # It was newly added in dnspython 2.0
 try:
@@ -777,14 +1224,21 @@ def udp(q, where, timeout=DNS_QUERY_TIMEOUT, port=53,
         if source is not None:
             source = (source, source_port, 0, 0)
 
+    # sockets bound to a given source port cannot be shared
+    pooled = not sock and not source_port
+    uses = 0
     if sock:
         s = sock
+    elif pooled:
+        key = (af, destination, source)
+        s, uses = _nameserver_sockets().udp_socket(key, af)
     else:
         s = socket.socket(af, socket.SOCK_DGRAM)
     s.settimeout(timeout)
+    answered = False
     try:
         expiration = compute_expiration(dns.query, timeout)
-        if source is not None:
+        if source is not None and not pooled:
             s.bind(source)
         while True:
             try:
@@ -841,6 +1295,9 @@ def udp(q, where, timeout=DNS_QUERY_TIMEOUT, port=53,
                                               one_rr_per_rrset=one_rr_per_rrset,
                                               ignore_trailing=ignore_trailing)
                 if not q.is_response(r):
+                    if uses:
+                        # late response to a query sent earlier from this socket
+                        continue
                     raise dns.query.BadResponse()
                 break
             except dns.message.Truncated as e:
@@ -853,12 +1310,33 @@ def udp(q, where, timeout=DNS_QUERY_TIMEOUT, port=53,
                     continue
                 else:
                     raise
+        answered = True
     finally:
-        s.close()
+        if pooled and answered:
+            _nameserver_sockets().put_udp_socket(key, s, uses + 1)
+        else:
+            s.close()
 
     return r
 
 
+def _tcp_shared(wire, qid, af, destination, source, expiration):
+    # Send the query on the shared connection to the nameserver.  A reused
+    # connection may have been closed by the server in the meantime, in
+    # which case the query is sent again on a new one.  Return None if
+    # the connection cannot take this query.
+    sockets = _nameserver_sockets()
+    key = (af, destination, source)
+    for attempt in range(2):
+        conn = sockets.tcp_connection(key, af)
+        reused = conn.sock is not None
+        try:
+            return conn.query(wire, qid, expiration)
+        except (EOFError, ConnectionError):
+            if not reused or attempt:
+                raise
+
+
 def tcp(q, where, timeout=DNS_QUERY_TIMEOUT, port=53,
         af=None, source=None, source_port=0,
         one_rr_per_rrset=False, ignore_trailing=False, sock=None):
@@ -911,6 +1389,22 @@ def tcp(q, where, timeout=DNS_QUERY_TIMEOUT, port=53,
         destination = (where, port, 0, 0)
         if source is not None:
             source = (source, source_port, 0, 0)
+    response = None
+    if not sock and not source_port:
+        response = _tcp_shared(wire, q.id, af, destination, source,
+                               compute_expiration(dns.query, timeout))
+    if response is None:
+        response = _tcp_single(wire, af, destination, source, timeout, sock)
+    r = dns.message.from_wire(response, keyring=q.keyring, request_mac=q.mac,
+                              one_rr_per_rrset=one_rr_per_rrset,
+                              ignore_trailing=ignore_trailing)
+    if not q.is_response(r):
+        raise dns.query.BadResponse()
+    return r
+
+
+def _tcp_single(wire, af, destination, source, timeout, sock):
+    # Send the query on a connection of its own and return the response wire
     if sock:
         s = sock
     else:
@@ -939,19 +1433,14 @@ def tcp(q, where, timeout=DNS_QUERY_TIMEOUT, port=53,
         _net_write(s, tcpmsg, expiration)
         ldata = _net_read(s, 2, expiration)
         (l,) = struct.unpack("!H", ldata)
-        wire = bytes(_net_read(s, l, expiration))
+        return bytes(_net_read(s, l, expiration))
     finally:
         s.close()
-    r = dns.message.from_wire(wire, keyring=q.keyring, request_mac=q.mac,
-                              one_rr_per_rrset=one_rr_per_rrset,
-                              ignore_trailing=ignore_trailing)
-    if not q.is_response(r):
-        raise dns.query.BadResponse()
-    return r
 
 
 def reset():
     resolver.clear()
+    _nameserver_sockets().close()
 
 
 # Install our coro-friendly replacements for the tcp and udp query methods.
@@ -22,12 +22,15 @@
 
 import functools
 import inspect
+import weakref
 
 import eventlet
 from eventlet.support import greenlets as greenlet
 from eventlet.hubs import get_hub
 
-__all__ = ['Timeout', 'with_timeout', 'wrap_is_timeout', 'is_timeout']
+__all__ = ['Timeout', 'with_timeout', 'wrap_is_timeout', 'is_timeout',
+           'Deadline', 'DeadlineExceeded', 'current_deadline', 'check_deadline',
+           'TimeoutScope']
 
 _MISSING = object()
 
@@ -154,6 +157,117 @@ def with_timeout(seconds, function, *args, **kwds):
         timeout.cancel()
 
 
+class TimeoutScope:
+    """A cheaper :class:`Timeout` for ``with`` blocks that usually finish in
+    time, such as the ones around every I/O call::
+
+        with TimeoutScope(5):
+            data = sock.recv(4096)
+
+    Entering the block records its deadline in a slot of the current
+    greenthread, and leaving it only removes it: the exception is created
+    when the deadline passes, and a single hub timer per greenthread, armed
+    for the earliest deadline, serves all its scopes, nested or successive.
+
+    *exception* has the meaning it has for :class:`Timeout`: by default a
+    :class:`Timeout` is raised, ``False`` raises one that the ``with``
+    statement suppresses.  Test :attr:`expired` to know whether this scope
+    was the one that timed out.  The timeout starts when the block is
+    entered, and *seconds* of None disables it.
+    """
+
+    __slots__ = ('seconds', 'exception', 'deadline', 'expired', 'error', '_slot')
+
+    def __init__(self, seconds, exception=None):
+        self.seconds = seconds
+        self.exception = exception
+        self.expired = False
+        self.error = None
+        self._slot = None
+
+    def __enter__(self):
+        if self.seconds is None:
+            return self
+        current = greenlet.getcurrent()
+        slot = getattr(current, '_timeout_slot', None)
+        if slot is None:
+            slot = current._timeout_slot = _TimeoutSlot(current)
+        hub = get_hub()
+        self.deadline = hub.clock() + self.seconds
+        slot.scopes.append(self)
+        if self.deadline < slot.armed_for:
+            slot.arm(hub, self.deadline)
+        self._slot = slot
+        return self
+
+    def __exit__(self, typ, value, tb):
+        slot = self._slot
+        if slot is None:
+            return
+        self._slot = None
+        scopes = slot.scopes
+        if scopes[-1] is self:
+            scopes.pop()
+        else:
+            scopes.remove(self)
+        if value is not None and value is self.error and self.exception is False:
+            return True
+
+    def _raise_error(self):
+        # the exception is only created now that the deadline has passed
+        self.expired = True
+        exception = self.exception
+        if exception is None or isinstance(exception, bool):
+            error = Timeout(None, exception)
+            error.seconds = self.seconds
+        elif inspect.isclass(exception):
+            error = exception()
+        else:
+            error = exception
+        self.error = error
+        return error
+
+
+class _TimeoutSlot:
+    # the active TimeoutScopes of a greenthread, and the timer that checks
+    # them; it is left in place when a scope finishes in time, and re-armed
+    # for the earliest remaining deadline when it fires.  The greenthread is
+    # only weakly referenced, so that the timer does not keep it alive once
+    # finished.
+
+    __slots__ = ('greenlet', 'scopes', 'timer', 'armed_for')
+
+    def __init__(self, greenlet):
+        self.greenlet = weakref.ref(greenlet)
+        self.scopes = []
+        self.timer = None
+        self.armed_for = float('inf')
+
+    def arm(self, hub, deadline):
+        if self.timer is not None:
+            self.timer.cancel()
+        self.timer = hub.schedule_call_global(deadline - hub.clock(), self.fire)
+        self.armed_for = deadline
+
+    def fire(self):
+        self.timer = None
+        self.armed_for = float('inf')
+        scopes = [scope for scope in self.scopes if not scope.expired]
+        current = self.greenlet()
+        if not scopes or current is None or current.dead:
+            return
+        hub = get_hub()
+        first = min(scopes, key=lambda scope: scope.deadline)
+        if first.deadline > hub.clock():
+            self.arm(hub, first.deadline)
+            return
+        error = first._raise_error()
+        later = [scope for scope in scopes if scope is not first]
+        if later:
+            self.arm(hub, min(scope.deadline for scope in later))
+        current.throw(error)
+
+
 def wrap_is_timeout(base):
     '''Adds `.is_timeout=True` attribute to objects returned by `base()`.
 
@@ -174,6 +288,106 @@ def wrap_is_timeout(base):
     return fun
 
 
+class DeadlineExceeded(Timeout):
+    """Raised in a greenthread blocked past its :class:`Deadline`."""
+
+    def __str__(self):
+        return 'deadline exceeded'
+
+
+# number of greenthreads running under a deadline, so that spawning
+# does not look for one when there is none
+_bound_deadlines = 0
+
+
+class Deadline:
+    """An end-to-end deadline, *seconds* from its creation, for a
+    ``with`` block and every greenthread spawned from it::
+
+        with eventlet.Deadline(2.0):
+            handle(request)
+
+    Whatever the greenthreads of the block are blocked on when the deadline
+    passes -- a socket, a lock, a queue, a DNS query, :func:`tpool.execute
+    <eventlet.tpool.execute>` -- they get a :class:`DeadlineExceeded`, a
+    :class:`Timeout` subclass.  Greenthreads spawned in the block, directly
+    or through pools, inherit the deadline, even when they outlive the
+    block.  Nested deadlines only shorten the outer one.
+
+    Code handing work to something eventlet cannot interrupt can use
+    :meth:`remaining` to pass the time left along.
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires = get_hub().clock() + seconds
+        self._binding = None
+
+    def remaining(self):
+        """Return the number of seconds left, 0 once expired."""
+        return max(0.0, self.expires - get_hub().clock())
+
+    @property
+    def expired(self):
+        return self.expires <= get_hub().clock()
+
+    def __repr__(self):
+        return '<%s at %s seconds=%s remaining=%s>' % (
+            self.__class__.__name__, hex(id(self)), self.seconds, self.remaining())
+
+    def __enter__(self):
+        self._binding = _bind_deadline(self)
+        return self
+
+    def __exit__(self, typ, value, tb):
+        _unbind_deadline(*self._binding)
+        self._binding = None
+
+
+def _bind_deadline(deadline):
+    global _bound_deadlines
+    current = greenlet.getcurrent()
+    previous = getattr(current, '_deadline', None) if _bound_deadlines else None
+    if previous is not None and previous.expires <= deadline.expires:
+        return current, previous, None
+    timer = DeadlineExceeded(max(0.0, deadline.expires - get_hub().clock()))
+    current._deadline = deadline
+    _bound_deadlines += 1
+    return current, previous, timer
+
+
+def _unbind_deadline(current, previous, timer):
+    global _bound_deadlines
+    if timer is not None:
+        timer.cancel()
+        current._deadline = previous
+        _bound_deadlines -= 1
+
+
+def _call_with_deadline(deadline, function, args, kwargs):
+    binding = _bind_deadline(deadline)
+    try:
+        return function(*args, **kwargs)
+    finally:
+        _unbind_deadline(*binding)
+
+
+def current_deadline():
+    """Return the :class:`Deadline` of the current greenthread, or None."""
+    if not _bound_deadlines:
+        return None
+    return getattr(greenlet.getcurrent(), '_deadline', None)
+
+
+def check_deadline():
+    """Raise :class:`DeadlineExceeded` if the deadline of the current
+    greenthread has passed.  Useful before starting work that cannot be
+    interrupted once started."""
+    deadline = current_deadline()
+    if deadline is not None and deadline.expired:
+        raise DeadlineExceeded()
+
+
 if isinstance(__builtins__, dict):  # seen when running tests on py310, but HOW??
     _timeout_err = __builtins__.get('TimeoutError', Timeout)
 else:
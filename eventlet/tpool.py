@@ -111,6 +111,8 @@ def execute(meth, *args, **kwargs):
     if my_thread in _threads or imp.lock_held() or _nthreads == 0:
         return meth(*args, **kwargs)
 
+    # the thread could not be interrupted
+    timeout.check_deadline()
     e = event.Event()
     _reqq.put((e, meth, args, kwargs))
 
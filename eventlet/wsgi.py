@@ -9,6 +9,7 @@ import warnings
 
 import eventlet
 from eventlet import greenio
+from eventlet import hubs
 from eventlet import support
 from eventlet.corolocal import local
 from eventlet.green import BaseHTTPServer
@@ -32,6 +33,8 @@ is_accepting = True
 STATE_IDLE = 'idle'
 STATE_REQUEST = 'request'
 STATE_CLOSE = 'close'
+# idle, and left to the hub until the next request
+STATE_PARKED = 'parked'
 
 __all__ = ['server', 'format_date_time']
 
@@ -406,6 +409,27 @@ class HttpProtocol(BaseHTTPServer.BaseHTTPRequestHandler):
                 self.conn_state[2] = STATE_IDLE
             if self.close_connection:
                 break
+            if self.server.park_idle and self._park():
+                break
+
+    def _park(self):
+        # Let the server wait for the next request without this greenthread,
+        # unless that request has already been read into rfile's buffer.
+        sock = self.connection
+        if hasattr(sock, 'do_handshake'):
+            # an SSL socket may be holding decrypted data as well
+            return False
+        try:
+            sock.setblocking(False)
+            if self.rfile.peek(1):
+                return False
+        except OSError:
+            # let the next request read tell what is wrong with the socket
+            return False
+        finally:
+            sock.settimeout(self.server.socket_timeout)
+        self.conn_state[2] = STATE_PARKED
+        return True
 
     def _read_request_line(self):
         if self.rfile.closed:
@@ -832,6 +856,8 @@ class HttpProtocol(BaseHTTPServer.BaseHTTPRequestHandler):
             # Broken pipe, connection reset by peer
             if support.get_errno(e) not in BROKEN_SOCK:
                 raise
+        if self.conn_state[2] == STATE_PARKED:
+            return
         greenio.shutdown_safe(self.connection)
         self.connection.close()
 
@@ -857,7 +883,8 @@ class Server(BaseHTTPServer.HTTPServer):
                  url_length_limit=MAX_REQUEST_LINE,
                  debug=True,
                  socket_timeout=None,
-                 capitalize_response_headers=True):
+                 capitalize_response_headers=True,
+                 park_idle=False):
 
         self.outstanding_requests = 0
         self.socket = socket
@@ -879,6 +906,7 @@ class Server(BaseHTTPServer.HTTPServer):
         self.debug = debug
         self.socket_timeout = socket_timeout
         self.capitalize_response_headers = capitalize_response_headers
+        self.park_idle = park_idle
 
         if not self.capitalize_response_headers:
             warnings.warn("""capitalize_response_headers is disabled.
@@ -966,7 +994,8 @@ def server(sock, site,
            url_length_limit=MAX_REQUEST_LINE,
            debug=True,
            socket_timeout=None,
-           capitalize_response_headers=True):
+           capitalize_response_headers=True,
+           park_idle=False):
     """Start up a WSGI server handling requests from the supplied server
     socket.  This function loops forever.  The *sock* object will be
     closed after server exits, but the underlying file descriptor will
@@ -1022,6 +1051,12 @@ def server(sock, site,
                 wait forever.
     :param capitalize_response_headers: Normalize response headers' names to Foo-Bar.
                 Default is True.
+    :param park_idle: If True, a keep-alive connection waiting for its next request does not
+                hold a green thread: the connection is parked in the hub with
+                :meth:`GreenPool.park() <eventlet.greenpool.GreenPool.park>`, and a new green thread
+                is started in the pool when the request arrives.  This saves memory with many idle
+                connections.  The pool must provide ``park`` and ``unpark``.  Not used for SSL
+                connections.
     """
     serv = Server(
         sock, sock.getsockname(),
@@ -1038,6 +1073,7 @@ def server(sock, site,
         debug=debug,
         socket_timeout=socket_timeout,
         capitalize_response_headers=capitalize_response_headers,
+        park_idle=park_idle,
     )
     if server_event is not None:
         warnings.warn(
@@ -1054,17 +1090,50 @@ def server(sock, site,
     if not (hasattr(pool, 'spawn') and hasattr(pool, 'waitall')):
         raise AttributeError('''\
 eventlet.wsgi.Server pool must provide methods: `spawn`, `waitall`.
+If unsure, use eventlet.GreenPool.''')
+    if park_idle and not (hasattr(pool, 'park') and hasattr(pool, 'unpark')):
+        raise AttributeError('''\
+eventlet.wsgi.Server pool must provide methods `park`, `unpark` with park_idle.
 If unsure, use eventlet.GreenPool.''')
 
     # [addr, socket, state]
     connections = {}
+    # addr -> (park handle, keepalive timer or None)
+    parked = {}
 
     def _clean_connection(_, conn):
+        if conn[2] == STATE_PARKED:
+            _park_connection(conn)
+            return
         connections.pop(conn[0], None)
         conn[2] = STATE_CLOSE
         greenio.shutdown_safe(conn[1])
         conn[1].close()
 
+    def _park_connection(conn):
+        timer = None
+        if serv.keepalive and not isinstance(serv.keepalive, bool):
+            timer = hubs.get_hub().schedule_call_global(serv.keepalive, _expire_connection, conn)
+        parked[conn[0]] = (pool.park(conn[1].fileno(), _resume_connection, conn), timer)
+
+    def _resume_connection(conn):
+        handle, timer = parked.pop(conn[0], (None, None))
+        if timer is not None:
+            timer.cancel()
+        conn[2] = STATE_IDLE
+        try:
+            serv.process_request(conn)
+        finally:
+            _clean_connection(None, conn)
+
+    def _expire_connection(conn):
+        handle = parked[conn[0]][0]
+        if pool.unpark(handle):
+            del parked[conn[0]]
+            serv.log.debug('({}) timed out {!r}'.format(serv.pid, conn[0]))
+            conn[2] = STATE_CLOSE
+            _clean_connection(None, conn)
+
     try:
         serv.log.info('({}) wsgi starting up on {}'.format(serv.pid, socket_repr(sock)))
         while is_accepting:
@@ -1084,11 +1153,18 @@ If unsure, use eventlet.GreenPool.''')
                 serv.log.info('wsgi exiting')
                 break
     finally:
-        for cs in connections.values():
+        for handle, timer in list(parked.values()):
+            pool.unpark(handle)
+            if timer is not None:
+                timer.cancel()
+        parked.clear()
+        for cs in list(connections.values()):
             prev_state = cs[2]
             cs[2] = STATE_CLOSE
             if prev_state == STATE_IDLE:
                 greenio.shutdown_safe(cs[1])
+            elif prev_state == STATE_PARKED:
+                _clean_connection(None, cs)
         pool.waitall()
         serv.log.info('({}) wsgi exited, is_accepting={}'.format(serv.pid, is_accepting))
         try:
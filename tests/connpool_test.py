@@ -0,0 +1,180 @@
+import ssl
+
+import eventlet
+from eventlet import connpool
+from eventlet.green import ssl as green_ssl
+import tests
+
+
+class TestConnectionPool(tests.LimitedTestCase):
+    def setUp(self):
+        super().setUp()
+        self.server = eventlet.listen(('127.0.0.1', 0))
+        self.port = self.server.getsockname()[1]
+        self.accepted = []
+        self.acceptor = eventlet.spawn(self.serve, self.server)
+        self.pool = connpool.ConnectionPool(max_per_host=2)
+
+    def tearDown(self):
+        self.pool.close()
+        self.acceptor.kill()
+        self.server.close()
+        for sock in self.accepted:
+            sock.close()
+        super().tearDown()
+
+    def serve(self, server, wrap=None):
+        while True:
+            sock, _ = server.accept()
+            if wrap is not None:
+                sock = wrap(sock)
+            self.accepted.append(sock)
+
+    def test_reuse_is_lifo(self):
+        a = self.pool.get('127.0.0.1', self.port)
+        b = self.pool.get('127.0.0.1', self.port)
+        self.pool.put(a)
+        self.pool.put(b)
+        self.assertIs(self.pool.get('127.0.0.1', self.port), b)
+        self.assertIs(self.pool.get('127.0.0.1', self.port), a)
+        stats = self.pool.stats()
+        self.assertEqual(stats['created'], 2)
+        self.assertEqual(stats['reused'], 2)
+        self.assertEqual(stats['in_use'], 2)
+
+    def test_connection_talks(self):
+        with self.pool.connection('127.0.0.1', self.port) as sock:
+            sock.sendall(b'ping')
+            eventlet.sleep(0.01)
+            self.assertEqual(self.accepted[0].recv(4), b'ping')
+        self.assertEqual(self.pool.stats()['idle'], 1)
+
+    def test_endpoints_are_separate(self):
+        other = eventlet.listen(('127.0.0.1', 0))
+        acceptor = eventlet.spawn(self.serve, other)
+        try:
+            a = self.pool.get('127.0.0.1', self.port)
+            self.pool.put(a)
+            b = self.pool.get('127.0.0.1', other.getsockname()[1])
+            assert b is not a
+            self.assertEqual(self.pool.stats()['endpoints'], 2)
+            self.pool.put(b)
+        finally:
+            acceptor.kill()
+            other.close()
+
+    def test_max_per_host(self):
+        a = self.pool.get('127.0.0.1', self.port)
+        b = self.pool.get('127.0.0.1', self.port)
+        self.assertRaises(connpool.PoolTimeout, self.pool.get, '127.0.0.1', self.port, timeout=0.01)
+        waiter = eventlet.spawn(self.pool.get, '127.0.0.1', self.port)
+        eventlet.sleep(0)
+        self.assertEqual(self.pool.stats()['waiting'], 1)
+        self.pool.put(a)
+        self.assertIs(waiter.wait(), a)
+        self.pool.put(a)
+        self.pool.put(b)
+        self.assertEqual(self.pool.stats()['waits'], 2)
+
+    def test_stale_connection_is_replaced(self):
+        a = self.pool.get('127.0.0.1', self.port)
+        self.pool.put(a)
+        eventlet.sleep(0.01)
+        self.accepted[0].close()
+        eventlet.sleep(0.01)
+        b = self.pool.get('127.0.0.1', self.port)
+        assert b is not a
+        self.assertEqual(a.fileno(), -1)
+        self.assertEqual(self.pool.stats()['stale'], 1)
+        self.pool.put(b)
+
+    def test_unread_data_makes_connection_stale(self):
+        a = self.pool.get('127.0.0.1', self.port)
+        self.pool.put(a)
+        eventlet.sleep(0.01)
+        assert not self.pool.is_dropped(a)
+        self.accepted[0].sendall(b'unexpected')
+        eventlet.sleep(0.01)
+        assert self.pool.is_dropped(a)
+
+    def test_error_discards_connection(self):
+        try:
+            with self.pool.connection('127.0.0.1', self.port):
+                raise RuntimeError()
+        except RuntimeError:
+            pass
+        stats = self.pool.stats()
+        self.assertEqual(stats['discarded'], 1)
+        self.assertEqual(stats['endpoints'], 0)
+
+    def test_idle_timeout(self):
+        pool = connpool.ConnectionPool(idle_timeout=0.01)
+        a = pool.get('127.0.0.1', self.port)
+        b = pool.get('127.0.0.1', self.port)
+        pool.put(a)
+        eventlet.sleep(0.005)
+        pool.put(b)
+        eventlet.sleep(0.008)
+        self.assertEqual(pool.stats()['idle'], 1)
+        self.assertEqual(a.fileno(), -1)
+        eventlet.sleep(0.02)
+        stats = pool.stats()
+        self.assertEqual(stats['expired'], 2)
+        self.assertEqual(stats['endpoints'], 0)
+        self.assertIsNone(pool._timer)
+
+    def test_close(self):
+        a = self.pool.get('127.0.0.1', self.port)
+        b = self.pool.get('127.0.0.1', self.port)
+        self.pool.put(a)
+        self.pool.close()
+        self.assertEqual(a.fileno(), -1)
+        self.assertRaises(RuntimeError, self.pool.get, '127.0.0.1', self.port)
+        self.pool.put(b)
+        self.assertEqual(b.fileno(), -1)
+
+    def test_custom_connect(self):
+        made = []
+
+        def connect(host, port, tls):
+            made.append((host, port, tls))
+            return eventlet.connect((host, port))
+
+        pool = connpool.ConnectionPool(connect=connect)
+        with pool.connection('127.0.0.1', self.port):
+            pass
+        self.assertEqual(made, [('127.0.0.1', self.port, False)])
+        pool.close()
+
+    def test_tls(self):
+        server = eventlet.listen(('127.0.0.1', 0))
+        # one server context for all the connections, so that they accept
+        # each other's session tickets
+        server_context = green_ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        server_context.load_cert_chain(tests.certificate_file, tests.private_key_file)
+        acceptor = eventlet.spawn(self.serve, server, lambda sock: server_context.wrap_socket(
+            sock, server_side=True))
+        context = green_ssl.create_default_context()
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+        context.session_cache = green_ssl.SessionCache()
+        pool = connpool.ConnectionPool(ssl_context=context)
+        try:
+            port = server.getsockname()[1]
+            with pool.connection('127.0.0.1', port, tls=True) as a:
+                a.sendall(b'ping')
+                eventlet.sleep(0.01)
+                self.assertEqual(self.accepted[-1].recv(4), b'ping')
+            eventlet.sleep(0.01)
+            with pool.connection('127.0.0.1', port, tls=True) as b:
+                self.assertIs(b, a)
+            self.accepted[-1].close()
+            eventlet.sleep(0.01)
+            with pool.connection('127.0.0.1', port, tls=True) as c:
+                assert c is not a
+                assert c.session_reused
+            self.assertEqual(pool.stats()['stale'], 1)
+        finally:
+            pool.close()
+            acceptor.kill()
+            server.close()
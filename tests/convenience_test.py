@@ -193,3 +193,38 @@ def test_reuseport_oserror():
             socket.socket.__init__ = original_socket_init
         assert len(w) == 1
         assert issubclass(w[0].category, convenience.ReusePortUnavailableWarning)
+
+
+def test_connect_unspec_family():
+    listener = eventlet.listen(('127.0.0.1', 0))
+    port = listener.getsockname()[1]
+    # not relying on how localhost resolves here: nothing listens on ::1
+    addrinfos = [
+        (socket.AF_INET6, socket.SOCK_STREAM, 0, '', ('::1', port, 0, 0)),
+        (socket.AF_INET, socket.SOCK_STREAM, 0, '', ('127.0.0.1', port)),
+    ]
+    try:
+        with tests.mock.patch.object(socket, 'getaddrinfo', return_value=addrinfos):
+            client = eventlet.connect(('dual.example', port), family=socket.AF_UNSPEC)
+        assert client.getpeername() == ('127.0.0.1', port)
+        client.close()
+    finally:
+        socket._preferred_families.pop('dual.example', None)
+        listener.close()
+
+
+def test_connect_unspec_family_reraises_unexpected_error():
+    addrinfos = [
+        (socket.AF_INET6, socket.SOCK_STREAM, 0, '', ('::1', 1, 0, 0)),
+        (socket.AF_INET, socket.SOCK_STREAM, 0, '', ('127.0.0.1', 1)),
+    ]
+    with tests.mock.patch.object(socket, 'getaddrinfo', return_value=addrinfos):
+        with tests.mock.patch.object(socket, '_connect_addrinfo', side_effect=TypeError('boom')):
+            with eventlet.Timeout(1):
+                try:
+                    eventlet.connect(('dual.example', 1), family=socket.AF_UNSPEC)
+                except TypeError as e:
+                    assert str(e) == 'boom'
+                else:
+                    assert False, 'expected TypeError'
+    assert 'dual.example' not in socket._preferred_families
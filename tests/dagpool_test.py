@@ -6,7 +6,7 @@
 """
 
 import eventlet
-from eventlet.dagpool import DAGPool, Collision, PropagateError
+from eventlet.dagpool import DAGPool, Collision, PropagateError, critical_path
 from contextlib import contextmanager
 import itertools
 
@@ -696,3 +696,104 @@ def test_post_get_exc():
     assert_equal(dict(pool.wait_each_exception("ab")), dict(b=bogub))
     assert_equal(dict(pool.wait_each_exception("a")), {})
     assert_equal(dict(pool.wait_each_exception("b")), dict(b=bogub))
+
+
+def test_wait_each_forgets_waiter():
+    pool = DAGPool()
+    waiter = eventlet.spawn(dict, pool.wait_each("ab"))
+    spin()
+    assert_equal(set(pool._watchers), {"a", "b"})
+    pool.post("a", 1)
+    assert_equal(set(pool._watchers), {"b"})
+    # a waiter that gives up no longer gets notified
+    waiter.kill()
+    assert_equal(pool._watchers, {})
+
+
+def recorder(started):
+    def record(key, results):
+        started.append(key)
+        values = dict(results)
+        eventlet.sleep(0)
+        return sum(values.values()) + 1
+    return record
+
+
+def test_lazy():
+    started = []
+    pool = DAGPool(lazy=True)
+    pool.spawn_many(dict(a=(), b=("a", "x"), c=("b",)), recorder(started))
+    # nothing runs until the caller yields, then only what is ready
+    assert_equal(pool.running(), 0)
+    spin()
+    assert_equal(started, ["a"])
+    assert_equal(pool.running_keys(), ())
+    assert_equal(pool.waiting_for(), dict(b={"x"}, c={"b"}))
+    assert_equal(pool.waiting_for("c"), {"b"})
+    assert_equal(pool.waiting(), 2)
+    # no greenthread for "b" yet, still nobody else may post its value
+    with assert_raises(Collision):
+        pool.post("b", 0)
+    with assert_raises(Collision):
+        pool.spawn("b", (), recorder(started))
+    pool.post("x", 10)
+    assert_equal(pool.waitall(), dict(a=1, x=10, b=12, c=13))
+    assert_equal(started, ["a", "b", "c"])
+
+
+def test_lazy_kill():
+    started = []
+    pool = DAGPool(lazy=True)
+    pool.spawn("a", ("x",), recorder(started))
+    pool.spawn("b", ("x", "y"), recorder(started))
+    pool.kill("a")
+    assert_equal(set(pool._watchers), set(("x", "y")))
+    pool.kill("b")
+    # nothing left watching the keys they were waiting for
+    assert_equal(pool._watchers, {})
+    with assert_raises(KeyError):
+        pool.kill("a")
+    pool.post("x", 1)
+    spin()
+    assert_equal(started, [])
+    assert_equal(pool.keys(), ("x",))
+
+
+def test_size_order():
+    running = []
+    peak = []
+    started = []
+
+    def work(key, results):
+        started.append(key)
+        running.append(key)
+        peak.append(len(running))
+        eventlet.sleep(0.01)
+        running.remove(key)
+
+    # "a" and "b" need the whole tree; the rest are leaves
+    deps = dict(a=(), b=("a",), c=(), d=(), e=(), f=())
+    order = dict(a=0, c=1, d=2, e=3, f=4, b=5)
+    pool = DAGPool(size=2, order=order.get)
+    assert pool.lazy
+    pool.spawn_many(deps, work)
+    pool.waitall()
+    assert_equal(max(peak), 2)
+    assert_equal(started[:2], ["a", "c"])
+    assert_equal(set(started), set(deps))
+    with assert_raises(ValueError):
+        DAGPool(size=0)
+
+
+def test_critical_path():
+    deps = dict(a=(), b=("a",), c=("b", "x"), d=("a",), e=("e",))
+    assert_equal(critical_path(deps), dict(a=3, b=2, c=1, d=1, x=2))
+
+    started = []
+    lengths = critical_path(deps)
+    pool = DAGPool(dict(x=0), size=1, order=lambda key: -lengths.get(key, 0))
+    del deps["e"]
+    pool.spawn_many(deps, recorder(started))
+    pool.waitall()
+    # "b" before "d": it has "c" after it
+    assert_equal(started, ["a", "b", "d", "c"])
@@ -433,6 +433,163 @@ def test_raw_pool_clear_update_current_size():
     assert len(pool.free_items) == 0
 
 
+def sqlite_pool(pool_class=db_pool.RawConnectionPool, **kwargs):
+    import sqlite3
+    pool = pool_class(sqlite3, database=':memory:', check_same_thread=False, **kwargs)
+    with pool.item() as conn:
+        cursor = conn.cursor()
+        cursor.execute('CREATE TABLE t (n INTEGER)')
+        cursor.executemany('INSERT INTO t VALUES (?)', [(n,) for n in range(250)])
+        conn.commit()
+    return pool
+
+
+def test_pooled_cursor_streams_in_chunks():
+    pool = sqlite_pool(max_size=1)
+    with pool.item() as conn:
+        cursor = conn.pooled_cursor(arraysize=100)
+        calls = []
+        dispatch = pool._dispatch
+        pool._dispatch = lambda func, *args: calls.append(func) or dispatch(func, *args)
+        cursor.execute('SELECT n FROM t ORDER BY n')
+        assert cursor.description[0][0] == 'n'
+        assert cursor.fetchone() == (0,)
+        assert cursor.fetchmany(3) == [(1,), (2,), (3,)]
+        assert len(calls) == 1
+        assert [row[0] for row in cursor] == list(range(4, 250))
+        # execute plus first chunk, then two more chunks
+        assert len(calls) == 3
+        assert cursor.fetchone() is None
+        cursor.close()
+
+
+def test_pooled_cursor_fetchall_and_executemany():
+    pool = sqlite_pool(max_size=1)
+    with pool.item() as conn:
+        with conn.pooled_cursor(arraysize=10) as cursor:
+            cursor.executemany('INSERT INTO t VALUES (?)', [(1000,), (1001,)])
+            assert cursor.rowcount == 2
+            cursor.execute('SELECT n FROM t WHERE n >= ?', (100,))
+            assert len(cursor.fetchall()) == 152
+
+
+def test_pooled_cursor_statement_cache():
+    pool = sqlite_pool(max_size=1, statement_cache_size=1)
+    query = 'SELECT n FROM t WHERE n < ?'
+    with pool.item() as conn:
+        with conn.pooled_cursor() as cursor:
+            cursor.execute(query, (5,))
+            first = cursor.fetchall()
+    cache = pool._statements[id(pool.free_items[-1][2])]
+    cached = cache[query]
+    with pool.item() as conn:
+        with conn.pooled_cursor() as cursor:
+            cursor.execute(query, (5,))
+            # the result fitted in the first fetch, so the cursor went
+            # straight back to the cache
+            assert cache[query] is cached
+            assert cursor.fetchall() == first
+            cursor.execute('SELECT 1')
+            # the least recently used statement made room for the new one
+            assert list(cache) == ['SELECT 1']
+
+
+def test_pooled_cursor_tpool_closes_evicted_cursors_in_native_thread():
+    import sqlite3
+    threading = eventlet.patcher.original('threading')
+    hub_thread = threading.get_ident()
+    closed_on_hub = []
+
+    class Cursor(sqlite3.Cursor):
+        def close(self):
+            closed_on_hub.append(threading.get_ident() == hub_thread)
+            super().close()
+
+    class Connection(sqlite3.Connection):
+        def cursor(self, factory=Cursor):
+            return super().cursor(factory)
+
+    pool = db_pool.TpooledConnectionPool(
+        sqlite3, max_size=1, statement_cache_size=1,
+        database=':memory:', check_same_thread=False, factory=Connection)
+    try:
+        with pool.item() as conn:
+            with conn.pooled_cursor() as cursor:
+                cursor.execute('SELECT 1')
+                cursor.execute('SELECT 2')
+                cursor.execute('SELECT 1')
+        assert closed_on_hub == [False, False]
+    finally:
+        pool.clear()
+        eventlet.tpool.killall()
+
+
+def test_pooled_cursor_tpool():
+    pool = sqlite_pool(db_pool.TpooledConnectionPool, max_size=1)
+    try:
+        with pool.item() as conn:
+            with conn.pooled_cursor(arraysize=50) as cursor:
+                cursor.execute('SELECT n FROM t')
+                assert sum(row[0] for row in cursor) == sum(range(250))
+    finally:
+        eventlet.tpool.killall()
+
+
+def test_idle_expiration():
+    pool = sqlite_pool(max_size=2, max_idle=0.02, max_age=10)
+    a, b = pool.get(), pool.get()
+    a.close()
+    b.close()
+    assert len(pool.free_items) == 2
+    eventlet.sleep(0.05)
+    assert len(pool.free_items) == 0
+    assert pool.current_size == 0
+    assert pool.stats()['expired_idle'] == 2
+
+
+def test_age_expiration_of_recently_used_connection():
+    pool = sqlite_pool(max_size=2, max_idle=10, max_age=0.05)
+    eventlet.sleep(0.02)
+    old, new = pool.get(), pool.get()
+    new.close()
+    old.close()
+    # the old connection is the most recently used one, yet it expires
+    # first: by age
+    eventlet.sleep(0.04)
+    stats = pool.stats()
+    assert stats['expired_age'] == 1
+    assert stats['expired_idle'] == 0
+    assert len(pool.free_items) == 1
+    assert stats['oldest_age'] < 0.05
+
+
+def test_age_expiration_keeps_order_of_free_connections():
+    pool = sqlite_pool(max_size=3, max_idle=10, max_age=0.05)
+    old = pool.get()
+    eventlet.sleep(0.02)
+    a, b = pool.get(), pool.get()
+    conn_a, conn_b = a._base, b._base
+    a.close()
+    old.close()
+    b.close()
+    eventlet.sleep(0.04)
+    assert pool.stats()['expired_age'] == 1
+    assert [item[2] for item in pool.free_items] == [conn_b, conn_a]
+    assert pool.get()._base is conn_b
+
+
+def test_pools_share_one_expiration_timer():
+    hub = eventlet.hubs.get_hub()
+    sweep = db_pool._get_scheduler()._run
+    pools = [sqlite_pool(max_idle=0.02) for _ in range(3)]
+    for pool in pools:
+        pool.get().close()
+    timers = [t for _, t in hub.timers + hub.next_timers if not t.called and sweep in t.tpl[1]]
+    assert len(timers) == 1
+    eventlet.sleep(0.05)
+    assert all(not pool.free_items for pool in pools)
+
+
 def mysql_requirement(_f):
     verbose = os.environ.get('eventlet_test_mysql_verbose')
     if MySQLdb is None:
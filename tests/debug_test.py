@@ -101,6 +101,36 @@ class TestDebug(tests.LimitedTestCase):
         debug.hub_timer_stacks(False)
         debug.format_hub_listeners()
         debug.format_hub_timers()
+        debug.greenthread_spawn_sites(True)
+        debug.greenthread_spawn_sites(False)
+        debug.format_greenthreads()
+
+    def test_format_greenthreads(self):
+        def waiter():
+            eventlet.sleep(1)
+
+        debug.greenthread_spawn_sites(True)
+        try:
+            pool = eventlet.GreenPool()
+            gts = []
+            for _ in range(3):
+                gts.append(eventlet.spawn(waiter))
+            pool.spawn_n(waiter)
+        finally:
+            debug.greenthread_spawn_sites(False)
+        eventlet.sleep(0)
+        out = debug.format_greenthreads(details=True)
+        lines = out.splitlines()
+        assert lines[0].startswith('GREENTHREADS: '), out
+        # grouped by spawn site: the line of this file, not of the pool
+        sites = [line for line in lines if 'debug_test.py' in line]
+        assert len(sites) == 2, out
+        assert sites[0].split()[0] == '3', out
+        assert 'in test_format_greenthreads' in sites[0], out
+        assert sites[1].split()[0] == '1', out
+        for gt in gts:
+            gt.kill()
+        pool.waitall()
 
     def test_hub_exceptions(self):
         debug.hub_exceptions(True)
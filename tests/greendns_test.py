@@ -6,6 +6,7 @@ import tempfile
 import time
 from dns.resolver import NoAnswer, Answer, Resolver
 
+import eventlet
 from eventlet.support import greendns
 from eventlet.support.greendns import dns
 import tests
@@ -184,6 +185,59 @@ line2 # inline comment
         res = set(hr.getaliases('host.example.com'))
         assert res == {'host'}
 
+    def _count_parses(self, hr):
+        threads = []
+        parse = hr._parse
+
+        def counting_parse():
+            threads.append(eventlet.patcher.original('threading').current_thread())
+            return parse()
+
+        hr._parse = counting_parse
+        return threads
+
+    def test_reload_when_changed(self):
+        hr = _make_host_resolver()
+        hr.interval = 0
+        hr.hosts.write(b'1.2.3.4 example.com\n')
+        hr.hosts.flush()
+        hr._load()
+        parses = self._count_parses(hr)
+        old_v4 = hr._v4
+        assert hr.query('example.com')[0].address == '1.2.3.4'
+        assert hr.query('example.com')[0].address == '1.2.3.4'
+        assert parses == []
+        hr.hosts.seek(0)
+        hr.hosts.write(b'1.2.3.5 example.com\n')
+        hr.hosts.truncate()
+        hr.hosts.flush()
+        os.utime(hr.hosts.name, ns=(0, 0))
+        assert hr.query('example.com')[0].address == '1.2.3.5'
+        assert len(parses) == 1
+        # the old table was replaced, not updated
+        assert old_v4 == {'example.com': '1.2.3.4'}
+
+    def test_reload_large_file_in_thread(self):
+        hr = _make_host_resolver()
+        hr.interval = 0
+        hr.offload_size = 16
+        parses = self._count_parses(hr)
+        hr.hosts.write(b'1.2.3.4 example.com\n')
+        hr.hosts.flush()
+        assert hr.query('example.com')[0].address == '1.2.3.4'
+        assert len(parses) == 1
+        assert parses[0] is not eventlet.patcher.original('threading').main_thread()
+
+    def test_reload_missing_file(self):
+        hr = _make_host_resolver()
+        hr.interval = 0
+        hr.hosts.write(b'1.2.3.4 example.com\n')
+        hr.hosts.flush()
+        hr._load()
+        hr.hosts.close()
+        with tests.assert_raises(greendns.dns.resolver.NoAnswer):
+            hr.query('example.com')
+
     def test_hosts_case_insensitive(self):
         name = 'example.com'
         hr = _make_host_resolver()
@@ -296,6 +350,164 @@ class TestUdp(tests.LimitedTestCase):
                 greendns.udp(self.query, '::1')
 
 
+class TestNameserverSockets(tests.LimitedTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # start with no pooled sockets nor sweep timer left by other tests
+        greendns._nameserver_sockets().close()
+        self.servers = []
+
+    def tearDown(self):
+        greendns._nameserver_sockets().close()
+        for server in self.servers:
+            server.kill()
+        super().tearDown()
+
+    def _query(self, name='example.com'):
+        return dns.message.make_query(name, dns.rdatatype.A)
+
+    def _udp_server(self, sources):
+        sock = greendns.socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind(('127.0.0.1', 0))
+
+        def serve():
+            try:
+                while True:
+                    data, addr = sock.recvfrom(65535)
+                    sources.append(addr[1])
+                    response = dns.message.make_response(dns.message.from_wire(data))
+                    sock.sendto(response.to_wire(), addr)
+            finally:
+                sock.close()
+
+        self.servers.append(eventlet.spawn(serve))
+        return sock.getsockname()[1]
+
+    def _tcp_server(self, connections, batch=1, close_after=None, delay=0):
+        listener = eventlet.listen(('127.0.0.1', 0))
+
+        def read(sock, count):
+            data = b''
+            while len(data) < count:
+                chunk = sock.recv(count - len(data))
+                if not chunk:
+                    raise EOFError
+                data += chunk
+            return data
+
+        def handle(sock):
+            answered = 0
+            try:
+                while close_after is None or answered < close_after:
+                    queries = []
+                    for _ in range(batch):
+                        (length,) = greendns.struct.unpack('!H', read(sock, 2))
+                        queries.append(dns.message.from_wire(read(sock, length)))
+                    eventlet.sleep(delay)
+                    # answer out of order
+                    for query in reversed(queries):
+                        wire = dns.message.make_response(query).to_wire()
+                        sock.sendall(greendns.struct.pack('!H', len(wire)) + wire)
+                        answered += 1
+            except EOFError:
+                pass
+            finally:
+                sock.close()
+
+        def serve():
+            try:
+                while True:
+                    sock, _ = listener.accept()
+                    connections.append(sock)
+                    eventlet.spawn(handle, sock)
+            finally:
+                listener.close()
+
+        self.servers.append(eventlet.spawn(serve))
+        return listener.getsockname()[1]
+
+    def test_udp_socket_reused(self):
+        sources = []
+        port = self._udp_server(sources)
+        for _ in range(3):
+            q = self._query()
+            assert greendns.udp(q, '127.0.0.1', port=port, timeout=1).id == q.id
+        assert len(set(sources)) == 1
+
+    def test_udp_source_port_changes(self):
+        sources = []
+        port = self._udp_server(sources)
+        with tests.mock.patch.object(greendns, 'UDP_SOCKET_MAX_USES', 2):
+            for _ in range(4):
+                greendns.udp(self._query(), '127.0.0.1', port=port, timeout=1)
+        assert sources[0] == sources[1]
+        assert sources[2] == sources[3]
+        assert sources[1] != sources[2]
+
+    def test_udp_concurrent_queries(self):
+        sources = []
+        port = self._udp_server(sources)
+        queries = [eventlet.spawn(greendns.udp, self._query(), '127.0.0.1', port=port, timeout=1)
+                   for _ in range(3)]
+        for query in queries:
+            query.wait()
+        assert len(set(sources)) == 3
+        idle = greendns._nameserver_sockets().udp
+        assert [len(sockets) for sockets in idle.values()] == [3]
+
+    def test_tcp_pipelined(self):
+        connections = []
+        port = self._tcp_server(connections, batch=2)
+        q1, q2 = self._query('one.example.com'), self._query('two.example.com')
+        r1 = eventlet.spawn(greendns.tcp, q1, '127.0.0.1', port=port, timeout=1)
+        r2 = eventlet.spawn(greendns.tcp, q2, '127.0.0.1', port=port, timeout=1)
+        assert r1.wait().id == q1.id
+        assert r2.wait().id == q2.id
+        assert len(connections) == 1
+        assert len(greendns._nameserver_sockets().tcp) == 1
+
+    def test_tcp_pipelined_timeout(self):
+        # one query giving up must not fail the others on the connection
+        connections = []
+        port = self._tcp_server(connections, batch=2, delay=0.1)
+        q1, q2 = self._query('one.example.com'), self._query('two.example.com')
+        r1 = eventlet.spawn(greendns.tcp, q1, '127.0.0.1', port=port, timeout=0.02)
+        r2 = eventlet.spawn(greendns.tcp, q2, '127.0.0.1', port=port, timeout=1)
+        self.assertRaises(dns.exception.Timeout, r1.wait)
+        assert r2.wait().id == q2.id
+        assert len(connections) == 1
+        # the late answer to q1 is dropped and the connection reused
+        q3 = self._query('three.example.com')
+        r3 = eventlet.spawn(greendns.tcp, q3, '127.0.0.1', port=port, timeout=1)
+        r4 = eventlet.spawn(greendns.tcp, self._query(), '127.0.0.1', port=port, timeout=1)
+        assert r3.wait().id == q3.id
+        r4.wait()
+        assert len(connections) == 1
+
+    def test_tcp_reconnect_after_server_close(self):
+        connections = []
+        port = self._tcp_server(connections, close_after=1)
+        for _ in range(3):
+            q = self._query()
+            assert greendns.tcp(q, '127.0.0.1', port=port, timeout=1).id == q.id
+            eventlet.sleep(0.01)
+        assert len(connections) == 3
+
+    def test_idle_sockets_closed(self):
+        sources = []
+        udp_port = self._udp_server(sources)
+        tcp_port = self._tcp_server([])
+        with tests.mock.patch.object(greendns, 'DNS_IDLE_TIMEOUT', 0.02):
+            greendns.udp(self._query(), '127.0.0.1', port=udp_port, timeout=1)
+            greendns.tcp(self._query(), '127.0.0.1', port=tcp_port, timeout=1)
+            sockets = greendns._nameserver_sockets()
+            assert sockets.udp and sockets.tcp
+            eventlet.sleep(0.05)
+            assert not sockets.udp and not sockets.tcp
+            assert sockets.timer is None
+
+
 class TestProxyResolver(tests.LimitedTestCase):
 
     def test_clear(self):
@@ -427,6 +639,119 @@ class TestProxyResolver(tests.LimitedTestCase):
         assert rp.getaliases('host.example.com') == []
 
 
+class TestQueryCache(tests.LimitedTestCase):
+
+    qname = dns.name.from_text('example.com')
+
+    def _answer(self, ttl):
+        rrset = dns.rrset.from_text(self.qname, int(ttl), 'IN', 'A', '1.2.3.4')
+        answer = greendns.HostsAnswer(self.qname, dns.rdatatype.A, dns.rdataclass.IN, rrset, False)
+        answer.expiration = time.time() + ttl
+        return answer
+
+    def _negative_response(self, ttl, minimum):
+        response = dns.message.make_response(dns.message.make_query(self.qname, 'A'))
+        response.authority.append(dns.rrset.from_text(
+            'com.', ttl, 'IN', 'SOA', 'ns.com. host.com. 1 7200 900 1209600 %s' % minimum))
+        return response
+
+    def _counting(self, result):
+        calls = []
+
+        def query(qname, rdtype, rdclass, raise_on_no_answer=True):
+            calls.append(qname)
+            eventlet.sleep(0.01)
+            if isinstance(result, Exception):
+                raise greendns._copy_error(result)
+            return result
+
+        return query, calls
+
+    def _query(self, cache, fn):
+        return cache.query(fn, self.qname, dns.rdatatype.A, dns.rdataclass.IN)
+
+    def test_coalesce(self):
+        cache = greendns.QueryCache()
+        answer = self._answer(300)
+        fn, calls = self._counting(answer)
+        waiters = [eventlet.spawn(self._query, cache, fn) for _ in range(5)]
+        assert all(w.wait() is answer for w in waiters)
+        assert len(calls) == 1
+        stats = cache.stats()
+        assert stats['misses'] == 1
+        assert stats['coalesced'] == 4
+        assert self._query(cache, fn) is answer
+        assert cache.stats()['hits'] == 1
+
+    def test_ttl(self):
+        cache = greendns.QueryCache(prefetch=0)
+        fn, calls = self._counting(self._answer(0.05))
+        self._query(cache, fn)
+        self._query(cache, fn)
+        assert len(calls) == 1
+        eventlet.sleep(0.06)
+        self._query(cache, fn)
+        assert len(calls) == 2
+
+    def test_nxdomain_soa_ttl(self):
+        cache = greendns.QueryCache(negative_ttl=30)
+        error = dns.resolver.NXDOMAIN(
+            qnames=[self.qname], responses={self.qname: self._negative_response(3600, 60)})
+        fn, calls = self._counting(error)
+        for _ in range(2):
+            with tests.assert_raises(dns.resolver.NXDOMAIN):
+                self._query(cache, fn)
+        assert len(calls) == 1
+        ttl = cache._entries[(self.qname, dns.rdatatype.A, dns.rdataclass.IN)][3]
+        assert ttl == 30
+
+    def test_nodata_soa_ttl(self):
+        cache = greendns.QueryCache()
+        answer = greendns.HostsAnswer(self.qname, dns.rdatatype.A, dns.rdataclass.IN, None, False)
+        answer.response = self._negative_response(20, 60)
+        fn, calls = self._counting(answer)
+        assert self._query(cache, fn).rrset is None
+        assert self._query(cache, fn) is answer
+        assert len(calls) == 1
+        assert cache._entries[(self.qname, dns.rdatatype.A, dns.rdataclass.IN)][3] == 20
+
+    def test_negative_without_soa_not_cached(self):
+        cache = greendns.QueryCache()
+        for error in (dns.resolver.NXDOMAIN(), dns.exception.Timeout()):
+            fn, calls = self._counting(error)
+            for _ in range(2):
+                with tests.assert_raises(type(error)):
+                    self._query(cache, fn)
+            assert len(calls) == 2
+        assert cache.stats()['size'] == 0
+
+    def test_prefetch(self):
+        cache = greendns.QueryCache(prefetch=0.5)
+        old = self._answer(0.1)
+        fn, calls = self._counting(old)
+        self._query(cache, fn)
+        eventlet.sleep(0.06)
+        new = self._answer(300)
+        fn, calls = self._counting(new)
+        assert self._query(cache, fn) is old
+        assert self._query(cache, fn) is old
+        eventlet.sleep(0.02)
+        assert self._query(cache, fn) is new
+        assert len(calls) == 1
+        assert cache.stats()['prefetches'] == 1
+
+    def test_proxy_clear(self):
+        res = _make_mock_base_resolver()()
+        res.rr.address = '5.6.7.8'
+        rp = greendns.ResolverProxy()
+        rp._resolver = res
+        rp.cache.query(lambda *args, **kwargs: self._answer(300),
+                       self.qname, dns.rdatatype.A, dns.rdataclass.IN)
+        assert rp.query(self.qname)[0].address == '1.2.3.4'
+        rp._resolver = res
+        assert rp.query(self.qname)[0].address == '5.6.7.8'
+
+
 class TestResolve(tests.LimitedTestCase):
 
     def setUp(self):
@@ -598,6 +923,28 @@ class TestGetaddrinfo(tests.LimitedTestCase):
         assert tcp6 in filt_res
         assert udp6 in filt_res
 
+    def test_getaddrinfo_parallel_queries(self):
+        mock = _make_mock_resolve()
+        mock.add('example.com', '127.0.0.2')
+        mock.add('example.com', '::1')
+        in_flight = [0, 0]
+
+        def resolve(name, family=socket.AF_INET, raises=True, _proxy=None, use_network=True):
+            if use_network:
+                in_flight[0] += 1
+                in_flight[1] = max(in_flight)
+                eventlet.sleep(0.01)
+                in_flight[0] -= 1
+            else:
+                raises = False
+                name = 'unknown.example.com'
+            return mock(name, family, raises)
+
+        greendns.resolve = resolve
+        res = greendns.getaddrinfo('example.com', 'domain', 0, socket.SOCK_STREAM)
+        assert [ai[4][0] for ai in res] == ['::1', '127.0.0.2']
+        assert in_flight[1] == 2
+
     def test_getaddrinfo_idn(self):
         greendns.resolve = _make_mock_resolve()
         idn_name = 'евентлет.com'
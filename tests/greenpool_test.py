@@ -1,8 +1,11 @@
 import gc
+import itertools
 import random
+import time
 
 import eventlet
-from eventlet import hubs, pools
+from eventlet import greenio, hubs, pools
+from eventlet.green import socket
 from eventlet.support import greenlets as greenlet
 import tests
 
@@ -252,6 +255,45 @@ class GreenPool(tests.LimitedTestCase):
         eventlet.sleep(0)
         self.assertEqual(set(r), {1, 2, 3, 4})
 
+    def test_spawn_n_recycle(self):
+        p = eventlet.GreenPool(2, recycle=True)
+        greenlets = set()
+
+        def foo(fail):
+            greenlets.add(eventlet.getcurrent())
+            eventlet.sleep(0)
+            if fail:
+                raise RuntimeError('failed')
+
+        for i in range(10):
+            p.spawn_n(foo, i % 3 == 0)
+        p.waitall()
+        self.assertEqual(len(greenlets), 2)
+        self.assertEqual(p.running(), 0)
+        self.assertEqual(p.free(), 2)
+        self.assertEqual(len(p._idle), 2)
+        p.resize(1)
+        p.spawn_n(foo, False)
+        p.waitall()
+        self.assertEqual(len(p._idle), 1)
+
+    def test_spawn_n_recycle_stray_timeout(self):
+        p = eventlet.GreenPool(2, recycle=True)
+        ran = []
+
+        def leaky():
+            # never cancelled: fires into the idle worker
+            eventlet.Timeout(0.01)
+
+        p.spawn_n(leaky)
+        p.waitall()
+        eventlet.sleep(0.02)
+        p.spawn_n(ran.append, 1)
+        p.waitall()
+        self.assertEqual(ran, [1])
+        self.assertEqual(p.free(), 2)
+        self.assertEqual(p._idle[0].dead, False)
+
     def test_exceptions(self):
         p = eventlet.GreenPool(2)
         for m in (p.spawn, p.spawn_n):
@@ -313,6 +355,160 @@ class GreenPool(tests.LimitedTestCase):
         result_list = list(p.starmap(passthru, [(x,) for x in range(10)]))
         self.assertEqual(result_list, list(range(10)))
 
+    def test_imap_unordered(self):
+        p = eventlet.GreenPool(4)
+
+        def sleeper(item):
+            eventlet.sleep(0.05 if item == 0 else 0)
+            return item
+
+        results = list(p.imap_unordered(sleeper, range(10)))
+        # the slow first item doesn't hold back the others
+        self.assertEqual(results[-1], 0)
+        self.assertEqual(sorted(results), list(range(10)))
+        self.assertEqual(list(p.imap_unordered(None, [], [])), [])
+        self.assertEqual(sorted(p.imap_unordered(passthru2, range(5), range(5, 10))),
+                         list(zip(range(5), range(5, 10))))
+
+    def test_imap_unordered_raises(self):
+        p = eventlet.GreenPool(4)
+
+        def raiser(item):
+            if item in (1, 7):
+                raise RuntimeError("intentional error")
+            return item
+
+        it = p.imap_unordered(raiser, range(10), chunksize=3)
+        results = []
+        while True:
+            try:
+                results.append(next(it))
+            except RuntimeError:
+                results.append('r')
+            except StopIteration:
+                break
+        self.assertEqual(sorted(results, key=str), [0, 2, 3, 4, 5, 6, 8, 9, 'r', 'r'])
+
+    def test_imap_unordered_prefetch_chunksize(self):
+        p = eventlet.GreenPool(100)
+        started = []
+
+        def record(item):
+            started.append((item, eventlet.getcurrent()))
+            return item
+
+        it = p.imap_unordered(record, range(100), prefetch=10, chunksize=5)
+        eventlet.sleep(0.01)
+        # nothing consumed: only the prefetch window has been called
+        self.assertEqual(len(started), 10)
+        self.assertEqual(len(set(g for _, g in started)), 2)
+        self.assertEqual(sorted(it), list(range(100)))
+        self.assertEqual(len(set(g for _, g in started)), 20)
+        self.assertRaises(ValueError, p.imap_unordered, record, [], chunksize=0)
+        self.assertRaises(ValueError, p.imap_unordered, record, [], prefetch=0)
+
+    def test_imap_unordered_close(self):
+        p = eventlet.GreenPool(4)
+        started = []
+        killed = []
+
+        def slow(item):
+            started.append(item)
+            try:
+                eventlet.sleep(0 if item == 0 else 10)
+            except greenlet.GreenletExit:
+                killed.append(item)
+                raise
+            return item
+
+        it = p.imap_unordered(slow, itertools.count())
+        self.assertEqual(next(it), 0)
+        it.close()
+        self.assertRaises(StopIteration, next, it)
+        p.waitall()
+        self.assertEqual(sorted(killed), started[1:])
+        self.assertEqual(len(killed), 3)
+
+        # dropping the iterator closes it too
+        del started[:], killed[:]
+        for item in p.imap_unordered(slow, itertools.count()):
+            break
+        p.waitall()
+        self.assertEqual(sorted(killed), started[1:])
+        self.assertEqual(len(killed), 3)
+
+    def test_park(self):
+        p = eventlet.GreenPool(1)
+        a, b = socket.socketpair()
+        a = greenio.GreenSocket(a)
+        got = []
+        handle = p.park(a.fileno(), lambda: got.append(a.recv(10)))
+        eventlet.sleep(0.01)
+        # nobody waits in the pool
+        self.assertEqual(p.running(), 0)
+        self.assertEqual(got, [])
+        b.sendall(b'ping')
+        eventlet.sleep(0.01)
+        self.assertEqual(got, [b'ping'])
+        self.assertFalse(p.unpark(handle))
+
+        # a full pool runs the function once it has room
+        p.spawn_n(eventlet.sleep, 0.02)
+        p.park(a.fileno(), lambda: got.append(a.recv(10)))
+        b.sendall(b'pong')
+        eventlet.sleep(0.01)
+        self.assertEqual(got, [b'ping'])
+        p.waitall()
+        eventlet.sleep(0.01)
+        self.assertEqual(got, [b'ping', b'pong'])
+
+        handle = p.park(a.fileno(), lambda: got.append(a.recv(10)))
+        self.assertTrue(p.unpark(handle))
+        b.sendall(b'lost')
+        eventlet.sleep(0.01)
+        self.assertEqual(got, [b'ping', b'pong'])
+        self.assertEqual(a.recv(10), b'lost')
+        a.close()
+        b.close()
+
+    def test_park_full_pool_queues_functions(self):
+        p = eventlet.GreenPool(1)
+        pairs = [socket.socketpair() for _ in range(3)]
+        got = []
+        release = eventlet.Event()
+        p.spawn_n(release.wait)
+        handles = [p.park(a.fileno(), got.append, i) for i, (a, b) in enumerate(pairs)]
+        for a, b in pairs:
+            b.sendall(b'x')
+        eventlet.sleep(0.01)
+        # queued on the pool rather than each blocked in a greenthread of
+        # its own
+        self.assertEqual(got, [])
+        self.assertEqual(p.waiting(), 3)
+        self.assertEqual(len(p._pending), 3)
+        # still possible to take one back
+        self.assertTrue(p.unpark(handles[1]))
+        self.assertEqual(p.waiting(), 2)
+        release.send()
+        p.waitall()
+        self.assertEqual(sorted(got), [0, 2])
+        self.assertEqual(p.free(), 1)
+        self.assertFalse(p.unpark(handles[0]))
+        for a, b in pairs:
+            a.close()
+            b.close()
+
+    def test_waitall_slot_handed_to_blocked_spawn(self):
+        p = eventlet.GreenPool(1)
+        done = []
+        p.spawn_n(eventlet.sleep, 0.01)
+        # blocked on the full pool until the first one hands it its slot
+        eventlet.spawn_n(p.spawn_n, done.append, 1)
+        eventlet.sleep(0)
+        p.waitall()
+        self.assertEqual(done, [1])
+        self.assertEqual(p.free(), 1)
+
     def test_waitall_on_nothing(self):
         p = eventlet.GreenPool()
         p.waitall()
@@ -377,6 +573,82 @@ def test_greenpool_type_check():
         eventlet.GreenPool(-1)
 
 
+class TaskGroup(tests.LimitedTestCase):
+    def test_waits_for_children(self):
+        with eventlet.TaskGroup() as group:
+            a = group.spawn(passthru2, 1, 2)
+            b = group.spawn(passthru2, 3, 4)
+        assert a.dead and b.dead
+        self.assertEqual((a.wait(), b.wait()), ((1, 2), (3, 4)))
+        assert not group.children
+
+    def test_first_error_cancels_siblings(self):
+        def fail(delay, exc):
+            eventlet.sleep(delay)
+            raise exc
+
+        with tests.assert_raises(RuntimeError):
+            with eventlet.TaskGroup() as group:
+                slow = group.spawn(eventlet.sleep, 10)
+                group.spawn(fail, 0.01, RuntimeError('first'))
+                second = group.spawn(fail, 0.02, ValueError('second'))
+        self.assertRaises(greenlet.GreenletExit, slow.wait)
+        self.assertRaises(greenlet.GreenletExit, second.wait)
+        late = group.spawn(passthru2, 1, 2)
+        self.assertRaises(greenlet.GreenletExit, late.wait)
+
+    def test_error_interrupts_block(self):
+        def fail():
+            eventlet.sleep(0.01)
+            raise RuntimeError('child')
+
+        reached = []
+        start = time.time()
+        with tests.assert_raises(RuntimeError):
+            with eventlet.TaskGroup() as group:
+                group.spawn(fail)
+                eventlet.sleep(5)
+                reached.append(True)
+        assert time.time() - start < 1
+        assert not reached
+        # a later group in the same greenthread is not interrupted
+        with eventlet.TaskGroup() as group:
+            group.spawn(passthru2, 1, 2)
+            eventlet.sleep(0.02)
+
+    def test_block_error_kept_on_timeout(self):
+        def stubborn():
+            try:
+                eventlet.sleep(10)
+            except greenlet.GreenletExit:
+                eventlet.sleep(0.1)
+
+        with tests.assert_raises(KeyError):
+            with eventlet.TaskGroup(timeout=0.02) as group:
+                group.spawn(stubborn)
+                eventlet.sleep(0)
+                raise KeyError('block')
+
+    def test_block_error_cancels_children(self):
+        with tests.assert_raises(KeyError):
+            with eventlet.TaskGroup() as group:
+                slow = group.spawn(eventlet.sleep, 10)
+                raise KeyError('block')
+        self.assertRaises(greenlet.GreenletExit, slow.wait)
+
+    def test_timeout(self):
+        with tests.assert_raises(eventlet.Timeout):
+            with eventlet.TaskGroup(timeout=0.05) as group:
+                fast = group.spawn(passthru2, 1, 2)
+                slow = group.spawn(eventlet.sleep, 10)
+        self.assertEqual(fast.wait(), (1, 2))
+        self.assertRaises(greenlet.GreenletExit, slow.wait)
+        with eventlet.TaskGroup(timeout=0.05) as group:
+            group.spawn(passthru2, 1, 2)
+        # the timer is canceled when the group is done
+        eventlet.sleep(0.1)
+
+
 class StressException(Exception):
     pass
 
@@ -0,0 +1,114 @@
+import eventlet
+from eventlet import httpclient
+from eventlet import wsgi
+import tests
+
+
+def app(environ, start_response):
+    path = environ['PATH_INFO']
+    if path == '/echo':
+        body = environ['wsgi.input'].read()
+    elif path == '/big':
+        body = b'x' * 100000
+    elif path == '/slow':
+        eventlet.sleep(0.2)
+        body = b'slow'
+    else:
+        body = path.encode()
+    headers = [('Content-Length', str(len(body)))]
+    if path == '/close':
+        headers.append(('Connection', 'close'))
+    start_response('200 OK', headers)
+    return [body]
+
+
+class TestSession(tests.LimitedTestCase):
+    def setUp(self):
+        super().setUp()
+        self.listener = eventlet.listen(('127.0.0.1', 0))
+        self.server = eventlet.spawn(wsgi.server, self.listener, app, log_output=False)
+        self.url = 'http://127.0.0.1:%s' % self.listener.getsockname()[1]
+        self.session = httpclient.Session()
+
+    def tearDown(self):
+        self.session.close()
+        self.server.kill()
+        self.listener.close()
+        super().tearDown()
+
+    def test_keep_alive(self):
+        for path in ('/a', '/b', '/c'):
+            with self.session.get(self.url + path) as response:
+                self.assertEqual(response.status, 200)
+                self.assertEqual(response.read(), path.encode())
+        stats = self.session.pool.stats()
+        self.assertEqual(stats['created'], 1)
+        self.assertEqual(stats['reused'], 2)
+        self.assertEqual(stats['idle'], 1)
+
+    def test_post(self):
+        response = self.session.post(self.url + '/echo', b'hello', headers={'X-Test': '1'})
+        self.assertEqual(response.getheader('content-length'), '5')
+        self.assertEqual(response.read(), b'hello')
+        self.assertEqual(self.session.pool.stats()['in_use'], 0)
+
+    def test_readinto(self):
+        buf = bytearray(8192)
+        received = 0
+        with self.session.get(self.url + '/big') as response:
+            while True:
+                n = response.readinto(buf)
+                if not n:
+                    break
+                received += n
+        self.assertEqual(received, 100000)
+        self.assertEqual(self.session.pool.stats()['idle'], 1)
+
+    def test_unread_body_closes_connection(self):
+        with self.session.get(self.url + '/big') as response:
+            response.read(10)
+        stats = self.session.pool.stats()
+        self.assertEqual(stats['discarded'], 1)
+        self.assertEqual(stats['idle'], 0)
+
+    def test_connection_close(self):
+        self.session.get(self.url + '/close').read()
+        self.session.get(self.url + '/close').read()
+        stats = self.session.pool.stats()
+        self.assertEqual(stats['created'], 2)
+        self.assertEqual(stats['discarded'], 2)
+
+    def test_timeout(self):
+        with self.assertRaises(eventlet.Timeout):
+            self.session.get(self.url + '/slow', timeout=0.05)
+        self.assertEqual(self.session.pool.stats()['in_use'], 0)
+        session = httpclient.Session(timeout=0.05)
+        try:
+            self.assertRaises(eventlet.Timeout, session.get, self.url + '/slow')
+            self.assertEqual(session.get(self.url + '/slow', timeout=None).read(), b'slow')
+        finally:
+            session.close()
+
+    def test_pipeline(self):
+        # the first request tells the session the server keeps connections
+        # open; the next ones are written together on that connection
+        paths = ['/p%d' % i for i in range(5)]
+        responses = self.session.pipeline([('GET', self.url + path) for path in paths])
+        self.assertEqual([r.read() for r in responses], [p.encode() for p in paths])
+        responses = self.session.pipeline(
+            [('GET', self.url + path) for path in paths] + [('POST', self.url + '/echo', b'body')])
+        self.assertEqual([r.read() for r in responses], [p.encode() for p in paths] + [b'body'])
+        # checkouts: /p0, then /p1-/p4, then /p0-/p4, then the POST alone
+        stats = self.session.pool.stats()
+        self.assertEqual(stats['created'], 1)
+        self.assertEqual(stats['reused'], 3)
+
+    def test_pipeline_connection_close(self):
+        requests = [('GET', self.url + '/a'), ('GET', self.url + '/close'), ('GET', self.url + '/b')]
+        self.session.get(self.url + '/warm').read()
+        responses = self.session.pipeline(requests)
+        self.assertEqual([r.read() for r in responses], [b'/a', b'/close', b'/b'])
+        self.assertEqual(self.session.pool.stats()['created'], 2)
+
+    def test_invalid_url(self):
+        self.assertRaises(httpclient.client.InvalidURL, self.session.get, 'ftp://127.0.0.1/')
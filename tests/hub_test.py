@@ -153,6 +153,46 @@ class TestScheduleCall(tests.LimitedTestCase):
             eventlet.sleep(DELAY)
         self.assertEqual(lst, [1, 2, 3])
 
+    def test_run_soon(self):
+        hub = hubs.get_hub()
+        canceled_before = hub.timers_canceled
+        lst = []
+        hub.run_soon(lst.append, 1)
+        hub.schedule_call_global(0, lst.append, 2)
+        canceled = hub.schedule_call_global(0, lst.append, 'canceled')
+        hub.run_soon(lst.append, 3)
+        canceled.cancel()
+        # zero-delay timers share the run queue and are not counted
+        # with the canceled timers of the heap
+        self.assertEqual(hub.timers_canceled, canceled_before)
+        eventlet.sleep(0)
+        self.assertEqual(lst, [1, 2, 3])
+
+    def test_run_queue_fifo_with_expired_timers(self):
+        hub = hubs.get_hub()
+        lst = []
+        hub.schedule_call_global(0.001, lst.append, 'expired')
+        time.sleep(0.005)
+        hub.schedule_call_global(0, lst.append, 'zero')
+        hub.run_soon(lst.append, 'soon')
+        eventlet.sleep(DELAY)
+        self.assertEqual(lst, ['expired', 'zero', 'soon'])
+
+    def test_run_soon_runs_once_per_iteration(self):
+        hub = hubs.get_hub()
+        calls = []
+
+        def again():
+            calls.append(True)
+            hub.run_soon(again)
+
+        hub.run_soon(again)
+        eventlet.sleep(DELAY)
+        # a callback queuing itself does not keep the hub from polling
+        # and firing timers
+        assert 0 < len(calls) < 10000, len(calls)
+        hub.run_queue.clear()
+
 
 class TestDebug(tests.LimitedTestCase):
 
@@ -0,0 +1,152 @@
+import eventlet
+from eventlet import lock
+import tests
+
+
+class TestRWLock(tests.LimitedTestCase):
+    def test_readers_share(self):
+        rw = lock.RWLock()
+        inside = []
+
+        def reader(n):
+            with rw.read_locked():
+                inside.append(n)
+                eventlet.sleep(0.01)
+                return len(inside)
+
+        gts = [eventlet.spawn(reader, n) for n in range(3)]
+        self.assertEqual([gt.wait() for gt in gts], [3, 3, 3])
+
+    def test_writer_is_exclusive(self):
+        rw = lock.RWLock()
+        events = []
+
+        def writer(n):
+            with rw.write_locked():
+                events.append(('in', n))
+                eventlet.sleep(0.001)
+                events.append(('out', n))
+
+        gts = [eventlet.spawn(writer, n) for n in range(3)]
+        for gt in gts:
+            gt.wait()
+        self.assertEqual(events, [('in', 0), ('out', 0), ('in', 1), ('out', 1), ('in', 2), ('out', 2)])
+
+    def test_writer_preferred(self):
+        rw = lock.RWLock()
+        order = []
+        rw.acquire_read()
+
+        def writer():
+            with rw.write_locked():
+                order.append('writer')
+
+        def reader():
+            with rw.read_locked():
+                order.append('reader')
+
+        w = eventlet.spawn(writer)
+        eventlet.sleep(0)
+        r = eventlet.spawn(reader)
+        eventlet.sleep(0)
+        self.assertEqual(order, [])
+        # the holder may still re-enter its read lock
+        self.assertTrue(rw.acquire_read(blocking=False))
+        rw.release_read()
+        rw.release_read()
+        w.wait()
+        r.wait()
+        self.assertEqual(order, ['writer', 'reader'])
+
+    def test_timeout(self):
+        rw = lock.RWLock()
+        rw.acquire_write()
+        self.assertFalse(eventlet.spawn(rw.acquire_read, timeout=0.01).wait())
+        self.assertFalse(eventlet.spawn(rw.acquire_write, blocking=False).wait())
+        rw.release_write()
+        self.assertTrue(rw.acquire_read(blocking=False))
+        rw.release_read()
+
+    def test_abandoned_writer_lets_readers_in(self):
+        rw = lock.RWLock()
+        rw.acquire_read()
+        w = eventlet.spawn(rw.acquire_write, timeout=0.01)
+        eventlet.sleep(0)
+        r = eventlet.spawn(rw.acquire_read)
+        self.assertFalse(w.wait())
+        self.assertTrue(r.wait())
+
+    def test_upgrade_downgrade(self):
+        rw = lock.RWLock()
+        done = eventlet.Event()
+
+        def other_reader():
+            with rw.read_locked():
+                done.wait()
+
+        other = eventlet.spawn(other_reader)
+        eventlet.sleep(0)
+        rw.acquire_read()
+        waiting_writer = eventlet.spawn(rw.acquire_write)
+        eventlet.sleep(0)
+        self.assertRaises(RuntimeError, rw.acquire_write)
+        self.assertFalse(rw.upgrade(timeout=0.01))
+
+        eventlet.spawn_after(0.01, done.send)
+        self.assertTrue(rw.upgrade())
+        other.wait()
+        # the upgrade went ahead of the waiting writer
+        self.assertFalse(waiting_writer.dead)
+        rw.downgrade()
+        self.assertTrue(rw.acquire_read(blocking=False))
+        rw.release_read()
+        rw.release_read()
+        self.assertTrue(waiting_writer.wait())
+
+    def test_release_errors(self):
+        rw = lock.RWLock()
+        self.assertRaises(RuntimeError, rw.release_read)
+        self.assertRaises(RuntimeError, rw.release_write)
+        self.assertRaises(RuntimeError, rw.downgrade)
+        self.assertRaises(RuntimeError, rw.upgrade)
+
+
+class TestKeyedLock(tests.LimitedTestCase):
+    def test_serialises_per_key(self):
+        locks = lock.KeyedLock()
+        events = []
+
+        def worker(key, n):
+            with locks.lock(key):
+                events.append((key, n, 'in'))
+                eventlet.sleep(0.001)
+                events.append((key, n, 'out'))
+
+        gts = [eventlet.spawn(worker, key, n) for n in range(2) for key in 'ab']
+        eventlet.sleep(0)
+        self.assertTrue(locks.locked('a'))
+        self.assertEqual(events, [('a', 0, 'in'), ('b', 0, 'in')])
+        for gt in gts:
+            gt.wait()
+        self.assertEqual([e for e in events if e[0] == 'a'],
+                         [('a', 0, 'in'), ('a', 0, 'out'), ('a', 1, 'in'), ('a', 1, 'out')])
+        self.assertEqual(len(locks), 0)
+
+    def test_timeout_cleans_up(self):
+        locks = lock.KeyedLock()
+        locks.acquire('k')
+        self.assertFalse(eventlet.spawn(locks.acquire, 'k', timeout=0.01).wait())
+        self.assertEqual(len(locks), 1)
+        locks.release('k')
+        self.assertEqual(len(locks), 0)
+        self.assertRaises(RuntimeError, locks.release, 'k')
+
+
+def test_striped_lock():
+    locks = lock.StripedLock(4)
+    assert locks.lock('a') is locks.lock('a')
+    assert locks.acquire('a')
+    assert not locks.acquire('a', blocking=False)
+    locks.release('a')
+    with tests.assert_raises(ValueError):
+        lock.StripedLock(0)
@@ -240,6 +240,143 @@ class TestCreateRaises(TestCase):
         self.assertEqual(self.pool.free(), 3)
 
 
+class Resource:
+    def __init__(self):
+        self.alive = True
+        self.checkouts = 0
+
+
+class TestHooks(TestCase):
+    mode = 'static'
+
+    def test_validate_rejects_broken_items(self):
+        disposed = []
+        pool = pools.Pool(max_size=2, create=Resource,
+                          validate=lambda r: r.alive, dispose=disposed.append)
+        broken = pool.get()
+        pool.put(broken)
+        broken.alive = False
+        fresh = pool.get()
+        assert fresh is not broken
+        self.assertEqual(disposed, [broken])
+        self.assertEqual(pool.free(), 1)
+        stats = pool.stats()
+        self.assertEqual(stats['validation_failures'], 1)
+        self.assertEqual(stats['created'], 2)
+        self.assertEqual(stats['checkouts'], 2)
+
+    def test_validate_item_handed_to_waiter(self):
+        disposed = []
+        pool = pools.Pool(max_size=1, create=Resource,
+                          validate=lambda r: r.alive, dispose=disposed.append)
+        broken = pool.get()
+        waiter = eventlet.spawn(pool.get)
+        eventlet.sleep(0)
+        broken.alive = False
+        pool.put(broken)
+        fresh = waiter.wait()
+        assert fresh is not broken
+        self.assertEqual(disposed, [broken])
+        self.assertEqual(pool.current_size, 1)
+        self.assertEqual(pool.stats()['validation_failures'], 1)
+
+    def test_on_checkout(self):
+        def on_checkout(r):
+            r.checkouts += 1
+
+        pool = pools.Pool(max_size=1, create=Resource, on_checkout=on_checkout)
+        with pool.item() as r:
+            pass
+        with pool.item() as r:
+            self.assertEqual(r.checkouts, 2)
+
+    def test_wait_stats(self):
+        pool = pools.TokenPool(max_size=1)
+        token = pool.get()
+        eventlet.spawn_after(0.01, pool.put, token)
+        self.assertIs(pool.get(), token)
+        stats = pool.stats()
+        self.assertEqual(stats['waits'], 1)
+        assert stats['max_wait_time'] > 0, stats
+
+
+class TestMaintainer(TestCase):
+    mode = 'static'
+
+    def test_prewarm(self):
+        pool = pools.Pool(max_size=4, create=Resource, min_idle=2, maintain_interval=0.01)
+        try:
+            self.assertEqual(len(pool.free_items), 0)
+            eventlet.sleep(0)
+            self.assertEqual(len(pool.free_items), 2)
+            a, b = pool.get(), pool.get()
+            eventlet.sleep(0.02)
+            self.assertEqual(len(pool.free_items), 2)
+            self.assertEqual(pool.current_size, 4)
+            pool.put(a)
+            pool.put(b)
+        finally:
+            pool.close()
+        self.assertEqual(pool.current_size, 0)
+
+    def test_idle_eviction(self):
+        disposed = []
+        pool = pools.Pool(max_size=4, create=Resource, dispose=disposed.append,
+                          idle_timeout=0.01, maintain_interval=0.005)
+        try:
+            r = pool.get()
+            pool.put(r)
+            eventlet.sleep(0.05)
+            self.assertEqual(disposed, [r])
+            self.assertEqual(pool.current_size, 0)
+            self.assertEqual(pool.stats()['expired'], 1)
+        finally:
+            pool.close()
+
+    def test_max_lifetime(self):
+        pool = pools.Pool(max_size=1, create=Resource, max_lifetime=0.01, maintain_interval=10)
+        try:
+            r = pool.get()
+            eventlet.sleep(0.02)
+            pool.put(r)
+            self.assertEqual(pool.current_size, 0)
+            assert pool.get() is not r
+        finally:
+            pool.close()
+
+    def test_max_lifetime_replaces_item_for_waiter(self):
+        pool = pools.Pool(max_size=1, create=Resource, max_lifetime=0.01, maintain_interval=10)
+        try:
+            r = pool.get()
+            waiter = eventlet.spawn(pool.get)
+            eventlet.sleep(0.02)
+            pool.put(r)
+            replacement = waiter.wait()
+            assert replacement is not r
+            self.assertEqual(pool.current_size, 1)
+        finally:
+            pool.close()
+
+    def test_times_of_other_item_with_same_id(self):
+        pool = pools.Pool(max_size=1, create=Resource, max_lifetime=0.01, maintain_interval=10)
+        try:
+            r = pool.get()
+            # as left behind by an item that had r's id
+            pool._item_times[id(r)] = [Resource(), 0, 0]
+            pool.put(r)
+            self.assertEqual(pool.stats()['expired'], 0)
+            assert pool.get() is r
+        finally:
+            pool.close()
+
+    def test_abandoned_pool_stops_maintainer(self):
+        pool = pools.Pool(max_size=1, create=Resource, min_idle=1, maintain_interval=0.001)
+        maintainer = pool._maintainer
+        del pool
+        eventlet.sleep(0.01)
+        assert maintainer.dead
+
+
 ALWAYS = RuntimeError('I always fail')
 SOMETIMES = RuntimeError('I fail half the time')
 
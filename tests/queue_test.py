@@ -1,5 +1,8 @@
+import gc
+import os
+
 import eventlet
-from eventlet import event, hubs, queue
+from eventlet import event, hubs, patcher, queue
 import tests
 
 
@@ -236,10 +239,34 @@ class TestQueue(tests.LimitedTestCase):
         s2.wait()
         s3.wait()
         self.assertEqual(c.getting(), 0)
-        # NOTE: we don't guarantee that waiters are served in order
-        results = sorted([w1.wait(), w2.wait(), w3.wait()])
+        results = [w1.wait(), w2.wait(), w3.wait()]
         self.assertEqual(results, [1, 2, 3])
 
+    def test_getters_served_in_order(self):
+        q = eventlet.Queue()
+        gts = [eventlet.spawn(q.get) for _ in range(5)]
+        eventlet.sleep(0)
+        for i in range(5):
+            q.put(i)
+        self.assertEqual([gt.wait() for gt in gts], list(range(5)))
+
+    def test_putters_served_in_order(self):
+        q = eventlet.Queue(1)
+        q.put('first')
+        gts = [eventlet.spawn(q.put, i) for i in range(5)]
+        eventlet.sleep(0)
+        self.assertEqual(q.putting(), 5)
+        self.assertEqual([q.get() for _ in range(6)], ['first', 0, 1, 2, 3, 4])
+        for gt in gts:
+            gt.wait()
+
+    def test_timed_out_getter_is_removed(self):
+        q = eventlet.Queue()
+        self.assertRaises(queue.Empty, q.get, timeout=0.001)
+        self.assertEqual(q.getting(), 0)
+        q.put('hi')
+        self.assertEqual(q.get(), 'hi')
+
     def test_channel_sender_timing_out(self):
         c = eventlet.Queue(0)
         self.assertRaises(queue.Full, c.put, "hi", timeout=0.001)
@@ -280,6 +307,174 @@ class TestQueue(tests.LimitedTestCase):
         self.assertEqual(got, list(range(10)))
 
 
+class TestBatch(tests.LimitedTestCase):
+    def test_put_many_get_many(self):
+        q = eventlet.Queue()
+        q.put_many(range(5))
+        self.assertEqual(q.qsize(), 5)
+        self.assertEqual(q.unfinished_tasks, 5)
+        self.assertEqual(q.get_many(3), [0, 1, 2])
+        self.assertEqual(q.get_many(), [3, 4])
+
+    def test_put_many_wakes_getters(self):
+        q = queue.LightQueue()
+        gts = [eventlet.spawn(q.get) for _ in range(3)]
+        eventlet.sleep(0)
+        q.put_many('abc')
+        self.assertEqual([gt.wait() for gt in gts], ['a', 'b', 'c'])
+
+    def test_put_many_blocks_when_full(self):
+        q = eventlet.Queue(2)
+        gt = eventlet.spawn(q.put_many, range(5))
+        eventlet.sleep(0)
+        self.assertEqual(q.qsize(), 2)
+        self.assertEqual(q.putting(), 1)
+        result = []
+        while len(result) < 5:
+            result.extend(q.get_many())
+        self.assertEqual(result, list(range(5)))
+        gt.wait()
+
+    def test_put_many_timeout(self):
+        q = eventlet.Queue(2)
+        self.assertRaises(queue.Full, q.put_many, range(5), timeout=0.01)
+        self.assertEqual(q.get_many(), [0, 1])
+        self.assertEqual(q.putting(), 0)
+
+    def test_put_many_nowait(self):
+        q = eventlet.Queue(2)
+        self.assertRaises(queue.Full, q.put_many, range(5), block=False)
+        self.assertEqual(q.get_many(), [0, 1])
+
+    def test_get_many_waits_for_first_item(self):
+        q = eventlet.Queue()
+        gt = eventlet.spawn(q.get_many, 10)
+        eventlet.sleep(0)
+        q.put_many([1, 2])
+        self.assertEqual(gt.wait(), [1, 2])
+
+    def test_get_many_empty(self):
+        q = eventlet.Queue()
+        self.assertRaises(queue.Empty, q.get_many, block=False)
+        self.assertRaises(queue.Empty, q.get_many, timeout=0.01)
+        self.assertRaises(ValueError, q.get_many, 0)
+
+    def test_get_many_wakes_putters(self):
+        q = eventlet.Queue(2)
+        q.put_many([1, 2])
+        gts = [eventlet.spawn(q.put, i) for i in (3, 4)]
+        eventlet.sleep(0)
+        self.assertEqual(q.get_many(), [1, 2])
+        for gt in gts:
+            gt.wait()
+        self.assertEqual(q.get_many(), [3, 4])
+
+    def test_priority_queue_get_many(self):
+        q = queue.PriorityQueue()
+        q.put_many([3, 1, 2])
+        self.assertEqual(q.get_many(), [1, 2, 3])
+
+
+class TestThreadSafeQueue(tests.LimitedTestCase):
+    def setUp(self):
+        super().setUp()
+        self.threading = patcher.original('threading')
+
+    def start_thread(self, func, *args):
+        t = self.threading.Thread(target=func, args=args)
+        t.daemon = True
+        t.start()
+        return t
+
+    def test_put_get_same_hub(self):
+        q = queue.ThreadSafeQueue()
+        gt = eventlet.spawn(q.get)
+        eventlet.sleep(0)
+        q.put('hi')
+        self.assertEqual(gt.wait(), 'hi')
+        self.assertEqual(q.qsize(), 0)
+
+    def test_native_thread_put_wakes_greenthread(self):
+        q = queue.ThreadSafeQueue()
+        ticks = []
+
+        def ticker():
+            while True:
+                ticks.append(1)
+                eventlet.sleep(0.001)
+
+        def producer():
+            patcher.original('time').sleep(0.05)
+            for i in range(100):
+                q.put(i)
+
+        ticker_gt = eventlet.spawn(ticker)
+        t = self.start_thread(producer)
+        self.assertEqual([q.get() for _ in range(100)], list(range(100)))
+        t.join()
+        ticker_gt.kill()
+        assert ticks, 'hub was blocked while waiting on the queue'
+
+    def test_native_thread_get(self):
+        q = queue.ThreadSafeQueue()
+        result = []
+        t = self.start_thread(lambda: result.extend(q.get() for _ in range(3)))
+        eventlet.sleep(0.01)
+        for i in range(3):
+            q.put(i)
+        t.join()
+        self.assertEqual(result, [0, 1, 2])
+
+    def test_bounded_put_blocks_native_thread(self):
+        q = queue.ThreadSafeQueue(2)
+        t = self.start_thread(lambda: [q.put(i) for i in range(10)])
+        result = [q.get() for _ in range(10)]
+        t.join()
+        self.assertEqual(result, list(range(10)))
+
+    def test_timeouts(self):
+        q = queue.ThreadSafeQueue(1)
+        self.assertRaises(queue.Empty, q.get, timeout=0.01)
+        self.assertRaises(queue.Empty, q.get_nowait)
+        q.put(1)
+        self.assertRaises(queue.Full, q.put, 2, timeout=0.01)
+        self.assertRaises(queue.Full, q.put_nowait, 2)
+        self.assertEqual(q.get(), 1)
+        self.assertRaises(ValueError, queue.ThreadSafeQueue, 0)
+
+    def test_cancelled_greenthread_does_not_lose_item(self):
+        q = queue.ThreadSafeQueue()
+        doomed = eventlet.spawn(q.get)
+        survivor = eventlet.spawn(q.get)
+        eventlet.sleep(0)
+        q.put(1)
+        doomed.kill()
+        self.assertEqual(survivor.wait(), 1)
+
+    def test_waker_descriptors_closed(self):
+        fds = []
+
+        def run():
+            hubs.get_hub()
+            fds.append(queue._get_waker()._rfd)
+
+        # the thread's waker goes away with the thread
+        self.start_thread(run).join()
+        gc.collect()
+        self.assertRaises(OSError, os.fstat, fds[0])
+
+        waker = queue._get_waker()
+        q = queue.ThreadSafeQueue()
+        gt = eventlet.spawn(q.get)
+        eventlet.sleep(0)
+        waker.close()
+        self.assertRaises(OSError, os.fstat, waker._rfd)
+        # closing twice does nothing
+        waker.close()
+        gt.kill()
+        assert queue._get_waker() is not waker
+
+
 def store_result(result, func, *args):
     try:
         result.append(func(*args))
@@ -354,6 +549,19 @@ class TestNoWait(tests.LimitedTestCase):
         assert q.full(), q
         assert q.empty(), q
 
+    def test_put_from_mainloop_switches_to_getter(self):
+        hub = hubs.get_hub()
+        result = []
+        q = eventlet.Queue()
+        gt = eventlet.spawn(q.get)
+        eventlet.sleep(0)
+        hub.schedule_call_global(0, store_result, result, q.put, 7)
+        eventlet.sleep(0)
+        assert result == [None], result
+        assert gt.dead, gt
+        assert gt.wait() == 7
+        assert q._event_unlock is None, q
+
     def test_wait_except(self):
         # https://github.com/eventlet/eventlet/issues/407
         q = eventlet.Queue()
@@ -1,7 +1,9 @@
 import time
 
 import eventlet
+import eventlet.lock
 import tests
+import tests.mock
 
 
 class TestSemaphore(tests.LimitedTestCase):
@@ -42,6 +44,66 @@ class TestSemaphore(tests.LimitedTestCase):
         sem = eventlet.Semaphore()
         self.assertRaises(ValueError, sem.acquire, blocking=False, timeout=1)
 
+    def test_fifo_wakeup(self):
+        sem = eventlet.Semaphore(0)
+        order = []
+
+        def waiter(n):
+            sem.acquire()
+            order.append(n)
+
+        gts = [eventlet.spawn(waiter, n) for n in range(5)]
+        eventlet.sleep(0)
+        for _ in gts:
+            sem.release()
+        for gt in gts:
+            gt.wait()
+        self.assertEqual(order, list(range(5)))
+        self.assertEqual(sem.counter, 0)
+
+    def test_hand_off_schedules_no_timer(self):
+        sem = eventlet.Semaphore(0)
+        lock = eventlet.lock.Lock()
+        lock.acquire()
+        gts = [eventlet.spawn(sem.acquire), eventlet.spawn(lock.acquire)]
+        eventlet.sleep(0)
+        hub = eventlet.hubs.get_hub()
+        with tests.mock.patch.object(hub, 'schedule_call_global', side_effect=AssertionError):
+            sem.release()
+            lock.release()
+        for gt in gts:
+            self.assertEqual(gt.wait(), True)
+
+    def test_release_hands_over_ownership(self):
+        sem = eventlet.Semaphore(0)
+        gt = eventlet.spawn(sem.acquire)
+        eventlet.sleep(0)
+        sem.release()
+        # the waiter owns the semaphore even before it had a chance to run
+        self.assertEqual(sem.acquire(blocking=False), False)
+        self.assertEqual(sem.balance, 0)
+        self.assertEqual(gt.wait(), True)
+
+    def test_killed_waiter_passes_ownership_on(self):
+        sem = eventlet.Semaphore(0)
+        doomed = eventlet.spawn(sem.acquire)
+        survivor = eventlet.spawn(sem.acquire)
+        eventlet.sleep(0)
+        sem.release()
+        doomed.kill()
+        self.assertEqual(survivor.wait(), True)
+        self.assertEqual(sem.counter, 0)
+
+    def test_interrupted_waiter_gives_granted_ownership_back(self):
+        sem = eventlet.Semaphore(0)
+        gt = eventlet.spawn(sem.acquire)
+        eventlet.sleep(0)
+        sem.release()
+        # interrupted before the hand-over is delivered
+        eventlet.kill(gt, RuntimeError)
+        self.assertRaises(RuntimeError, gt.wait)
+        self.assertEqual(sem.counter, 1)
+
 
 def test_semaphore_contention():
     g_mutex = eventlet.Semaphore()
@@ -3,10 +3,12 @@ import os
 import shutil
 import sys
 import tempfile
+import time
 import eventlet
 from eventlet.green import socket
 from eventlet.support import greendns
 import tests
+import tests.mock
 
 
 def test_create_connection_error():
@@ -109,3 +111,72 @@ def test_connect_ex_success():
     client = socket.socket()
     result = client.connect_ex(server.getsockname())
     assert result == 0
+
+
+def _closed_port():
+    sock = eventlet.listen(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def _addrinfo(family, host, port):
+    if family == socket.AF_INET6:
+        return (family, socket.SOCK_STREAM, socket.IPPROTO_TCP, '', (host, port, 0, 0))
+    return (family, socket.SOCK_STREAM, socket.IPPROTO_TCP, '', (host, port))
+
+
+def test_create_connection_happy_eyeballs():
+    listener = eventlet.listen(('127.0.0.1', 0))
+    port = listener.getsockname()[1]
+    addrinfos = [_addrinfo(socket.AF_INET6, '::1', port), _addrinfo(socket.AF_INET, '127.0.0.1', port)]
+    connect = socket.socket.connect
+    blackholed = []
+
+    def connect_or_hang(sock, address):
+        if address[0] == '::1':
+            blackholed.append(sock)
+            eventlet.sleep(10)
+        return connect(sock, address)
+
+    with tests.mock.patch.object(socket, 'getaddrinfo', return_value=addrinfos), \
+            tests.mock.patch.object(socket.socket, 'connect', connect_or_hang), \
+            tests.mock.patch.object(socket, 'CONNECTION_ATTEMPT_DELAY', 0.05):
+        try:
+            start = time.time()
+            sock = socket.create_connection(('dual.example.com', port))
+            assert 0.05 <= time.time() - start < 1
+            assert sock.family == socket.AF_INET
+            assert blackholed[0].fileno() == -1
+            sock.close()
+            # IPv4 won, it is tried first from now on
+            assert socket._preferred_families['dual.example.com'] == socket.AF_INET
+            start = time.time()
+            socket.create_connection(('dual.example.com', port)).close()
+            assert time.time() - start < 0.05
+            assert len(blackholed) == 1
+        finally:
+            socket._preferred_families.pop('dual.example.com', None)
+            listener.close()
+
+
+def test_create_connection_failure_starts_next_attempt():
+    listener = eventlet.listen(('127.0.0.1', 0))
+    port = listener.getsockname()[1]
+    addrinfos = [_addrinfo(socket.AF_INET, '127.0.0.1', _closed_port()),
+                 _addrinfo(socket.AF_INET, '127.0.0.1', port)]
+    with tests.mock.patch.object(socket, 'getaddrinfo', return_value=addrinfos), \
+            tests.mock.patch.object(socket, 'CONNECTION_ATTEMPT_DELAY', 5):
+        try:
+            start = time.time()
+            sock = socket.create_connection(('refusing.example.com', port))
+            assert time.time() - start < 1
+            assert sock.getpeername()[1] == port
+            sock.close()
+        finally:
+            socket._preferred_families.pop('refusing.example.com', None)
+            listener.close()
+
+        addrinfos[1] = _addrinfo(socket.AF_INET, '127.0.0.1', _closed_port())
+        with tests.assert_raises(ConnectionRefusedError):
+            socket.create_connection(('refusing.example.com', port))
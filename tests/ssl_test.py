@@ -1,3 +1,4 @@
+import array
 import random
 import sys
 import warnings
@@ -207,6 +208,34 @@ class SSLTest(tests.LimitedTestCase):
         tests.check_idle_cpu_usage(0.2, 0.1)
         server_coro.kill()
 
+    def test_sendall_buffers_and_recv_into(self):
+        payload = bytes(random.getrandbits(8) for _ in range(256)) * 1024
+
+        def serve(listener):
+            sock, addr = listener.accept()
+            buf = bytearray(len(payload))
+            view = memoryview(buf)
+            received = 0
+            while received < len(buf):
+                n = sock.recv_into(view[received:])
+                assert n
+                received += n
+            sock.sendall(memoryview(buf)[1000:])
+            sock.sendall(array.array('I', [1, 2]))
+            return bytes(buf)
+
+        sock = listen_ssl_socket()
+        server_coro = eventlet.spawn(serve, sock)
+        client = ssl.wrap_socket(eventlet.connect(sock.getsockname()))
+        self.assertEqual(client.sendall(bytearray(payload[:1000])), 1000)
+        client.sendall(memoryview(payload)[1000:])
+        self.assertEqual(server_coro.wait(), payload)
+        expected = payload[1000:] + array.array('I', [1, 2]).tobytes()
+        received = b''
+        while len(received) < len(expected):
+            received += client.recv(65536)
+        self.assertEqual(received, expected)
+
     def test_greensslobject(self):
         def serve(listener):
             sock, addr = listener.accept()
@@ -329,6 +358,259 @@ class SSLTest(tests.LimitedTestCase):
 
                 listener.close()
 
+    def test_session_cache(self):
+        server_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        server_context.load_cert_chain(tests.certificate_file, tests.private_key_file)
+        listener = eventlet.listen(('127.0.0.1', 0))
+
+        def serve():
+            while True:
+                sock = server_context.wrap_socket(listener.accept()[0], server_side=True)
+                sock.sendall(sock.recv(4))
+                sock.close()
+
+        server = eventlet.spawn(serve)
+        context = ssl.create_default_context()
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+        context.session_cache = ssl.SessionCache()
+        reused = []
+        try:
+            for connect_first in (True, True, False):
+                if connect_first:
+                    client = context.wrap_socket(eventlet.connect(listener.getsockname()))
+                else:
+                    client = context.wrap_socket(socket.socket())
+                    client.connect(listener.getsockname())
+                client.sendall(b'ping')
+                assert client.recv(4) == b'ping'
+                reused.append(client.session_reused)
+                client.close()
+        finally:
+            server.kill()
+            listener.close()
+        assert reused == [False, True, True]
+        assert len(context.session_cache) == 1
+        assert context.session_counters() == {'handshakes': 3, 'resumed': 2, 'full': 1}
+        assert server_context.session_counters() == {'handshakes': 3, 'resumed': 2, 'full': 1}
+
+    def test_handshake_offload(self):
+        server_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        server_context.load_cert_chain(tests.certificate_file, tests.private_key_file)
+        server_context.handshake_offload = offload = ssl.HandshakeOffload(max_in_flight=1)
+        listener = server_context.wrap_socket(eventlet.listen(('127.0.0.1', 0)), server_side=True)
+        pool = eventlet.GreenPool()
+
+        def handle(sock):
+            # the handshake is implicit here, the first recv runs it
+            sock.sendall(sock.recv(4))
+            sock.close()
+
+        def serve():
+            while True:
+                pool.spawn(handle, listener.accept()[0])
+
+        def client():
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+            sock = context.wrap_socket(eventlet.connect(listener.getsockname()))
+            sock.sendall(b'ping')
+            data = sock.recv(4)
+            sock.close()
+            return data
+
+        server = eventlet.spawn(serve)
+        try:
+            clients = [eventlet.spawn(client) for _ in range(3)]
+            assert [c.wait() for c in clients] == [b'ping'] * 3
+            pool.waitall()
+        finally:
+            server.kill()
+            listener.close()
+        stats = offload.stats()
+        assert stats['handshakes'] == 3
+        assert stats['steps'] >= 3
+        assert stats['in_flight'] == stats['waiting'] == 0
+        assert stats['max_wait'] <= stats['wait_time']
+
+    def test_handshake_offload_concurrent_read_write(self):
+        server_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        server_context.load_cert_chain(tests.certificate_file, tests.private_key_file)
+        server_context.handshake_offload = offload = ssl.HandshakeOffload(max_in_flight=4)
+        listener = server_context.wrap_socket(
+            eventlet.listen(('127.0.0.1', 0)), server_side=True, do_handshake_on_connect=False)
+        in_flight = []
+        execute = offload.execute
+
+        def tracking_execute(func):
+            in_flight.append(func)
+            try:
+                assert len(in_flight) == 1, 'handshake steps run concurrently'
+                return execute(func)
+            finally:
+                in_flight.remove(func)
+
+        offload.execute = tracking_execute
+
+        def serve():
+            sock = listener.accept()[0]
+            # neither has done the handshake yet
+            reader = eventlet.spawn(sock.recv, 4)
+            writer = eventlet.spawn(sock.sendall, b'pong')
+            data = reader.wait()
+            writer.wait()
+            sock.close()
+            return data
+
+        server = eventlet.spawn(serve)
+        try:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+            client = context.wrap_socket(eventlet.connect(listener.getsockname()))
+            client.sendall(b'ping')
+            assert client.recv(4) == b'pong'
+            assert server.wait() == b'ping'
+            client.close()
+        finally:
+            listener.close()
+        assert offload.stats()['handshakes'] == 1
+
+    def test_handshake_offload_non_blocking(self):
+        server_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        server_context.load_cert_chain(tests.certificate_file, tests.private_key_file)
+        server_context.handshake_offload = ssl.HandshakeOffload()
+        listener = server_context.wrap_socket(eventlet.listen(('127.0.0.1', 0)), server_side=True)
+        accepted = []
+
+        def serve():
+            sock = listener.accept()[0]
+            sock.setblocking(False)
+            while True:
+                try:
+                    sock.do_handshake()
+                    break
+                except ssl.SSLWantReadError:
+                    eventlet.hubs.trampoline(sock, read=True)
+                except ssl.SSLWantWriteError:
+                    eventlet.hubs.trampoline(sock, write=True)
+            accepted.append(sock._handshake_offload)
+            eventlet.hubs.trampoline(sock, read=True)
+            sock.sendall(sock.recv(4))
+            sock.close()
+
+        server = eventlet.spawn(serve)
+        try:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+            client = context.wrap_socket(eventlet.connect(listener.getsockname()))
+            client.sendall(b'ping')
+            assert client.recv(4) == b'ping'
+            client.close()
+            server.wait()
+        finally:
+            listener.close()
+        # the handshake is not run again before every read and write
+        assert accepted == [None]
+
+    def test_stream(self):
+        listener = listen_ssl_socket(('127.0.0.1', 0))
+        writes = []
+
+        class Transport:
+            def __init__(self, sock):
+                self.sock = sock
+
+            def recv_into(self, buffer):
+                return self.sock.recv_into(buffer)
+
+            def sendall(self, data):
+                writes.append(len(data))
+                self.sock.sendall(data)
+
+            def close(self):
+                self.sock.close()
+
+        def echo():
+            sock = listener.accept()[0]
+            buf = bytearray(65536)
+            while True:
+                count = sock.recv_into(buf)
+                if not count:
+                    break
+                sock.sendall(buf[:count])
+            sock.close()
+
+        server = eventlet.spawn(echo)
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+        client = context.wrap_stream(Transport(eventlet.connect(listener.getsockname())))
+        assert client.version() is not None
+        del writes[:]
+        payload = [b'a' * 300000, memoryview(b'bc'), bytearray(b'd')]
+        buf = bytearray(300003)
+
+        def read():
+            # concurrently, or the echo would fill up the socket buffers
+            view = memoryview(buf)
+            received = 0
+            while received < len(buf):
+                received += client.recv_into(view[received:])
+
+        reader = eventlet.spawn(read)
+        client.sendall_many(payload)
+        # one write of the first 256KB of records, then the rest together
+        assert writes[0] > 256 * 1024
+        assert len(writes) == 2
+        reader.wait()
+        assert bytes(buf) == b'a' * 300000 + b'bcd'
+        client.close()
+        server.wait()
+        listener.close()
+
+    def test_stream_custom_transport(self):
+        server_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        server_context.load_cert_chain(tests.certificate_file, tests.private_key_file)
+        client_context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+        client_context.check_hostname = False
+        client_context.verify_mode = ssl.CERT_NONE
+
+        class QueueTransport:
+            # message based, like a websocket
+            def __init__(self, incoming, outgoing):
+                self.incoming = incoming
+                self.outgoing = outgoing
+                self.rest = b''
+
+            def recv_into(self, buffer):
+                data = self.rest or self.incoming.get()
+                count = min(len(data), len(buffer))
+                buffer[:count] = data[:count]
+                self.rest = data[count:]
+                return count
+
+            def sendall(self, data):
+                self.outgoing.put(bytes(data))
+
+        up, down = eventlet.Queue(), eventlet.Queue()
+
+        def serve():
+            stream = server_context.wrap_stream(QueueTransport(up, down), server_side=True)
+            stream.sendall(stream.recv(4).upper())
+            stream.unwrap()
+
+        server = eventlet.spawn(serve)
+        client = client_context.wrap_stream(QueueTransport(down, up))
+        client.sendall(b'ping')
+        assert client.recv(4) == b'PING'
+        assert client.recv(4) == b''
+        client.unwrap()
+        server.wait()
+        assert server_context.session_counters()['handshakes'] == 1
+
     def test_context_wrapped_accept(self):
         context = ssl.SSLContext(ssl.PROTOCOL_TLS)
         context.load_cert_chain(tests.certificate_file, tests.private_key_file)
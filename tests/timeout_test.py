@@ -1,4 +1,9 @@
+import gc
+import weakref
+
 import eventlet
+from eventlet.support import greenlets as greenlet
+from eventlet.timeout import TimeoutScope
 
 import tests
 
@@ -55,5 +60,125 @@ class TestWithTimeout(tests.LimitedTestCase):
             DELAY, longer_timeout)
 
 
+class TestDeadline(tests.LimitedTestCase):
+    def test_blocking_call(self):
+        with tests.assert_raises(eventlet.DeadlineExceeded):
+            with eventlet.Deadline(DELAY):
+                eventlet.sleep(DELAY * 10)
+        assert eventlet.timeout.current_deadline() is None
+        # canceled on exit
+        with eventlet.Deadline(DELAY):
+            pass
+        eventlet.sleep(DELAY * 2)
+
+    def test_socket(self):
+        listener = eventlet.listen(('127.0.0.1', 0))
+        client = eventlet.connect(listener.getsockname())
+        client.settimeout(10)
+        try:
+            with tests.assert_raises(eventlet.DeadlineExceeded):
+                with eventlet.Deadline(DELAY):
+                    client.recv(1)
+        finally:
+            client.close()
+            listener.close()
+
+    def test_inherited(self):
+        def child():
+            deadline = eventlet.timeout.current_deadline()
+            eventlet.sleep(DELAY * 10)
+            return deadline
+
+        pool = eventlet.GreenPool(recycle=True)
+        with eventlet.Deadline(DELAY) as deadline:
+            assert eventlet.timeout.current_deadline() is deadline
+            gt = eventlet.spawn(child)
+            pool.spawn_n(child)
+        self.assertRaises(eventlet.DeadlineExceeded, gt.wait)
+        pool.waitall()
+        # the recycled greenlet does not keep the deadline of its first call
+        done = []
+        pool.spawn_n(lambda: done.append(child()))
+        pool.waitall()
+        assert done == [None]
+
+    def test_nested(self):
+        with eventlet.Deadline(DELAY) as outer:
+            with eventlet.Deadline(10):
+                assert eventlet.timeout.current_deadline() is outer
+            with eventlet.Deadline(DELAY / 2) as inner:
+                assert eventlet.timeout.current_deadline() is inner
+                assert inner.remaining() <= outer.remaining()
+            assert eventlet.timeout.current_deadline() is outer
+
+    def test_tpool_not_started_after_deadline(self):
+        from eventlet import tpool
+        calls = []
+        with tests.assert_raises(eventlet.DeadlineExceeded):
+            with eventlet.Deadline(0):
+                tpool.execute(calls.append, 1)
+        assert calls == []
+        assert isinstance(eventlet.DeadlineExceeded(), eventlet.Timeout)
+
+
+class TestTimeoutScope(tests.LimitedTestCase):
+    def test_expires(self):
+        scope = TimeoutScope(DELAY)
+        with tests.assert_raises(eventlet.Timeout):
+            with scope:
+                eventlet.sleep(DELAY * 10)
+        assert scope.expired
+        assert scope.error.seconds == DELAY
+        with TimeoutScope(DELAY, False) as scope:
+            eventlet.sleep(DELAY * 10)
+        assert scope.expired
+        with tests.assert_raises(ValueError):
+            with TimeoutScope(DELAY, ValueError):
+                eventlet.sleep(DELAY * 10)
+
+    def test_finished_in_time(self):
+        for _ in range(100):
+            with TimeoutScope(DELAY) as scope:
+                eventlet.sleep(0)
+        assert not scope.expired
+        eventlet.sleep(DELAY * 2)
+        with TimeoutScope(None):
+            eventlet.sleep(DELAY * 2)
+
+    def test_rearmed_for_later_scope(self):
+        # the slot timer armed by the first scope fires with nothing to
+        # do, and has to be armed again for the second one
+        with TimeoutScope(DELAY):
+            pass
+        eventlet.sleep(DELAY / 2)
+        with tests.assert_raises(eventlet.Timeout):
+            with TimeoutScope(DELAY * 2):
+                eventlet.sleep(DELAY * 20)
+
+    def test_nested(self):
+        with TimeoutScope(DELAY * 5, False) as outer:
+            with TimeoutScope(DELAY, False) as inner:
+                eventlet.sleep(DELAY * 2)
+            assert inner.expired and not outer.expired
+            eventlet.sleep(DELAY * 10)
+        assert outer.expired
+        with tests.assert_raises(eventlet.Timeout):
+            with TimeoutScope(DELAY) as outer:
+                with TimeoutScope(DELAY * 10, False) as inner:
+                    eventlet.sleep(DELAY * 20)
+        assert outer.expired and not inner.expired
+
+    def test_finished_greenthread_not_kept_alive(self):
+        def run():
+            with TimeoutScope(600):
+                eventlet.sleep(0)
+            return weakref.ref(greenlet.getcurrent())
+
+        ref = eventlet.spawn(run).wait()
+        eventlet.sleep(0)
+        gc.collect()
+        assert ref() is None
+
+
 def test_is_timeout_attribute():
     tests.check_is_timeout(eventlet.Timeout())
@@ -792,6 +792,41 @@ class TestHttpd(_TestBase):
         assert result.startswith(b'HTTP'), result
         assert result.endswith(b'hello world'), result
 
+    def test_022_park_idle(self):
+        p = eventlet.GreenPool(5)
+        self.spawn_server(custom_pool=p, park_idle=True)
+        sock = eventlet.connect(self.server_addr)
+        for _ in range(2):
+            sock.sendall(b'GET / HTTP/1.1\r\nHost: localhost\r\n\r\n')
+            assert read_http(sock).body == b'hello world'
+            eventlet.sleep(0.01)
+            # the idle connection is left to the hub
+            assert p.running() == 0
+            assert len(p._parked) == 1
+        # pipelined requests are served in one go
+        sock.sendall(b'GET / HTTP/1.1\r\nHost: localhost\r\n\r\n' * 2)
+        fd = sock.makefile('rb')
+        assert fd.read(len(b'HTTP/1.1 200 OK')) == b'HTTP/1.1 200 OK'
+        fd.close()
+        eventlet.sleep(0.01)
+        assert p.running() == 0
+        assert len(p._parked) == 1
+        sock.close()
+        eventlet.sleep(0.01)
+        assert len(p._parked) == 0
+
+    def test_022_park_idle_keepalive_timeout(self):
+        p = eventlet.GreenPool(5)
+        self.spawn_server(custom_pool=p, park_idle=True, keepalive=0.05)
+        sock = eventlet.connect(self.server_addr)
+        sock.sendall(b'GET / HTTP/1.1\r\nHost: localhost\r\n\r\n')
+        read_http(sock)
+        eventlet.sleep(0.01)
+        assert len(p._parked) == 1
+        eventlet.sleep(0.1)
+        assert len(p._parked) == 0
+        assert sock.recv(1) == b''
+
     def test_023_bad_content_length(self):
         sock = eventlet.connect(self.server_addr)
         sock.sendall(b'GET / HTTP/1.0\r\nHost: localhost\r\nContent-length: argh\r\n\r\n')